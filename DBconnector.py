@@ -1,9 +1,318 @@
+import threading
+import time
+from contextlib import contextmanager
 import sqlcipher3.dbapi2 as sqlite3
 
-def connectDB(dbfile, key):
-    conn = sqlite3.connect(dbfile)
+import instrumentation
+
+# Maximum number of open connections kept per database file.
+POOL_MAX_SIZE = 5
+# Seconds a caller waits for a free connection before giving up.
+POOL_TIMEOUT = 30.0
+# Idle connections older than this (in seconds) are pinged before being handed out.
+POOL_HEALTH_CHECK_INTERVAL = 60.0
+# SQLite VM instructions between cancellation checks on read-only connections.
+CANCEL_CHECK_STEPS = 10000
+
+# Per-thread connection settings, set by the worker threads of executor.py:
+# readonly routes connectDB to the read-only pool, cancel_event aborts running queries.
+_thread_state = threading.local()
+
+# dbfile -> [(schema name, path)] of databases ATTACHed to every new connection of dbfile
+_attached = {}
+
+
+def bind_thread(readonly=False):
+    """Makes connectDB on the calling thread hand out read-only connections (or normal ones again)."""
+    _thread_state.readonly = readonly
+
+
+def set_cancel_event(event):
+    """Queries on read-only connections of the calling thread stop with an OperationalError once event is set."""
+    _thread_state.cancel_event = event
+
+
+def attach_database(dbfile, schema, path):
+    """
+    Makes every connection opened for dbfile from now on ATTACH path as schema, keyed with the
+    same key. Register before the first connectDB(dbfile), pooled connections are not revisited.
+    """
+    entries = _attached.setdefault(dbfile, [])
+    if (schema, path) not in entries:
+        entries.append((schema, path))
+
+
+def attached_databases(dbfile):
+    """[(schema name, path)] of the databases every connection of dbfile ATTACHes."""
+    return list(_attached.get(dbfile, ()))
+
+
+def _cancel_requested():
+    event = getattr(_thread_state, 'cancel_event', None)
+    # A non-zero return value makes SQLite interrupt the running statement
+    return 1 if event is not None and event.is_set() else 0
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes available within the timeout."""
+
+
+def _open_connection(dbfile, key, readonly=False):
+    """Opens a new SQLCipher connection and runs the one-time per-connection setup."""
+    # Pooled connections are handed to whichever thread pywebview dispatches the call on.
+    conn = sqlite3.connect(dbfile, check_same_thread=False)
     conn.execute(f"PRAGMA key = '{key}';")
+    # Switching to WAL reads the first page, so the key derivation cost is paid here, once.
+    conn.execute("PRAGMA journal_mode=WAL;")
+    for schema, path in _attached.get(dbfile, ()):
+        # A second key derivation, paid once per pooled connection like the first
+        conn.execute(f"ATTACH DATABASE ? AS {schema} KEY ?", (path, key))
+        conn.execute(f"PRAGMA {schema}.journal_mode=WAL;")
+    if readonly:
+        # WAL readers never block the writer; query_only turns accidental writes into errors
+        conn.execute("PRAGMA query_only = ON;")
+        conn.set_progress_handler(_cancel_requested, CANCEL_CHECK_STEPS)
+    return conn
+
+
+class PooledConnection:
+    """Thin wrapper around a pooled connection. close() hands it back to the pool."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __del__(self):
+        # Safety net for code paths that raise before reaching conn.close().
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class PinnedConnection(PooledConnection):
+    """
+    Connection every connectDB call of one thread gets while pinned_connection() is active.
+    close(), commit() and rollback() are left to the pinning code, so the calls it makes
+    all run in the transaction (and snapshot) it controls.
+    """
 
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA journal_mode=WAL;")
-    return conn, cursor
\ No newline at end of file
+    def close(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def unpin(self):
+        PooledConnection.close(self)
+
+
+class ConnectionPool:
+    """Thread-safe, bounded pool of keyed connections to a single database file."""
+
+    def __init__(self, dbfile, key, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT,
+                 health_check_interval=POOL_HEALTH_CHECK_INTERVAL, readonly=False):
+        self.dbfile = dbfile
+        self._key = key
+        self.readonly = readonly
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        # RLock because release() may run from __del__ while this thread already holds the lock.
+        self._cond = threading.Condition(threading.RLock())
+        self._idle = []  # list of (connection, last_used_monotonic)
+        self._size = 0
+        self._closed = False
+        self._stats = {
+            'hits': 0, 'misses': 0, 'waits': 0, 'timeouts': 0, 'discarded': 0,
+            'setup_count': 0, 'setup_time_total': 0.0, 'setup_time_max': 0.0,
+        }
+
+    def _create(self):
+        start = time.perf_counter()
+        conn = _open_connection(self.dbfile, self._key, self.readonly)
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self._stats['setup_count'] += 1
+            self._stats['setup_time_total'] += elapsed
+            self._stats['setup_time_max'] = max(self._stats['setup_time_max'], elapsed)
+        if instrumentation.enabled:
+            instrumentation.record_connection_setup(self.dbfile, elapsed)
+        return conn
+
+    def _is_healthy(self, conn, last_used):
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats['discarded'] += 1
+            self._cond.notify()
+
+    def acquire(self, wrapper=PooledConnection):
+        """Returns a PooledConnection (or wrapper), opening a new connection only if no idle one is available."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise sqlite3.ProgrammingError(f"Connection pool for {self.dbfile} is closed.")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    reuse = True
+                elif self._size < self.max_size:
+                    self._size += 1
+                    self._stats['misses'] += 1
+                    reuse = False
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeoutError(f"Timed out waiting for a connection to {self.dbfile}.")
+                    self._stats['waits'] += 1
+                    self._cond.wait(remaining)
+                    continue
+
+            if reuse:
+                if self._is_healthy(conn, last_used):
+                    with self._cond:
+                        self._stats['hits'] += 1
+                    return wrapper(self, conn)
+                self._discard(conn)
+                continue
+
+            try:
+                return wrapper(self, self._create())
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+
+    def release(self, conn):
+        """Returns a connection to the idle list, rolling back anything left uncommitted."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                conn.close()
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close(self):
+        """Closes all idle connections; connections still in use are closed when released."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['max_size'] = self.max_size
+            stats['readonly'] = self.readonly
+        return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(dbfile, key, readonly=False):
+    """Returns the shared (read-write or read-only) pool for dbfile, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get((dbfile, readonly))
+        if pool is None:
+            pool = _pools[(dbfile, readonly)] = ConnectionPool(dbfile, key, readonly=readonly)
+        return pool
+
+
+def get_pool_stats():
+    """Returns hit/miss and connection-setup timing counters for every pool."""
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {(f"{dbfile} (read-only)" if readonly else dbfile): pool.stats() for (dbfile, readonly), pool in pools}
+
+
+def close_all_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+@contextmanager
+def pinned_connection(dbfile, key):
+    """Makes every connectDB(dbfile) on this thread return the same connection until the block ends."""
+    pinned = getattr(_thread_state, 'pinned', None)
+    if pinned is None:
+        pinned = _thread_state.pinned = {}
+    if dbfile in pinned:
+        yield pinned[dbfile]  # Nested: the outer block owns the connection
+        return
+    pinned[dbfile] = get_pool(dbfile, key, getattr(_thread_state, 'readonly', False)).acquire(PinnedConnection)
+    try:
+        yield pinned[dbfile]
+    finally:
+        pinned.pop(dbfile).unpin()
+
+
+def connectDB(dbfile, key):
+    """Draws a connection from the pool for dbfile. Call conn.close() to hand it back."""
+    pinned = getattr(_thread_state, 'pinned', None)
+    if pinned and dbfile in pinned:
+        conn = pinned[dbfile]
+    elif instrumentation.enabled:
+        start = time.perf_counter()
+        conn = get_pool(dbfile, key, getattr(_thread_state, 'readonly', False)).acquire()
+        instrumentation.record_connect_wait(time.perf_counter() - start)
+    else:
+        conn = get_pool(dbfile, key, getattr(_thread_state, 'readonly', False)).acquire()
+    if instrumentation.enabled:
+        return conn, instrumentation.InstrumentedCursor(conn.cursor())
+    return conn, conn.cursor()
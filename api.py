@@ -4,17 +4,94 @@ import os
 import hashlib
 import hmac
 import base64
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import time
-from urllib.parse import parse_qs
-from DBconnector import connectDB
+from DBconnector import connectDB, pinned_connection, get_pool_stats, attach_database
 from env_variables import DATABASE_KEY, SECRET_KEY
+from migrations import create_base_schema, migrate, get_schema_version, SCHEMA_VERSION
+from date_utils import normalize_date, normalize_timestamp, format_timestamp, range_condition
+from search_index import build_match_expression, RANK_EXPRESSION, SNIPPET_START, SNIPPET_END, SNIPPET_ELLIPSIS, SNIPPET_TOKENS
+from caches import TTLCache, LRUCache
+from sync_log import SYNC_COUNTER
+from milestone_tree import load_tree, load_ancestors, load_subtree_ids, find_cycle, find_invalid_parents
+from lookup_cache import LookupCache
+from attachment_store import replace_task_attachments, delete_task_attachments, load_attachment_lists, read_chunk
+from archive_store import (ARCHIVE_DB_FILE, ARCHIVE_SCHEMA, ALL_TASKS_SQL, create_archive_schema, archive_finished_tasks,
+                           restore_tasks, drop_duplicates, task_schema, newest_archived)
+from maintenance import maintain_database
+import instrumentation
+import startup
 
 # Import functions from user_manager
-from user_manager import verify_user, _init_auth_db
+from user_manager import verify_user, revoke_token, is_token_revoked
 
 # Define the SQLite database file path.
 DB_FILE = "./data/tasks.db"
+# Finished tasks past ARCHIVE_AFTER_DAYS live in archive.db, attached to every tasks.db connection
+attach_database(DB_FILE, ARCHIVE_SCHEMA, ARCHIVE_DB_FILE)
+
+# Number of tasks fetched (with their milestones) per query during export.
+EXPORT_CHUNK_SIZE = 200
+# Largest number of bound parameters used in a single IN (...) list.
+MAX_IN_PARAMS = 500
+
+# Tasks per get_changes call; milestones and deletions in the same sequence range come along.
+SYNC_PAGE_SIZE = 500
+
+# Bridge calls that never write tasks.db. The worker pool in executor.py runs these concurrently
+# on read-only connections; every other call goes to its single writer thread.
+READ_CALLS = frozenset({
+    'login', 'load_task', 'read_attachment', 'load_tasks_summary', 'load_milestones_for_task',
+    'get_milestone_tree', 'get_milestone_ancestors', 'load_milestone', 'get_distinct_statuses',
+    'get_distinct_from_values', 'get_distinct_categories', 'get_task_counts', 'get_dashboard',
+    'query_milestones', 'get_changes', 'export_tasks', 'get_connection_stats', 'get_metrics', 'batch',
+    'get_task_facets',
+})
+# Largest number of calls one Api.batch runs
+MAX_BATCH_CALLS = 50
+
+# Verified tokens remembered by _get_authenticated_username (digest -> (username, exp, recheck_at)),
+# so repeated calls skip the HMAC check and payload decoding.
+TOKEN_CACHE_SIZE = 256
+# logout only clears this process's cache; other processes sharing auth.db (desktop app, server
+# instances) notice the revocation when they look it up again, at most this many seconds later
+TOKEN_REVOCATION_CHECK_SECONDS = 30
+_token_cache = LRUCache(TOKEN_CACHE_SIZE)
+
+# Status/origin tables, revalidated against change_counters on every use
+_status_lookup = LookupCache('status')
+_origin_lookup = LookupCache('origin')
+
+# Statistics dashboard: tasks due within this many days count as "due soon",
+# each list carries at most DASHBOARD_LIST_LIMIT tasks (the counts are always exact),
+# and results are reused for DASHBOARD_CACHE_TTL seconds unless this process writes a task or milestone.
+DUE_SOON_DAYS = 7
+DASHBOARD_LIST_LIMIT = 100
+DASHBOARD_CACHE_TTL = 30
+_dashboard_cache = TTLCache(DASHBOARD_CACHE_TTL)
+MILESTONE_SUMMARY_COLUMNS = """
+    m.id, m.taskId, t.title as taskTitle, m.title, m.deadline, m.finishDate,
+    s.description as status, m.parentId, m.updatedAt
+"""
+DASHBOARD_TASK_COLUMNS = """
+    t.id, t.title, o.description as "from", t.priority, t.deadline, t.finishDate,
+    s.description as status, t.categories, t.createdAt, t.updatedAt
+"""
+
+# groupBy values of load_tasks_summary -> SQL of the group a task belongs to (get_task_facets).
+# Date groups are 'YYYY' or 'YYYY-MM' prefixes of the stored ISO dates (createdAt in UTC);
+# 'category' is handled separately, since a task is in one group per category.
+TASK_GROUP_KEYS = {
+    'priority': 't.priority', 'from': 'o.description', 'status': 's.description',
+    'deadlineYear': 'substr(t.deadline, 1, 4)', 'deadlineMonthYear': 'substr(t.deadline, 1, 7)',
+    'finishDateYear': 'substr(t.finishDate, 1, 4)', 'finishDateMonthYear': 'substr(t.finishDate, 1, 7)',
+    'createdAtYear': 'substr(t.createdAt, 1, 4)', 'createdAtMonthYear': 'substr(t.createdAt, 1, 7)',
+}
+TASK_GROUP_COLUMNS = {
+    'deadlineYear': 't.deadline', 'deadlineMonthYear': 't.deadline',
+    'finishDateYear': 't.finishDate', 'finishDateMonthYear': 't.finishDate',
+    'createdAtYear': 't.createdAt', 'createdAtMonthYear': 't.createdAt',
+}
 
 # --- JWT Helper Functions ---
 
@@ -53,64 +130,168 @@ def verify_jwt(token, secret):
     except Exception:
         return None
 
-# --- Database Initialization ---
+def token_digest(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
 
-def init_db():
-    print("Initializing SQLite database...")
-    conn, cursor = connectDB(DB_FILE, DATABASE_KEY)    
-
-    # Create status table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS status (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            description TEXT NOT NULL UNIQUE
-        )
-    ''')
+# --- Pagination Cursor Helpers ---
 
-    # Create origin table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS origin (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            description TEXT NOT NULL UNIQUE
-        )
-    ''')    
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tasks (
-            id TEXT PRIMARY KEY, creator TEXT NOT NULL, title TEXT, origin INTEGER, priority INTEGER, 
-            deadline TEXT, finishDate TEXT, status INTEGER, description TEXT, notes TEXT,
-            categories TEXT, attachments TEXT, createdAt TEXT, updatedAt TEXT, difficulty INTEGER,
-            FOREIGN KEY(status) REFERENCES status(id)
-            FOREIGN KEY(origin) REFERENCES origin(id)
-        )
-    ''')
-
-    # Add 'difficulty' column to tasks table if it doesn't exist
-    cursor.execute("PRAGMA table_info(tasks)")
-    columns = [info[1] for info in cursor.fetchall()]
-    if 'difficulty' not in columns:
-        cursor.execute("ALTER TABLE tasks ADD COLUMN difficulty INTEGER DEFAULT 5")
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS milestones (
-            id TEXT PRIMARY KEY, taskId TEXT NOT NULL, title TEXT, deadline TEXT, finishDate TEXT,
-            status INTEGER, parentId TEXT, notes TEXT, updatedAt TEXT,
-            FOREIGN KEY (taskId) REFERENCES tasks(id) ON DELETE CASCADE,
-            FOREIGN KEY(status) REFERENCES status(id)
-        )
-    ''')
+def _ordering_fingerprint(order_keys):
+    ordering = '|'.join(f"{expression} {direction}" for expression, direction in order_keys)
+    return hashlib.sha256(ordering.encode('utf-8')).hexdigest()[:12]
 
-    conn.commit()
+def encode_page_cursor(order_keys, key_values):
+    payload = {"o": _ordering_fingerprint(order_keys), "k": list(key_values)}
+    return _base64url_encode(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
 
-    conn.close()
+def decode_page_cursor(order_keys, cursor):
+    """Returns the sort-key values stored in cursor, or None if it is malformed or from another ordering."""
+    try:
+        payload = json.loads(_base64url_decode(cursor))
+        key_values = payload['k']
+        if payload['o'] != _ordering_fingerprint(order_keys) or len(key_values) != len(order_keys):
+            return None
+        return key_values
+    except Exception:
+        return None
 
-    print(f"SQLite database initialized at: {os.path.abspath(DB_FILE)}")
+def keyset_condition(order_keys, key_values):
+    """
+    Builds the WHERE condition selecting rows that sort strictly after key_values.
+    SQLite sorts NULL first in ASC and last in DESC order, so NULLs need explicit handling.
+    """
+    disjuncts = []
+    args = []
+    for i, (expression, direction) in enumerate(order_keys):
+        value = key_values[i]
+        if direction == 'ASC':
+            after = f"{expression} IS NOT NULL" if value is None else f"{expression} > ?"
+        else:
+            if value is None:
+                continue  # nothing sorts after NULL in descending order
+            after = f"({expression} < ? OR {expression} IS NULL)"
+        terms = [f"{order_keys[j][0]} IS ?" for j in range(i)]
+        terms.append(after)
+        disjuncts.append("(" + " AND ".join(terms) + ")")
+        args.extend(key_values[:i])
+        if value is not None:
+            args.append(value)
+    if not disjuncts:
+        return "0", []
+    return "(" + " OR ".join(disjuncts) + ")", args
+
+# --- Row Conversion Helpers ---
+
+def _task_row_to_dict(columns, row):
+    task_data = dict(zip(columns, row))
+    if 'categories' in task_data and task_data['categories']:
+        task_data['categories'] = json.loads(task_data['categories'])
+    # Attachments live in attachment_store; the legacy inline column is always empty
+    task_data.pop('attachments', None)
+    return task_data
+
+def _milestone_row_to_dict(columns, row):
+    milestone_data = dict(zip(columns, row))
+    if 'notes' in milestone_data and milestone_data['notes']:
+        milestone_data['notes'] = json.loads(milestone_data['notes'])
+    return milestone_data
+
+# --- Write Helpers ---
+
+# Upsert instead of INSERT OR REPLACE: REPLACE deletes the old row without firing
+# delete triggers, which would leave stale entries behind in tasks_fts.
+# Ids are global; callers reject ids owned by another user/task first, and the WHERE
+# clauses keep such rows untouched should one slip through.
+TASK_UPSERT_SQL = '''
+    INSERT INTO tasks (
+        id, creator, title, origin, priority, deadline, finishDate, status,
+        description, notes, categories, createdAt, updatedAt, difficulty
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        creator = excluded.creator, title = excluded.title, origin = excluded.origin,
+        priority = excluded.priority, deadline = excluded.deadline, finishDate = excluded.finishDate,
+        status = excluded.status, description = excluded.description, notes = excluded.notes,
+        categories = excluded.categories,
+        createdAt = excluded.createdAt, updatedAt = excluded.updatedAt, difficulty = excluded.difficulty
+    WHERE tasks.creator = excluded.creator
+'''
+
+MILESTONE_UPSERT_SQL = '''
+    INSERT INTO milestones (
+        id, taskId, title, deadline, finishDate, status, parentId, notes, updatedAt
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        title = excluded.title, deadline = excluded.deadline, finishDate = excluded.finishDate,
+        status = excluded.status, parentId = excluded.parentId, notes = excluded.notes,
+        updatedAt = excluded.updatedAt
+    WHERE milestones.taskId = excluded.taskId
+'''
+
+# Fields patch_task/patch_milestone accept: field -> (column, conversion or None).
+# status and from are written as lookup ids, attachments go to attachment_store.
+TASK_PATCH_COLUMNS = {
+    'title': ('title', None), 'priority': ('priority', None), 'difficulty': ('difficulty', None),
+    'deadline': ('deadline', normalize_date), 'finishDate': ('finishDate', normalize_date),
+    'createdAt': ('createdAt', normalize_timestamp),
+    'description': ('description', None), 'notes': ('notes', None),
+    'categories': ('categories', lambda categories: json.dumps(categories or [])),
+}
+MILESTONE_PATCH_COLUMNS = {
+    'title': ('title', None), 'parentId': ('parentId', None),
+    'deadline': ('deadline', normalize_date), 'finishDate': ('finishDate', normalize_date),
+    'notes': ('notes', lambda notes: json.dumps(notes or '')),
+}
+
+def _patch_assignments(changes, patch_columns):
+    """Returns the SET terms and values for the fields of changes listed in patch_columns."""
+    terms, values = [], []
+    for field, (column, convert) in patch_columns.items():
+        if field in changes:
+            terms.append(f"{column} = ?")
+            values.append(convert(changes[field]) if convert else changes[field])
+    return terms, values
+
+def _task_params(task, username, status_id, origin_id):
+    return (
+        task['id'], username, task.get('title'), origin_id, task.get('priority'),
+        normalize_date(task.get('deadline')), normalize_date(task.get('finishDate')), status_id,
+        task.get('description'), task.get('notes'),
+        json.dumps(task.get('categories', [])),
+        normalize_timestamp(task.get('createdAt')), normalize_timestamp(task.get('updatedAt')), task.get('difficulty', 5)
+    )
+
+def _milestone_params(milestone, task_id, status_id):
+    return (
+        milestone['id'], task_id, milestone.get('title'), normalize_date(milestone.get('deadline')),
+        normalize_date(milestone.get('finishDate')), status_id, milestone.get('parentId'),
+        json.dumps(milestone.get('notes', '')), normalize_timestamp(milestone.get('updatedAt'))
+    )
 
+# --- Database Initialization ---
 
+def init_db():
+    """Creates and migrates tasks.db. Run once per process by startup.begin(), not at import."""
+    with startup.phase('tasks.db open'):
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+
+    with startup.phase('tasks.db schema'):
+        # Fast path: an up-to-date database needs no CREATE / table_info checks at all
+        schema_version = get_schema_version(cursor)
+        if schema_version != SCHEMA_VERSION:
+            print("Initializing SQLite database...")
+            # Base tables (the version 0 schema)
+            create_base_schema(cursor)
 
-_init_auth_db()
+            conn.commit()
 
-init_db()
+            # Column additions, indexes and other schema changes are versioned in migrations.py
+            schema_version = migrate(conn)
+
+    with startup.phase('archive.db schema'):
+        create_archive_schema(conn)
+
+    conn.close()
+
+    print(f"SQLite database (schema version {schema_version}) initialized at: {os.path.abspath(DB_FILE)}")
 
 
 
@@ -118,9 +299,12 @@ init_db()
 
 
 
+# Method timings are only recorded while instrumentation is enabled (PRISMTASK_METRICS=1)
+@instrumentation.instrument_class(phases={'_get_authenticated_username': 'auth'})
 class Api:
 
     def login(self, username, password):
+        startup.wait_ready()
         if verify_user(username, password):
             token_payload = {
                 'username': username,
@@ -133,12 +317,48 @@ class Api:
 
 
 
+    def logout(self, token):
+        """Revokes token so it cannot be used again, even before it expires."""
+        if not token:
+            return {"error": "Authentication required."}
+
+        startup.wait_ready()
+        payload = verify_jwt(token, SECRET_KEY)
+        digest = token_digest(token)
+        _token_cache.pop(digest)
+        if payload and not revoke_token(digest, payload.get('exp')):
+            return {"error": "Could not revoke token."}
+        return {"message": "Logged out."}
+
+
+
     def _get_authenticated_username(self, token):
         if not token:
             return None
 
+        # The first calls can arrive while startup is still checking the databases
+        startup.wait_ready()
+        digest = token_digest(token)
+        cached = _token_cache.get(digest)
+        if cached is not None:
+            username, exp, recheck_at = cached
+            now = time.time()
+            if exp is not None and exp < now:
+                _token_cache.pop(digest)
+                return None
+            if now < recheck_at:
+                return username
+            if is_token_revoked(digest):
+                _token_cache.pop(digest)
+                return None
+            _token_cache.set(digest, (username, exp, now + TOKEN_REVOCATION_CHECK_SECONDS))
+            return username
+
         payload = verify_jwt(token, SECRET_KEY)
-        return payload.get('username') if payload else None
+        if not payload or not payload.get('username') or is_token_revoked(digest):
+            return None
+        _token_cache.set(digest, (payload['username'], payload.get('exp'), time.time() + TOKEN_REVOCATION_CHECK_SECONDS))
+        return payload['username']
 
 
 
@@ -149,29 +369,59 @@ class Api:
 
         conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
 
-        query = """
-            SELECT t.*, s.description as status , o.description as "from"
-            FROM tasks t
-            LEFT JOIN status s ON t.status = s.id
-            LEFT JOIN origin o ON t.origin = o.id
-            WHERE t.id = ? AND t.creator = ?
-        """
-
-        cursor.execute(query, (taskId, username))
-        row = cursor.fetchone()
+        task = None
+        # Tasks finished long ago are looked up in the archive
+        for schema in ('main', ARCHIVE_SCHEMA):
+            query = f"""
+                SELECT t.*, s.description as status , o.description as "from"
+                FROM {schema}.tasks t
+                LEFT JOIN status s ON t.status = s.id
+                LEFT JOIN origin o ON t.origin = o.id
+                WHERE t.id = ? AND t.creator = ?
+            """
+
+            cursor.execute(query, (taskId, username))
+            row = cursor.fetchone()
+            if row:
+                columns = [description[0] for description in cursor.description]
+                task = _task_row_to_dict(columns, row)
+                # Metadata only, the contents are fetched on demand with read_attachment
+                task['attachments'] = load_attachment_lists(cursor, [taskId])[taskId]
+                if schema == ARCHIVE_SCHEMA:
+                    task['archived'] = True
+                break
         conn.close()
 
-        if row:
-            columns = [description[0] for description in cursor.description]
-            task_data = dict(zip(columns, row))
-            if 'categories' in task_data and task_data['categories']:
-                task_data['categories'] = json.loads(task_data['categories'])
-            if 'attachments' in task_data and task_data['attachments']:
-                task_data['attachments'] = json.loads(task_data['attachments'])
-            return task_data
+        if task:
+            return task
 
         return {"error": "Task not found."}
 
+    def read_attachment(self, token, hash, chunk=0):
+        """
+        Returns one chunk of an attachment's content as {"hash", "size", "chunkCount", "chunk", "data"},
+        data being base64. Chunks are numbered from 0 to chunkCount - 1.
+        """
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
+        try:
+            chunk = int(chunk)
+        except (TypeError, ValueError):
+            return {"error": "chunk must be a number."}
+        if chunk < 0:
+            return {"error": "chunk must not be negative."}
+
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        try:
+            result = read_chunk(cursor, username, hash, chunk)
+        finally:
+            conn.close()
+
+        if result is None:
+            return {"error": "Attachment not found."}
+        return result
+
 
 
     def load_tasks_summary(self, token, filters={}, pagination={}):
@@ -181,153 +431,354 @@ class Api:
 
         conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
 
-        sql_query = """
-            SELECT t.id, t.creator, t.title, o.description as "from", t.priority, t.deadline, t.finishDate, 
-                   s.description as status, t.categories, t.createdAt, t.updatedAt, t.origin as fromId 
-            FROM tasks t
-            LEFT JOIN status s ON t.status = s.id
-            LEFT JOIN origin o ON t.origin = o.id
-            WHERE t.creator = ?
-        """
+        # Archived tasks are only searched when the filters can match them (see _summary_includes_archive)
+        schemas = ['main']
+        if self._summary_includes_archive(cursor, filters, username):
+            schemas.append(ARCHIVE_SCHEMA)
+
+        searching = bool(build_match_expression((filters.get('q') or '').strip()))
+        order_keys = self._summary_order_keys(filters, searching)
+        # Sort keys are selected too, so the last row of a page can become the next cursor
+        key_columns = ''.join(f", {expression} as _sk{i}" for i, (expression, _) in enumerate(order_keys))
+
+        # Cursor mode: {'limit': n, 'cursor': None | str} returns {"tasks": [...], "nextCursor": ...}.
+        # Plain {'limit', 'offset'} pagination is kept as a fallback and returns the bare list.
+        use_cursor = 'cursor' in pagination
+        limit = pagination.get('limit', 10)
+
+        keyset_sql, keyset_args = None, []
+        if use_cursor and pagination.get('cursor'):
+            key_values = decode_page_cursor(order_keys, pagination.get('cursor'))
+            if key_values is None:
+                conn.close()
+                return {"error": "Invalid pagination cursor."}
+            keyset_sql, keyset_args = keyset_condition(order_keys, key_values)
+
+        arms = []
+        query_args = []
+        for schema in schemas:
+            from_sql, where_sql, where_args, match_expression = self._task_filter_sql(filters, username, schema)
+            if match_expression:
+                arms.append(f"""
+                    SELECT t.id, t.creator, t.title, o.description as "from", t.priority, t.deadline, t.finishDate, 
+                           s.description as status, t.categories, t.createdAt, t.updatedAt, t.origin as fromId,
+                           {RANK_EXPRESSION} as relevance,
+                           snippet(tasks_fts, -1, ?, ?, ?, ?) as snippet{key_columns}
+                    FROM {from_sql}
+                    WHERE {where_sql}
+                """)
+                query_args += [SNIPPET_START, SNIPPET_END, SNIPPET_ELLIPSIS, SNIPPET_TOKENS] + where_args
+            else:
+                arms.append(f"""
+                    SELECT t.id, t.creator, t.title, o.description as "from", t.priority, t.deadline, t.finishDate, 
+                           s.description as status, t.categories, t.createdAt, t.updatedAt, t.origin as fromId{key_columns}
+                    FROM {from_sql}
+                    WHERE {where_sql}
+                """)
+                query_args += where_args
+            # The keyset goes into each arm, where it can still use the (creator, <sort column>) indexes
+            if keyset_sql:
+                arms[-1] += f" AND {keyset_sql}"
+                query_args += keyset_args
+
+        if len(arms) == 1:
+            sql_query = arms[0]
+            sql_query += " ORDER BY " + ", ".join(f"{expression} {direction}" for expression, direction in order_keys)
+        else:
+            # Outside the arms the sort keys are only reachable through their _sk aliases
+            sql_query = f"SELECT * FROM ({' UNION ALL '.join(arms)})"
+            sql_query += " ORDER BY " + ", ".join(f"_sk{i} {direction}" for i, (_, direction) in enumerate(order_keys))
+
+        if use_cursor:
+            # One extra row tells us whether another page exists
+            sql_query += " LIMIT ?"
+            query_args.append(limit + 1)
+        else:
+            sql_query += " LIMIT ? OFFSET ?"
+            query_args.extend([limit, pagination.get('offset', 0)])
 
-        query_args = [username]
+        cursor.execute(sql_query, query_args)
+        rows = cursor.fetchall()
+        conn.close()
 
-        search_query_full = filters.get('q', '').strip()
-        if search_query_full:
-            search_terms = [term.strip().lower() for term in search_query_full.split(';') if term.strip()]
-            
-            if search_terms:
-                all_term_conditions = []
-                for term in search_terms:
-                    # Each term has its own OR group for title, description, notes
-                    term_condition = "(LOWER(t.title) LIKE ? OR LOWER(t.description) LIKE ? OR LOWER(t.notes) LIKE ?)"
-                    all_term_conditions.append(term_condition)
-                    query_args.extend([f'%{term}%', f'%{term}%', f'%{term}%'])
-                
-                # Join all term conditions with AND
-                sql_query += " AND (" + " AND ".join(all_term_conditions) + ")"
+        has_more = use_cursor and len(rows) > limit
+        if use_cursor:
+            rows = rows[:limit]
 
-        if filters.get('categories'):
-            category_conditions = []
-            for cat in filters.get('categories'):
-                category_conditions.append(f"t.categories LIKE ?")
-                query_args.append(f'%\"{cat}\"%')
+        tasks_summary = []
 
-            if category_conditions:
-                sql_query += " AND (" + " OR ".join(category_conditions) + ")"
+        columns = [description[0] for description in cursor.description]
+        key_count = len(order_keys)
+        data_columns = columns[:-key_count]
 
-        if filters.get('statuses'):
-            status_placeholders = ','.join('?' * len(filters.get('statuses')))
-            sql_query += f" AND s.description IN ({status_placeholders})"
-            query_args.extend(filters.get('statuses'))
+        for row in rows:
+            task_data = dict(zip(data_columns, row))
+            if 'categories' in task_data and task_data['categories']:
+                try:
+                    task_data['categories'] = json.loads(task_data['categories'])
+                except json.JSONDecodeError:
+                    task_data['categories'] = []
+            tasks_summary.append(task_data)
 
-        if filters.get('froms'):
-            from_placeholders = ','.join('?' * len(filters.get('froms')))
-            sql_query += f" AND o.description IN ({from_placeholders})"
-            query_args.extend(filters.get('froms'))
+        if use_cursor:
+            next_cursor = encode_page_cursor(order_keys, rows[-1][-key_count:]) if has_more else None
+            return {"tasks": tasks_summary, "nextCursor": next_cursor}
 
-        def add_date_filter(column_name, from_date, to_date):
-            nonlocal sql_query, query_args
-            if from_date and to_date:
-                sql_query += f" AND date({column_name}) BETWEEN date(?) AND date(?)"
-                query_args.extend([from_date, to_date])
+        return tasks_summary
 
-            elif from_date:
-                sql_query += f" AND date({column_name}) >= date(?)"
-                query_args.append(from_date)
 
-            elif to_date:
-                sql_query += f" AND date({column_name}) <= date(?)"
-                query_args.append(to_date)
 
-        add_date_filter('t.createdAt', filters.get('createdRF'), filters.get('createdRT'))
-        add_date_filter('t.updatedAt', filters.get('updatedRF'), filters.get('updatedRT'))
-        add_date_filter('t.deadline', filters.get('deadlineRF'), filters.get('deadlineRT'))
-        add_date_filter('t.finishDate', filters.get('finishedRF'), filters.get('finishedRT'))
+    def get_task_facets(self, token, filters={}):
+        """
+        Counts for the task list under the load_tasks_summary filters, computed in one statement:
+        tasks per group of filters['groupBy'] and per status, from and category value.
+        The status/from/category counts apply every filter except the one on their own field,
+        so they tell how many tasks each value would show. Returns {"total", "groupBy",
+        "groups": [{"key", "count"}], "statuses", "froms", "categories"} with groups in list order;
+        a group's tasks come from load_tasks_summary with filters['groupKey'] = key.
+        """
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
 
-        if filters.get('hasFinishDate') == 'false':
-            sql_query += " AND (t.finishDate IS NULL OR t.finishDate = '')"
+        group_by = filters.get('groupBy')
+        if group_by == '__none':
+            group_by = None
+        if group_by is not None and group_by != 'category' and group_by not in TASK_GROUP_KEYS:
+            return {"error": f"Cannot group by '{group_by}'."}
+        # The value filters become per-row flags instead, so one pass can count with and without each
+        base_filters = {key: value for key, value in filters.items()
+                        if key not in ('categories', 'statuses', 'froms', 'groupKey')}
 
-        sort_expressions = []
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        schemas = ['main']
+        if self._summary_includes_archive(cursor, filters, username):
+            schemas.append(ARCHIVE_SCHEMA)
+
+        arms = []
+        query_args = []
+        for schema in schemas:
+            prefix = '' if schema == 'main' else f"{schema}."
+            from_sql, where_sql, where_args, _ = self._task_filter_sql(base_filters, username, schema)
+            value_filters = self._value_filter_sql(filters, prefix)
+            flag_columns = ''
+            for name in ('statuses', 'froms', 'categories'):
+                condition, condition_args = value_filters.get(name, ("1", []))
+                flag_columns += f", ({condition}) as _{name}"
+                query_args.extend(condition_args)
+            if group_by == 'category':
+                flag_columns += f", EXISTS (SELECT 1 FROM {prefix}task_categories WHERE task_id = t.id) as _categorized"
+            arms.append(f"""
+                SELECT '{schema}' as _schema, t.id, {TASK_GROUP_KEYS.get(group_by, 'NULL')} as _group,
+                       s.description as status, o.description as "from"{flag_columns}
+                FROM {from_sql}
+                WHERE {where_sql}
+            """)
+            query_args.extend(where_args)
+        category_rows = " UNION ALL ".join(f"""
+            SELECT base.*, tc.category FROM base
+            JOIN {schema}.task_categories tc ON tc.task_id = base.id
+            WHERE base._schema = '{schema}'
+        """ for schema in schemas)
+
+        matching = "_statuses AND _froms AND _categories"
+        if group_by == 'category':
+            groups_sql = f"""
+                UNION ALL SELECT 'group', category, COUNT(*) FROM categorized WHERE {matching} GROUP BY category
+                UNION ALL SELECT 'group', NULL, COUNT(*) FROM base WHERE {matching} AND NOT _categorized HAVING COUNT(*) > 0
+            """
+        elif group_by:
+            groups_sql = f"UNION ALL SELECT 'group', _group, COUNT(*) FROM base WHERE {matching} GROUP BY _group"
+        else:
+            groups_sql = ""
+
+        try:
+            # MATERIALIZED: the filters run once, every count below reads the same rows
+            cursor.execute(f"""
+                WITH base AS MATERIALIZED ({' UNION ALL '.join(arms)}),
+                categorized AS ({category_rows})
+                SELECT 'total', NULL, COUNT(*) FROM base WHERE {matching}
+                UNION ALL SELECT 'statuses', status, COUNT(*) FROM base WHERE _froms AND _categories GROUP BY status
+                UNION ALL SELECT 'froms', "from", COUNT(*) FROM base WHERE _statuses AND _categories GROUP BY "from"
+                UNION ALL SELECT 'categories', category, COUNT(*) FROM categorized WHERE _statuses AND _froms GROUP BY category
+                {groups_sql}
+            """, query_args)
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
 
-        group_by_map = {
-            'priority': 't.priority ASC', 'from': '"from" ASC', 'status': 'status ASC',
-            'deadlineYear': 'CASE WHEN t.deadline IS NULL OR t.deadline = \'\' THEN 1 ELSE 0 END, t.deadline ASC',
-            'deadlineMonthYear': 'CASE WHEN t.deadline IS NULL OR t.deadline = \'\' THEN 1 ELSE 0 END, t.deadline ASC',
-            'finishDateYear': 'CASE WHEN t.finishDate IS NULL OR t.finishDate = \'\' THEN 1 ELSE 0 END, t.finishDate ASC',
-            'finishDateMonthYear': 'CASE WHEN t.finishDate IS NULL OR t.finishDate = \'\' THEN 1 ELSE 0 END, t.finishDate ASC',
-            'createdAtYear': 'CASE WHEN t.createdAt IS NULL OR t.createdAt = \'\' THEN 1 ELSE 0 END, t.createdAt ASC',
-            'createdAtMonthYear': 'CASE WHEN t.createdAt IS NULL OR t.createdAt = \'\' THEN 1 ELSE 0 END, t.createdAt ASC',
-        }
+        facets = {"total": 0, "groupBy": group_by, "groups": [], "statuses": {}, "froms": {}, "categories": {}}
+        for facet, value, count in rows:
+            if facet == 'total':
+                facets['total'] = count
+            elif facet == 'group':
+                facets['groups'].append({"key": value, "count": count})
+            elif value is not None:
+                facets[facet][value] = count
+        # Same order as the grouped list: ascending, tasks without a value last
+        facets['groups'].sort(key=lambda group: (group['key'] is None, isinstance(group['key'], str),
+                                                    0 if group['key'] is None else group['key']))
+        return facets
 
-        sort_by_map = {
-            'deadline': 'CASE WHEN t.deadline IS NULL OR t.deadline = \'\' THEN 1 ELSE 0 END, t.deadline ASC',
-            'priority': 't.priority ASC', 'from': '"from" ASC', 'updatedAt': 't.updatedAt DESC',
-        }
 
-        if filters.get('groupBy') in group_by_map:
-            sort_expressions.append(group_by_map[filters.get('groupBy')])
 
-        sort_by_expression = sort_by_map.get(filters.get('sortBy'), 't.updatedAt DESC')
+    def _task_filter_sql(self, filters, username, schema='main'):
+        """
+        Translates the load_tasks_summary filter language into SQL.
+        Returns (from_sql, where_sql, args, match_expression); the FROM clause exposes tasks as t,
+        status as s and origin as o, plus tasks_fts when a search term is present.
+        With schema=ARCHIVE_SCHEMA the same names refer to the archived tasks.
+        """
+        # ';'-separated search terms are matched through the tasks_fts full-text index
+        match_expression = build_match_expression((filters.get('q') or '').strip())
+        prefix = '' if schema == 'main' else f"{schema}."
+
+        if match_expression:
+            from_sql = f"""{prefix}tasks_fts AS tasks_fts
+                JOIN {prefix}tasks t ON t.rowid = tasks_fts.rowid
+                LEFT JOIN status s ON t.status = s.id
+                LEFT JOIN origin o ON t.origin = o.id"""
+            conditions = ["tasks_fts MATCH ?", "t.creator = ?"]
+            args = [match_expression, username]
+        else:
+            from_sql = f"""{prefix}tasks t
+                LEFT JOIN status s ON t.status = s.id
+                LEFT JOIN origin o ON t.origin = o.id"""
+            conditions = ["t.creator = ?"]
+            args = [username]
+
+        for condition, condition_args in self._value_filter_sql(filters, prefix).values():
+            conditions.append(condition)
+            args.extend(condition_args)
+
+        if 'groupKey' in filters:
+            condition = self._group_condition(filters.get('groupBy'), filters.get('groupKey'), prefix)
+            if condition is None:
+                conditions.append("0")  # Unknown groupBy: no group to show
+            else:
+                conditions.append(condition[0])
+                args.extend(condition[1])
+
+        # Columns hold canonical ISO strings (see date_utils), so ranges compare the raw column
+        # against bounds and can be answered from the (creator, <date column>) indexes.
+        def add_date_filter(column_name, from_date, to_date, is_timestamp=False):
+            if not from_date and not to_date:
+                return
+            condition = range_condition(column_name, from_date, to_date, is_timestamp)
+            if condition is None:
+                # Unparseable bound: like date(?) returning NULL before, nothing matches
+                conditions.append("0")
+                return
+            conditions.append(condition[0])
+            args.extend(condition[1])
+
+        add_date_filter('t.createdAt', filters.get('createdRF'), filters.get('createdRT'), is_timestamp=True)
+        add_date_filter('t.updatedAt', filters.get('updatedRF'), filters.get('updatedRT'), is_timestamp=True)
+        add_date_filter('t.deadline', filters.get('deadlineRF'), filters.get('deadlineRT'))
+        add_date_filter('t.finishDate', filters.get('finishedRF'), filters.get('finishedRT'))
+
+        if filters.get('hasFinishDate') == 'false':
+            conditions.append("t.finishDate IS NULL")
+
+        return from_sql, " AND ".join(conditions), args, match_expression
 
-        if sort_by_expression not in sort_expressions:
-            sort_expressions.append(sort_by_expression)
+    def _value_filter_sql(self, filters, prefix=''):
+        """The category/status/from multi-select filters as {filter name: (condition, args)}, for the ones that are set."""
+        conditions = {}
+        if filters.get('categories'):
+            category_placeholders = ','.join('?' * len(filters.get('categories')))
+            conditions['categories'] = (
+                f"t.id IN (SELECT task_id FROM {prefix}task_categories WHERE category IN ({category_placeholders}))",
+                list(filters.get('categories')))
 
-        if not sort_expressions:
-            sort_expressions.append('t.updatedAt DESC')
+        if filters.get('statuses'):
+            status_placeholders = ','.join('?' * len(filters.get('statuses')))
+            conditions['statuses'] = (f"s.description IN ({status_placeholders})", list(filters.get('statuses')))
 
+        if filters.get('froms'):
+            from_placeholders = ','.join('?' * len(filters.get('froms')))
+            conditions['froms'] = (f"o.description IN ({from_placeholders})", list(filters.get('froms')))
+        return conditions
+
+    def _group_condition(self, group_by, key, prefix=''):
+        """(condition, args) selecting the tasks of one get_task_facets group, or None for an unknown groupBy."""
+        if group_by == 'category':
+            if key is None:
+                return f"NOT EXISTS (SELECT 1 FROM {prefix}task_categories WHERE task_id = t.id)", []
+            return f"t.id IN (SELECT task_id FROM {prefix}task_categories WHERE category = ?)", [key]
+        expression = TASK_GROUP_KEYS.get(group_by)
+        if expression is None:
+            return None
+        column = TASK_GROUP_COLUMNS.get(group_by)
+        if column is None:
+            return f"{expression} IS ?", [key]
+        if key is None:
+            return f"{column} IS NULL", []
+        # Year/month keys are prefixes of the ISO dates; '~' sorts after every character of a date,
+        # so this range keeps the (creator, <date column>) indexes usable
+        return f"{column} >= ? AND {column} < ?", [str(key), f"{key}~"]
+
+    def _summary_includes_archive(self, cursor, filters, username):
+        """
+        Whether load_tasks_summary has to look at the user's archived tasks: when asked to
+        (filters['includeArchived']) or when a finished-date range reaches back into the archive.
+        """
+        if filters.get('hasFinishDate') == 'false':
+            return False  # Archived tasks are finished by definition
+        if not filters.get('includeArchived') and not filters.get('finishedRF') and not filters.get('finishedRT'):
+            return False
+        newest = newest_archived(cursor, username, 'finishDate')
+        if newest is None:
+            return False
+        if filters.get('includeArchived') or not filters.get('finishedRF'):
+            return True
+        return normalize_date(filters.get('finishedRF')) <= newest
 
 
-        sql_query += " ORDER BY " + ", ".join(sort_expressions)
-        sql_query += " LIMIT ? OFFSET ?"
-        query_args.extend([pagination.get('limit', 10), pagination.get('offset', 0)])        
 
-        cursor.execute(sql_query, query_args)
-        rows = cursor.fetchall()
-        conn.close()
+    def _summary_order_keys(self, filters, searching=False):
+        """Returns the ORDER BY of load_tasks_summary as (expression, direction) pairs, ending with the id tiebreaker."""
+        def nulls_last(column):
+            return [(f"({column} IS NULL)", 'ASC'), (column, 'ASC')]
 
-        tasks_summary = []
+        group_by_map = {
+            'priority': [('t.priority', 'ASC')], 'from': [('o.description', 'ASC')], 'status': [('s.description', 'ASC')],
+            'deadlineYear': nulls_last('t.deadline'), 'deadlineMonthYear': nulls_last('t.deadline'),
+            'finishDateYear': nulls_last('t.finishDate'), 'finishDateMonthYear': nulls_last('t.finishDate'),
+            'createdAtYear': nulls_last('t.createdAt'), 'createdAtMonthYear': nulls_last('t.createdAt'),
+        }
 
-        columns = [description[0] for description in cursor.description]
+        sort_by_map = {
+            'deadline': nulls_last('t.deadline'),
+            'priority': [('t.priority', 'ASC')], 'from': [('o.description', 'ASC')], 'updatedAt': [('t.updatedAt', 'DESC')],
+        }
 
-        for row in rows:
-            task_data = dict(zip(columns, row))
-            if 'categories' in task_data and task_data['categories']:
-                try:
-                    task_data['categories'] = json.loads(task_data['categories'])
-                except json.JSONDecodeError:
-                    task_data['categories'] = []
-            tasks_summary.append(task_data)
+        if searching:
+            # bm25() scores are negative; the most relevant match has the lowest value
+            sort_by_map['relevance'] = [(RANK_EXPRESSION, 'ASC')]
 
-        return tasks_summary
+        order_keys = list(group_by_map.get(filters.get('groupBy'), []))
 
+        for key in sort_by_map.get(filters.get('sortBy'), [('t.updatedAt', 'DESC')]):
+            if key not in order_keys:
+                order_keys.append(key)
 
+        # Stable tiebreaker so equal sort values never swap places between pages
+        order_keys.append(('t.id', order_keys[-1][1]))
+        return order_keys
 
-    def _get_or_create_status_id(self, cursor, status_desc):
-        if not status_desc:
-            return None
 
-        cursor.execute("SELECT id FROM status WHERE description = ?", (status_desc,))
-        result = cursor.fetchone()
 
-        if result:
-            return result[0]
-        else:
-            cursor.execute("INSERT INTO status (description) VALUES (?)", (status_desc,))
-            return cursor.lastrowid
+    def _get_or_create_status_id(self, cursor, status_desc):
+        return _status_lookup.get_id(cursor, status_desc)
 
     def _get_or_create_origin_id(self, cursor, origin_desc):
-        if not origin_desc:
-            return None
+        return _origin_lookup.get_id(cursor, origin_desc)
 
-        cursor.execute("SELECT id FROM origin WHERE description = ?", (origin_desc,))
-        result = cursor.fetchone()
-
-        if result:
-            return result[0]
-        else:
-            cursor.execute("INSERT INTO origin (description) VALUES (?)", (origin_desc,))
-            return cursor.lastrowid
+    def _replace_task_categories(self, cursor, task_id, categories):
+        cursor.execute("DELETE FROM task_categories WHERE task_id = ?", (task_id,))
+        rows = [(task_id, cat) for cat in set(categories or []) if isinstance(cat, str) and cat]
+        cursor.executemany("INSERT INTO task_categories (task_id, category) VALUES (?, ?)", rows)
 
     def save_task(self, token, task):
         username = self._get_authenticated_username(token)
@@ -335,36 +786,96 @@ class Api:
             return {"error": "Authentication required."}
 
         conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        # Editing an archived task brings it back; the archive job moves it out again if it stays finished
+        restore_tasks(cursor, username, [task['id']])
+        if self._foreign_task_ids(cursor, username, [task['id']]):
+            conn.close()
+            return {"error": "Task not found or unauthorized."}
         status_id = self._get_or_create_status_id(cursor, task.get('status'))
         origin_id = self._get_or_create_origin_id(cursor, task.get('from'))
 
-        categories_json = json.dumps(task.get('categories', []))
-        attachments_json = json.dumps(task.get('attachments', []))
-
-        cursor.execute('''
-            INSERT OR REPLACE INTO tasks (
-                id, creator, title, origin, priority, deadline, finishDate, status,
-                description, notes, categories, attachments, createdAt, updatedAt, difficulty
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            task['id'], username, task.get('title'), origin_id, task.get('priority'),
-            task.get('deadline'), task.get('finishDate'), status_id,
-            task.get('description'), task.get('notes'), categories_json, attachments_json,
-            task.get('createdAt'), task.get('updatedAt'), task.get('difficulty', 5)
-        ))
+        cursor.execute(TASK_UPSERT_SQL, _task_params(task, username, status_id, origin_id))
+        self._replace_task_categories(cursor, task['id'], task.get('categories', []))
+        try:
+            replace_task_attachments(cursor, username, task['id'], task.get('attachments'))
+        except ValueError as e:
+            conn.rollback()
+            conn.close()
+            return {"error": str(e)}
         conn.commit()
         conn.close()
+        _dashboard_cache.clear()
         return {"message": "Task saved successfully."}
 
+    def patch_task(self, token, taskId, changes, expectedUpdatedAt):
+        """
+        Updates only the fields in changes (same names as in save_task, updatedAt excluded) with one
+        UPDATE, provided the task still has the updatedAt the client loaded (expectedUpdatedAt).
+        Otherwise nothing is written and {"error", "conflict": True, "current": <task>} comes back,
+        so an edit from another client is never silently overwritten.
+        Returns {"message", "updatedAt"} with the task's new updatedAt.
+        """
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
+        allowed = set(TASK_PATCH_COLUMNS) | {'status', 'from', 'attachments'}
+        if not isinstance(changes, dict) or not changes.keys() <= allowed:
+            return {"error": f"changes may only contain: {', '.join(sorted(allowed))}."}
+
+        updated_at = format_timestamp(datetime.now(timezone.utc))
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        restore_tasks(cursor, username, [taskId])
+        terms, values = _patch_assignments(changes, TASK_PATCH_COLUMNS)
+        if 'status' in changes:
+            terms.append("status = ?")
+            values.append(self._get_or_create_status_id(cursor, changes['status']))
+        if 'from' in changes:
+            terms.append("origin = ?")
+            values.append(self._get_or_create_origin_id(cursor, changes['from']))
+        terms.append("updatedAt = ?")
+        values.append(updated_at)
+
+        cursor.execute(
+            f"UPDATE tasks SET {', '.join(terms)} WHERE id = ? AND creator = ? AND updatedAt IS ?",
+            values + [taskId, username, normalize_timestamp(expectedUpdatedAt)]
+        )
+        if cursor.rowcount == 0:
+            conn.rollback()
+            conn.close()
+            current = self.load_task(token, taskId)
+            if 'error' in current:
+                return {"error": "Task not found or unauthorized."}
+            return {"error": "Task was changed by someone else.", "conflict": True, "current": current}
+
+        if 'categories' in changes:
+            self._replace_task_categories(cursor, taskId, changes['categories'])
+        if 'attachments' in changes:
+            try:
+                replace_task_attachments(cursor, username, taskId, changes['attachments'])
+            except ValueError as e:
+                conn.rollback()
+                conn.close()
+                return {"error": str(e)}
+        conn.commit()
+        conn.close()
+        _dashboard_cache.clear()
+        return {"message": "Task updated.", "updatedAt": updated_at}
+
     def delete_task(self, token, taskId):
         username = self._get_authenticated_username(token)
         if not username: 
             return {"error": "Authentication required."}
 
         conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        # Back into the main tables first, so the delete leaves a sync tombstone like any other
+        restore_tasks(cursor, username, [taskId])
         cursor.execute("DELETE FROM tasks WHERE id = ? AND creator = ?", (taskId, username))
+        if cursor.rowcount > 0:
+            cursor.execute("DELETE FROM task_categories WHERE task_id = ?", (taskId,))
+            delete_task_attachments(cursor, taskId)
         conn.commit()
         conn.close()
+        _dashboard_cache.clear()
         return {"message": "Task deleted successfully."}
 
 
@@ -374,15 +885,15 @@ class Api:
         if not username: 
             return {"error": "Authentication required."}
         conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
-        cursor.execute("SELECT id FROM tasks WHERE id = ? AND creator = ?", (taskId, username))
+        schema = task_schema(cursor, username, taskId)
 
-        if not cursor.fetchone():
+        if not schema:
             conn.close()
             return {"error": "Task not found or unauthorized."}
 
-        query = """
+        query = f"""
             SELECT m.*, s.description as status
-            FROM milestones m
+            FROM {schema}.milestones m
             LEFT JOIN status s ON m.status = s.id
             WHERE m.taskId = ?
         """
@@ -394,10 +905,7 @@ class Api:
         columns = [description[0] for description in cursor.description]
 
         for row in rows:
-            milestone_data = dict(zip(columns, row))
-            if 'notes' in milestone_data and milestone_data['notes']:
-                milestone_data['notes'] = json.loads(milestone_data['notes'])
-            milestones.append(milestone_data)
+            milestones.append(_milestone_row_to_dict(columns, row))
         return milestones
 
 
@@ -406,43 +914,268 @@ class Api:
         username = self._get_authenticated_username(token)
         if not username: return {"error": "Authentication required."}
         conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        restore_tasks(cursor, username, [taskId])
         cursor.execute("SELECT id FROM tasks WHERE id = ? AND creator = ?", (taskId, username))
         if not cursor.fetchone():
             conn.close()
             return {"error": "Task not found or unauthorized."}
+        foreign = self._foreign_milestone_id(cursor, taskId, [milestone['id']])
+        if foreign:
+            conn.close()
+            return {"error": f"Milestone '{foreign}' belongs to another task."}
         status_id = self._get_or_create_status_id(cursor, milestone.get('status'))
-        notes_json = json.dumps(milestone.get('notes', ''))
-
-        cursor.execute('''
-            INSERT OR REPLACE INTO milestones (
-                id, taskId, title, deadline, finishDate, status, parentId, notes, updatedAt
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            milestone['id'], taskId, milestone.get('title'), milestone.get('deadline'),
-            milestone.get('finishDate'), status_id, milestone.get('parentId'),
-            notes_json, milestone.get('updatedAt')
-        ))
+
+        cursor.execute(MILESTONE_UPSERT_SQL, _milestone_params(milestone, taskId, status_id))
+        error = self._check_milestone_parents(cursor, taskId, [milestone['id']])
+        if error:
+            conn.rollback()
+            conn.close()
+            return {"error": error}
         conn.commit()
         conn.close()
+        _dashboard_cache.clear()
         return {"message": "Milestone saved successfully."}
 
 
 
-    def load_milestone(self, token, taskId, milestoneId):
+    def patch_milestone(self, token, taskId, milestoneId, changes, expectedUpdatedAt):
+        """Milestone counterpart of patch_task; a changed parentId is validated like in save_milestone."""
         username = self._get_authenticated_username(token)
         if not username:
             return {"error": "Authentication required."}
+        allowed = set(MILESTONE_PATCH_COLUMNS) | {'status'}
+        if not isinstance(changes, dict) or not changes.keys() <= allowed:
+            return {"error": f"changes may only contain: {', '.join(sorted(allowed))}."}
 
+        updated_at = format_timestamp(datetime.now(timezone.utc))
         conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        restore_tasks(cursor, username, [taskId])
         cursor.execute("SELECT id FROM tasks WHERE id = ? AND creator = ?", (taskId, username))
+        if not cursor.fetchone():
+            conn.close()
+            return {"error": "Task not found or unauthorized."}
+
+        terms, values = _patch_assignments(changes, MILESTONE_PATCH_COLUMNS)
+        if 'status' in changes:
+            terms.append("status = ?")
+            values.append(self._get_or_create_status_id(cursor, changes['status']))
+        terms.append("updatedAt = ?")
+        values.append(updated_at)
 
+        cursor.execute(
+            f"UPDATE milestones SET {', '.join(terms)} WHERE id = ? AND taskId = ? AND updatedAt IS ?",
+            values + [milestoneId, taskId, normalize_timestamp(expectedUpdatedAt)]
+        )
+        if cursor.rowcount == 0:
+            conn.rollback()
+            conn.close()
+            current = self.load_milestone(token, taskId, milestoneId)
+            if 'error' in current:
+                return current
+            return {"error": "Milestone was changed by someone else.", "conflict": True, "current": current}
+
+        if 'parentId' in changes:
+            error = self._check_milestone_parents(cursor, taskId, [milestoneId])
+            if error:
+                conn.rollback()
+                conn.close()
+                return {"error": error}
+        conn.commit()
+        conn.close()
+        _dashboard_cache.clear()
+        return {"message": "Milestone updated.", "updatedAt": updated_at}
+
+
+
+    def _foreign_milestone_id(self, cursor, taskId, milestone_ids):
+        """Ids are global, so a save must not take over a milestone of another task: returns the first such id, or None."""
+        placeholders = ','.join('?' * len(milestone_ids))
+        cursor.execute(f"""
+            SELECT id FROM main.milestones WHERE id IN ({placeholders}) AND taskId != ?
+            UNION ALL
+            SELECT id FROM {ARCHIVE_SCHEMA}.milestones WHERE id IN ({placeholders}) AND taskId != ?
+            LIMIT 1
+        """, milestone_ids + [taskId] + milestone_ids + [taskId])
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def _check_milestone_parents(self, cursor, taskId, milestone_ids):
+        """Validates the parent links of freshly written milestones. Returns an error message or None."""
+        invalid = find_invalid_parents(cursor, taskId, milestone_ids)
+        if invalid:
+            return f"Parent milestone of '{invalid[0]}' does not exist in this task."
+        cycle = find_cycle(cursor, taskId, milestone_ids)
+        if cycle:
+            return f"Cannot save milestone '{cycle}': it would become its own ancestor."
+        return None
+
+
+
+    def save_milestones(self, token, taskId, milestones):
+        """
+        Saves several milestones of one task in a single transaction, e.g. a reparenting that touches
+        multiple nodes. Parent links are validated on the final state, so milestones in the batch may
+        refer to each other; if any link is invalid or forms a cycle nothing is saved.
+        """
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
+        if not isinstance(milestones, list) or not all(isinstance(m, dict) and m.get('id') for m in milestones):
+            return {"error": "milestones must be a list of milestones with ids."}
+        if len(milestones) > MAX_IN_PARAMS:
+            return {"error": f"At most {MAX_IN_PARAMS} milestones can be saved per call."}
+
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        restore_tasks(cursor, username, [taskId])
+        cursor.execute("SELECT id FROM tasks WHERE id = ? AND creator = ?", (taskId, username))
         if not cursor.fetchone():
             conn.close()
             return {"error": "Task not found or unauthorized."}
 
-        query = """
+        ids = [m['id'] for m in milestones]
+        foreign = self._foreign_milestone_id(cursor, taskId, ids)
+        if foreign:
+            conn.close()
+            return {"error": f"Milestone '{foreign}' belongs to another task."}
+
+        try:
+            status_ids = {m.get('status'): self._get_or_create_status_id(cursor, m.get('status')) for m in milestones}
+            cursor.executemany(MILESTONE_UPSERT_SQL, [
+                _milestone_params(m, taskId, status_ids[m.get('status')]) for m in milestones
+            ])
+            error = self._check_milestone_parents(cursor, taskId, ids)
+            if error:
+                conn.rollback()
+                return {"error": error}
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            return {"error": f"Could not save milestones: {e}"}
+        finally:
+            conn.close()
+        _dashboard_cache.clear()
+        return {"message": f"Saved {len(milestones)} milestones.", "count": len(milestones)}
+
+
+
+    def delete_milestones(self, token, taskId, milestoneIds, options={}):
+        """
+        Deletes several milestones of one task in a single transaction.
+        options['children'] decides what happens to remaining children of deleted milestones:
+        'error' (default) refuses the delete, 'reparent' moves them to their nearest surviving
+        ancestor (or makes them roots), 'delete' removes the whole subtrees as well.
+        """
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
+        mode = options.get('children', 'error')
+        if mode not in ('error', 'reparent', 'delete'):
+            return {"error": "children must be 'error', 'reparent' or 'delete'."}
+        if not isinstance(milestoneIds, list) or not milestoneIds:
+            return {"error": "milestoneIds must be a non-empty list."}
+        if len(milestoneIds) > MAX_IN_PARAMS:
+            return {"error": f"At most {MAX_IN_PARAMS} milestones can be deleted per call."}
+
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        try:
+            restore_tasks(cursor, username, [taskId])
+            cursor.execute("SELECT id FROM tasks WHERE id = ? AND creator = ?", (taskId, username))
+            if not cursor.fetchone():
+                return {"error": "Task not found or unauthorized."}
+
+            to_delete = set(milestoneIds)
+            if mode == 'delete':
+                to_delete = load_subtree_ids(cursor, taskId, milestoneIds)
+
+            cursor.execute("SELECT id, parentId FROM milestones WHERE taskId = ?", (taskId,))
+            parents = dict(cursor.fetchall())
+            to_delete &= set(parents)
+            orphans = [m for m, parent in parents.items() if parent in to_delete and m not in to_delete]
+
+            if orphans and mode == 'error':
+                return {"error": f"Cannot delete milestones: '{orphans[0]}' is a child of a deleted milestone."}
+
+            reparented = []
+            for orphan in orphans:
+                # Nearest ancestor that survives the delete, or none
+                _, ancestors = load_ancestors(cursor, taskId, orphan)
+                new_parent = next((row[0] for row in ancestors if row[0] not in to_delete), None)
+                reparented.append((new_parent, orphan))
+            cursor.executemany("UPDATE milestones SET parentId = ? WHERE id = ?", reparented)
+
+            ids = sorted(to_delete)
+            for chunk_start in range(0, len(ids), MAX_IN_PARAMS):
+                chunk = ids[chunk_start:chunk_start + MAX_IN_PARAMS]
+                cursor.execute(f"DELETE FROM milestones WHERE taskId = ? AND id IN ({','.join('?' * len(chunk))})", [taskId] + chunk)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            return {"error": f"Could not delete milestones: {e}"}
+        finally:
+            conn.close()
+        _dashboard_cache.clear()
+        return {
+            "message": f"Deleted {len(to_delete)} milestones.",
+            "deleted": sorted(to_delete),
+            "reparented": {orphan: parent for parent, orphan in reparented},
+        }
+
+
+
+    def get_milestone_tree(self, token, taskId, rootId=None):
+        """
+        Returns the milestones of a task (or the subtree under rootId) in depth-first order, each with
+        'depth' (its layer in the graph, 0 for roots) and 'childCount'.
+        """
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
+
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        schema = task_schema(cursor, username, taskId)
+        if not schema:
+            conn.close()
+            return {"error": "Task not found or unauthorized."}
+
+        columns, rows = load_tree(cursor, taskId, rootId, table=f"{schema}.milestones")
+        conn.close()
+        return [_milestone_row_to_dict(columns, row) for row in rows]
+
+
+
+    def get_milestone_ancestors(self, token, taskId, milestoneId):
+        """Returns the chain of ancestors of a milestone, nearest first, each with its 'distance'."""
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
+
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        schema = task_schema(cursor, username, taskId)
+        if not schema:
+            conn.close()
+            return {"error": "Task not found or unauthorized."}
+
+        columns, rows = load_ancestors(cursor, taskId, milestoneId, table=f"{schema}.milestones")
+        conn.close()
+        return [_milestone_row_to_dict(columns, row) for row in rows]
+
+
+
+    def load_milestone(self, token, taskId, milestoneId):
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
+
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        schema = task_schema(cursor, username, taskId)
+
+        if not schema:
+            conn.close()
+            return {"error": "Task not found or unauthorized."}
+
+        query = f"""
             SELECT m.*, s.description as status
-            FROM milestones m
+            FROM {schema}.milestones m
             LEFT JOIN status s ON m.status = s.id
             WHERE m.id = ? AND m.taskId = ?
         """
@@ -453,10 +1186,7 @@ class Api:
 
         if row:
             columns = [description[0] for description in cursor.description]
-            milestone_data = dict(zip(columns, row))
-            if 'notes' in milestone_data and milestone_data['notes']:
-                milestone_data['notes'] = json.loads(milestone_data['notes'])
-            return milestone_data
+            return _milestone_row_to_dict(columns, row)
 
         return {"error": "Milestone not found."}
 
@@ -468,6 +1198,7 @@ class Api:
             return {"error": "Authentication required."}
 
         conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        restore_tasks(cursor, username, [taskId])
         cursor.execute("SELECT id FROM tasks WHERE id = ? AND creator = ?", (taskId, username))
 
         if not cursor.fetchone():
@@ -483,6 +1214,7 @@ class Api:
         cursor.execute("DELETE FROM milestones WHERE id = ? AND taskId = ?", (milestoneId, taskId))
         conn.commit()
         conn.close()
+        _dashboard_cache.clear()
         return {"message": "Milestone deleted successfully."}
 
 
@@ -493,22 +1225,10 @@ class Api:
         if not username: 
             return {"error": "Authentication required."}
 
-        if not only_active:
-            conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
-            cursor.execute("SELECT description FROM status ORDER BY description")
-            statuses = [row[0] for row in cursor.fetchall()]
-            conn.close()
-            return statuses
-        else:
-            conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
-            cursor.execute("""
-                SELECT distinct s.description FROM status s
-                JOIN tasks on s.id = tasks.status 
-                ORDER BY s.description
-            """)
-            statuses = [row[0] for row in cursor.fetchall()]
-            conn.close()
-            return statuses
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        statuses = _status_lookup.descriptions(cursor, only_active)
+        conn.close()
+        return statuses
 
 
 
@@ -519,22 +1239,10 @@ class Api:
         if not username:
             return {"error": "Authentication required."}
 
-        if not only_active:
-            conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
-            cursor.execute("SELECT description FROM origin ORDER BY description")
-            from_values = [row[0] for row in cursor.fetchall()]
-            conn.close()
-            return from_values
-        else:
-            conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
-            cursor.execute("""
-                SELECT distinct o.description FROM origin o
-                JOIN tasks on o.id = tasks.origin 
-                ORDER BY o.description
-            """)
-            from_values = [row[0] for row in cursor.fetchall()]
-            conn.close()
-            return from_values
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        from_values = _origin_lookup.descriptions(cursor, only_active)
+        conn.close()
+        return from_values
 
     def delete_from_values(self, token, originDesc):
         username = self._get_authenticated_username(token)
@@ -545,7 +1253,7 @@ class Api:
         conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
 
         # Check if the origin is currently in use by any task
-        cursor.execute("SELECT COUNT(*) FROM tasks WHERE origin = (SELECT id FROM origin WHERE description = ?)", (originDesc,))
+        cursor.execute(f"SELECT COUNT(*) FROM {ALL_TASKS_SQL} WHERE origin = (SELECT id FROM origin WHERE description = ?)", (originDesc,))
         if cursor.fetchone()[0] > 0:
             conn.close()
             return {"error": "Cannot delete origin: it is currently in use by one or more tasks."}
@@ -566,12 +1274,15 @@ class Api:
         conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
 
         # Check if the status is currently in use by any task or milestone
-        cursor.execute("SELECT COUNT(*) FROM tasks WHERE status = (SELECT id FROM status WHERE description = ?)", (statusDesc,))
+        cursor.execute(f"SELECT COUNT(*) FROM {ALL_TASKS_SQL} WHERE status = (SELECT id FROM status WHERE description = ?)", (statusDesc,))
         if cursor.fetchone()[0] > 0:
             conn.close()
             return {"error": "Cannot delete status: it is currently in use by one or more tasks."}
         
-        cursor.execute("SELECT COUNT(*) FROM milestones WHERE status = (SELECT id FROM status WHERE description = ?)", (statusDesc,))
+        cursor.execute(f"""
+            SELECT (SELECT COUNT(*) FROM main.milestones WHERE status = (SELECT id FROM status WHERE description = ?))
+                 + (SELECT COUNT(*) FROM {ARCHIVE_SCHEMA}.milestones WHERE status = (SELECT id FROM status WHERE description = ?))
+        """, (statusDesc, statusDesc))
         if cursor.fetchone()[0] > 0:
             conn.close()
             return {"error": "Cannot delete status: it is currently in use by one or more milestones."}
@@ -588,21 +1299,21 @@ class Api:
         if not username:
             return {"error": "Authentication required."}
 
-        all_categories = set()
         conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
-        cursor.execute("SELECT categories FROM tasks WHERE creator = ? AND categories IS NOT NULL AND categories != ''", (username,))
-        rows = cursor.fetchall()
+        # Categories only archived tasks still use are listed too, so they can be filtered on
+        cursor.execute(f"""
+            SELECT tc.category FROM main.task_categories tc
+            JOIN main.tasks t ON t.id = tc.task_id
+            WHERE t.creator = ?
+            UNION
+            SELECT tc.category FROM {ARCHIVE_SCHEMA}.task_categories tc
+            JOIN {ARCHIVE_SCHEMA}.tasks t ON t.id = tc.task_id
+            WHERE t.creator = ?
+            ORDER BY 1
+        """, (username, username))
+        categories = [row[0] for row in cursor.fetchall()]
         conn.close()
-
-        for row in rows:
-            try:
-                categories_list = json.loads(row[0])
-                if isinstance(categories_list, list):
-                    all_categories.update(categories_list)
-            except (json.JSONDecodeError, TypeError):
-                continue
-
-        return sorted(list(all_categories))
+        return categories
 
 
 
@@ -611,23 +1322,848 @@ class Api:
         if not username:
             return {"error": "Authentication required."}
 
+        since_timestamp = None
+        if since and since.isdigit():
+            since_timestamp = format_timestamp(datetime.now(timezone.utc) - timedelta(days=int(since)))
+
         conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
-        sql_query = """
+        sql_query = f"""
             SELECT s.description, COUNT(t.id) 
-            FROM tasks t
+            FROM {self._tasks_source(cursor, username, 'updatedAt', since_timestamp)} t
             JOIN status s ON t.status = s.id
             WHERE t.creator = ?
         """
 
         query_args = [username]
 
-        if since and since.isdigit():
-            since_date = datetime.utcnow() - timedelta(days=int(since))
+        if since_timestamp:
             sql_query += " AND t.updatedAt >= ?"
-            query_args.append(since_date.isoformat())
+            query_args.append(since_timestamp)
 
         sql_query += " GROUP BY s.description"
         cursor.execute(sql_query, query_args)
         rows = cursor.fetchall()
         conn.close()
         return {status: count for status, count in rows}
+
+    def _tasks_source(self, cursor, username, column, lower_bound=None):
+        """
+        What to select tasks FROM when only rows with column >= lower_bound count: "tasks", or
+        ALL_TASKS_SQL if some of the user's archived tasks can match too.
+        """
+        newest = newest_archived(cursor, username, column)
+        if newest is None or (lower_bound is not None and newest < lower_bound):
+            return "tasks"
+        return ALL_TASKS_SQL
+
+
+
+    def get_dashboard(self, token, window_days=21, options={}):
+        """
+        Everything the statistics page shows, computed in SQL on one connection: task counts by status,
+        due-soon and overdue tasks, and tasks updated/finished in the last window_days grouped by week.
+        Counts are exact; the task lists are capped at DASHBOARD_LIST_LIMIT entries each.
+        Pass options {'refresh': True} to skip the short-lived result cache.
+        """
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
+
+        try:
+            window_days = int(window_days)
+        except (TypeError, ValueError):
+            return {"error": "window_days must be a number."}
+        if not 1 <= window_days <= 366:
+            return {"error": "window_days must be between 1 and 366."}
+
+        now = datetime.now(timezone.utc)
+        # deadline/finishDate are calendar days picked by the user, so compare them with the local date
+        today = datetime.now().date()
+        cache_key = (username, window_days, today.isoformat())
+        if not options.get('refresh'):
+            cached = _dashboard_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        try:
+            cursor.execute(f"""
+                SELECT s.description, COUNT(t.id)
+                FROM {self._tasks_source(cursor, username, 'updatedAt')} t
+                JOIN status s ON t.status = s.id
+                WHERE t.creator = ?
+                GROUP BY s.description
+            """, (username,))
+            status_counts = {status: count for status, count in cursor.fetchall()}
+
+            due_soon = self._dashboard_task_list(cursor, """
+                t.creator = ? AND t.finishDate IS NULL AND t.deadline >= ? AND t.deadline <= ?
+            """, [username, today.isoformat(), (today + timedelta(days=DUE_SOON_DAYS)).isoformat()], "t.deadline ASC")
+
+            overdue = self._dashboard_task_list(cursor, """
+                t.creator = ? AND t.finishDate IS NULL AND t.deadline < ?
+            """, [username, today.isoformat()], "t.deadline ASC")
+
+            week_count = (window_days + 6) // 7
+            updated_since = format_timestamp(now - timedelta(days=window_days))
+            updated_by_week = self._dashboard_weekly_lists(cursor, """
+                t.creator = ? AND t.updatedAt >= ?
+            """, [username, updated_since],
+                "CAST((julianday(?) - julianday(t.updatedAt)) / 7 AS INTEGER)", [format_timestamp(now)],
+                "updatedAt", week_count, window_days,
+                self._tasks_source(cursor, username, 'updatedAt', updated_since))
+
+            # A task finished today is 0 days old, so the window holds window_days calendar days
+            finished_after = (today - timedelta(days=window_days)).isoformat()
+            finished_by_week = self._dashboard_weekly_lists(cursor, """
+                t.creator = ? AND t.finishDate > ?
+            """, [username, finished_after],
+                "CAST((julianday(?) - julianday(t.finishDate)) / 7 AS INTEGER)", [today.isoformat()],
+                "finishDate", week_count, window_days,
+                self._tasks_source(cursor, username, 'finishDate', finished_after))
+
+            upcoming_milestones = self._dashboard_milestone_list(cursor, {
+                'deadlineRF': today.isoformat(),
+                'deadlineRT': (today + timedelta(days=DUE_SOON_DAYS)).isoformat(),
+                'hasFinishDate': 'false',
+            }, username)
+            overdue_milestones = self._dashboard_milestone_list(cursor, {
+                'deadlineRT': (today - timedelta(days=1)).isoformat(),
+                'hasFinishDate': 'false',
+            }, username)
+        finally:
+            conn.close()
+
+        dashboard = {
+            "generatedAt": format_timestamp(now),
+            "windowDays": window_days,
+            "statusCounts": status_counts,
+            "dueSoon": due_soon,
+            "overdue": overdue,
+            "updatedByWeek": updated_by_week,
+            "finishedByWeek": finished_by_week,
+            "upcomingMilestones": upcoming_milestones,
+            "overdueMilestones": overdue_milestones,
+        }
+        _dashboard_cache.set(cache_key, dashboard)
+        return dashboard
+
+    def _dashboard_task_list(self, cursor, where_sql, args, order_sql):
+        """Returns {"count": exact total, "tasks": first DASHBOARD_LIST_LIMIT summaries}."""
+        cursor.execute(f"""
+            SELECT {DASHBOARD_TASK_COLUMNS}, COUNT(*) OVER () as _total
+            FROM tasks t
+            LEFT JOIN status s ON t.status = s.id
+            LEFT JOIN origin o ON t.origin = o.id
+            WHERE {where_sql}
+            ORDER BY {order_sql}, t.id
+            LIMIT ?
+        """, args + [DASHBOARD_LIST_LIMIT])
+        columns = [description[0] for description in cursor.description]
+        rows = cursor.fetchall()
+        tasks = [_task_row_to_dict(columns[:-1], row[:-1]) for row in rows]
+        return {"count": rows[0][-1] if rows else 0, "tasks": tasks}
+
+    def _dashboard_milestone_list(self, cursor, filters, username):
+        """Returns {"count": exact total, "milestones": first DASHBOARD_LIST_LIMIT} for query_milestones filters."""
+        where_sql, args = self._milestone_filter_sql(filters, username)
+        sources = self._milestone_sources(cursor, username)
+        arms = ' UNION ALL '.join(f"SELECT {MILESTONE_SUMMARY_COLUMNS} FROM {source} WHERE {where_sql}" for source in sources)
+        cursor.execute(f"""
+            SELECT *, COUNT(*) OVER () as _total
+            FROM ({arms})
+            ORDER BY deadline, id
+            LIMIT ?
+        """, args * len(sources) + [DASHBOARD_LIST_LIMIT])
+        columns = [description[0] for description in cursor.description][:-1]
+        rows = cursor.fetchall()
+        return {"count": rows[0][-1] if rows else 0, "milestones": [dict(zip(columns, row[:-1])) for row in rows]}
+
+    def _dashboard_weekly_lists(self, cursor, where_sql, args, week_sql, week_args, date_column, week_count, window_days,
+                                tasks_source="tasks"):
+        """Groups matching tasks into week buckets (0 = last 7 days), each with an exact count and the newest tasks by date_column."""
+        # Values right on the window edge can round into one week too many, and future dates into week -1
+        week_expression = f"MIN(MAX({week_sql}, 0), {week_count - 1})"
+        cursor.execute(f"""
+            SELECT * FROM (
+                SELECT *, COUNT(*) OVER (PARTITION BY _week) as _total,
+                       ROW_NUMBER() OVER (PARTITION BY _week ORDER BY {date_column} DESC, id) as _rn
+                FROM (
+                    SELECT {DASHBOARD_TASK_COLUMNS}, {week_expression} as _week
+                    FROM {tasks_source} t
+                    LEFT JOIN status s ON t.status = s.id
+                    LEFT JOIN origin o ON t.origin = o.id
+                    WHERE {where_sql}
+                )
+            )
+            WHERE _rn <= ?
+            ORDER BY _week, _rn
+        """, week_args + args + [DASHBOARD_LIST_LIMIT])
+        columns = [description[0] for description in cursor.description]
+
+        weeks = []
+        for week in range(week_count):
+            first_day, last_day = week * 7, min((week + 1) * 7, window_days)
+            label = f"Week {week + 1} (last 7 days)" if week == 0 else f"Week {week + 1} ({first_day}-{last_day} days ago)"
+            weeks.append({"label": label, "count": 0, "tasks": []})
+        for row in cursor.fetchall():
+            bucket = weeks[row[-3]]
+            bucket["count"] = row[-2]
+            bucket["tasks"].append(_task_row_to_dict(columns[:-3], row[:-3]))
+        return weeks
+
+
+
+    def query_milestones(self, token, filters={}, pagination={}):
+        """
+        Finds milestones across all of the user's tasks, e.g. everything overdue or due this week.
+        filters uses the load_tasks_summary language where it applies to milestones: statuses,
+        deadlineRF/RT, finishedRF/RT, updatedRF/RT, hasFinishDate, plus taskIds; sortBy is
+        'deadline' (default), 'finishDate' or 'updatedAt'. Pagination works like load_tasks_summary:
+        {'limit', 'cursor'} returns {"milestones": [...], "nextCursor": ...}, {'limit', 'offset'} a list.
+        Milestones of archived tasks are included.
+        """
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
+
+        where_sql, where_args = self._milestone_filter_sql(filters, username)
+        order_keys = self._milestone_order_keys(filters)
+        key_columns = ''.join(f", {expression} as _sk{i}" for i, (expression, _) in enumerate(order_keys))
+
+        use_cursor = 'cursor' in pagination
+        limit = pagination.get('limit', 50)
+
+        keyset_sql, keyset_args = None, []
+        if use_cursor and pagination.get('cursor'):
+            key_values = decode_page_cursor(order_keys, pagination.get('cursor'))
+            if key_values is None:
+                return {"error": "Invalid pagination cursor."}
+            keyset_sql, keyset_args = keyset_condition(order_keys, key_values)
+
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        arms = []
+        query_args = []
+        for source in self._milestone_sources(cursor, username):
+            arms.append(f"""
+                SELECT {MILESTONE_SUMMARY_COLUMNS}{key_columns}
+                FROM {source}
+                WHERE {where_sql}
+            """)
+            query_args += where_args
+            if keyset_sql:
+                arms[-1] += f" AND {keyset_sql}"
+                query_args += keyset_args
+
+        if len(arms) == 1:
+            sql_query = arms[0]
+            sql_query += " ORDER BY " + ", ".join(f"{expression} {direction}" for expression, direction in order_keys)
+        else:
+            sql_query = f"SELECT * FROM ({' UNION ALL '.join(arms)})"
+            sql_query += " ORDER BY " + ", ".join(f"_sk{i} {direction}" for i, (_, direction) in enumerate(order_keys))
+        if use_cursor:
+            sql_query += " LIMIT ?"
+            query_args.append(limit + 1)
+        else:
+            sql_query += " LIMIT ? OFFSET ?"
+            query_args.extend([limit, pagination.get('offset', 0)])
+
+        cursor.execute(sql_query, query_args)
+        rows = cursor.fetchall()
+        conn.close()
+
+        has_more = use_cursor and len(rows) > limit
+        if use_cursor:
+            rows = rows[:limit]
+
+        key_count = len(order_keys)
+        data_columns = [description[0] for description in cursor.description][:-key_count]
+        milestones = [dict(zip(data_columns, row)) for row in rows]
+
+        if use_cursor:
+            next_cursor = encode_page_cursor(order_keys, rows[-1][-key_count:]) if has_more else None
+            return {"milestones": milestones, "nextCursor": next_cursor}
+        return milestones
+
+    def _milestone_sources(self, cursor, username):
+        """
+        FROM clauses (milestones m, task t, status s) for the cross-task milestone queries: the main
+        tables, plus the archive's once the user has archived tasks. Unlike the task list these
+        always look at the archive, an archived task's open milestones are still overdue.
+        """
+        schemas = ['main']
+        if newest_archived(cursor, username, 'finishDate') is not None:
+            schemas.append(ARCHIVE_SCHEMA)
+        return [f"{schema}.milestones m JOIN {schema}.tasks t ON t.id = m.taskId LEFT JOIN main.status s ON m.status = s.id"
+                for schema in schemas]
+
+    def _milestone_filter_sql(self, filters, username):
+        """Returns (where_sql, args) for query_milestones; milestones are m, their task t and status s."""
+        conditions = ["t.creator = ?"]
+        args = [username]
+
+        if filters.get('statuses'):
+            status_placeholders = ','.join('?' * len(filters.get('statuses')))
+            conditions.append(f"s.description IN ({status_placeholders})")
+            args.extend(filters.get('statuses'))
+
+        if filters.get('taskIds'):
+            task_placeholders = ','.join('?' * len(filters.get('taskIds')))
+            conditions.append(f"m.taskId IN ({task_placeholders})")
+            args.extend(filters.get('taskIds'))
+
+        for column, from_key, to_key, is_timestamp in (
+            ('m.deadline', 'deadlineRF', 'deadlineRT', False),
+            ('m.finishDate', 'finishedRF', 'finishedRT', False),
+            ('m.updatedAt', 'updatedRF', 'updatedRT', True),
+        ):
+            if not filters.get(from_key) and not filters.get(to_key):
+                continue
+            condition = range_condition(column, filters.get(from_key), filters.get(to_key), is_timestamp)
+            if condition is None:
+                conditions.append("0")
+                continue
+            conditions.append(condition[0])
+            args.extend(condition[1])
+
+        if filters.get('hasFinishDate') == 'false':
+            conditions.append("m.finishDate IS NULL")
+        elif filters.get('hasFinishDate') == 'true':
+            conditions.append("m.finishDate IS NOT NULL")
+
+        return " AND ".join(conditions), args
+
+    def _milestone_order_keys(self, filters):
+        sort_by_map = {
+            'deadline': [("(m.deadline IS NULL)", 'ASC'), ('m.deadline', 'ASC')],
+            'finishDate': [('m.finishDate', 'DESC')],
+            'updatedAt': [('m.updatedAt', 'DESC')],
+        }
+        order_keys = list(sort_by_map.get(filters.get('sortBy'), sort_by_map['deadline']))
+        order_keys.append(('m.id', order_keys[-1][1]))
+        return order_keys
+
+
+
+    def get_changes(self, token, since_token=None, options={}):
+        """
+        Delta sync for the client-side mirror. Returns tasks and milestones written since since_token,
+        plus the ids deleted since then, as {"tasks", "milestones", "deleted": {"tasks", "milestones"},
+        "syncToken", "hasMore", "reset"}. Without a (valid) token everything is sent and "reset" tells the
+        client to drop its copy first. Call again with syncToken while hasMore is true.
+        Covers live tasks only: archive.db keeps no change_seq, so archiving a task reaches the
+        mirror as a deletion (its tombstone) and restoring it as a fresh change.
+        """
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
+
+        try:
+            limit = max(1, min(int(options.get('limit') or SYNC_PAGE_SIZE), 5000))
+        except (TypeError, ValueError):
+            return {"error": "limit must be a number."}
+
+        since = 0
+        reset = True
+        if since_token:
+            try:
+                payload = json.loads(_base64url_decode(since_token))
+                since_seq, since_user = int(payload['seq']), payload['u']
+            except Exception:
+                return {"error": "Invalid sync token."}
+            # A token from another account would leave that account's tasks in the mirror
+            if since_user == username:
+                since = since_seq
+                reset = False
+
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        try:
+            # One read transaction, so all queries see the same snapshot (inside batch() there already is one)
+            if not conn.in_transaction:
+                cursor.execute("BEGIN")
+            cursor.execute("SELECT version FROM change_counters WHERE name = ?", (SYNC_COUNTER,))
+            current = cursor.fetchone()[0]
+
+            cursor.execute("""
+                SELECT t.*, s.description as status, o.description as "from"
+                FROM tasks t
+                LEFT JOIN status s ON t.status = s.id
+                LEFT JOIN origin o ON t.origin = o.id
+                WHERE t.creator = ? AND t.change_seq > ? AND t.change_seq <= ?
+                ORDER BY t.change_seq
+                LIMIT ?
+            """, (username, since, current, limit + 1))
+            columns = [description[0] for description in cursor.description]
+            tasks = [_task_row_to_dict(columns, row) for row in cursor.fetchall()]
+
+            has_more = len(tasks) > limit
+            if has_more:
+                tasks = tasks[:limit]
+                upper = tasks[-1]['change_seq']
+            else:
+                upper = current
+
+            attachment_lists = load_attachment_lists(cursor, [task['id'] for task in tasks])
+            for task in tasks:
+                task['attachments'] = attachment_lists[task['id']]
+
+            cursor.execute("""
+                SELECT m.*, s.description as status
+                FROM milestones m
+                JOIN tasks t ON t.id = m.taskId
+                LEFT JOIN status s ON m.status = s.id
+                WHERE t.creator = ? AND m.change_seq > ? AND m.change_seq <= ?
+                ORDER BY m.change_seq
+            """, (username, since, upper))
+            columns = [description[0] for description in cursor.description]
+            milestones = [_milestone_row_to_dict(columns, row) for row in cursor.fetchall()]
+
+            deleted = {"tasks": [], "milestones": []}
+            if not reset:
+                cursor.execute("""
+                    SELECT kind, id FROM sync_tombstones
+                    WHERE creator = ? AND seq > ? AND seq <= ?
+                    ORDER BY seq
+                """, (username, since, upper))
+                for kind, record_id in cursor.fetchall():
+                    deleted["tasks" if kind == 'task' else "milestones"].append(record_id)
+            conn.commit()
+        finally:
+            conn.close()
+
+        sync_token = _base64url_encode(json.dumps({"seq": upper, "u": username}, separators=(',', ':')).encode('utf-8'))
+        return {
+            "tasks": tasks,
+            "milestones": milestones,
+            "deleted": deleted,
+            "syncToken": sync_token,
+            "hasMore": has_more,
+            "reset": reset,
+        }
+
+
+
+    def export_tasks(self, token, selection={}, options={}):
+        """
+        Exports full tasks with their milestones, chunk by chunk with set-based queries.
+        selection is {'ids': [...]} or {'filters': {...}} (the load_tasks_summary filter language).
+        With options {'destination': 'file'} a save dialog asks for the target file and the whole export
+        is streamed into it. Otherwise each call returns one chunk as {"tasks": [...], "nextCursor": ...};
+        pass nextCursor back as options['cursor'] until it is None.
+        """
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
+
+        try:
+            chunk_size = max(1, min(int(options.get('chunkSize') or EXPORT_CHUNK_SIZE), 1000))
+        except (TypeError, ValueError):
+            return {"error": "chunkSize must be a number."}
+
+        if options.get('destination') == 'file':
+            return self._export_tasks_to_file(username, selection, chunk_size)
+
+        after_id = None
+        if options.get('cursor'):
+            try:
+                after_id = json.loads(_base64url_decode(options['cursor']))['after']
+            except Exception:
+                return {"error": "Invalid export cursor."}
+
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        try:
+            tasks = self._export_chunk(cursor, username, selection, after_id, chunk_size)
+        finally:
+            conn.close()
+
+        next_cursor = None
+        if len(tasks) == chunk_size:
+            next_cursor = _base64url_encode(json.dumps({"after": tasks[-1]['id']}).encode('utf-8'))
+        return {"tasks": tasks, "nextCursor": next_cursor}
+
+    def _export_chunk(self, cursor, username, selection, after_id, chunk_size):
+        """Loads the next chunk_size tasks (ordered by id, after after_id) plus their milestones."""
+        task_select = """
+            SELECT t.*, s.description as status, o.description as "from"
+        """
+
+        ids = None
+        if 'ids' in selection:
+            ids = sorted(set(selection.get('ids') or []))
+            if after_id is not None:
+                ids = [task_id for task_id in ids if task_id > after_id]
+            ids = ids[:chunk_size]
+            if not ids:
+                return []
+            # Selected ids may belong to archived tasks (looked up by primary key, so that is cheap)
+            schemas = ['main', ARCHIVE_SCHEMA]
+        else:
+            filters = selection.get('filters') or {}
+            schemas = ['main']
+            if self._summary_includes_archive(cursor, filters, username):
+                schemas.append(ARCHIVE_SCHEMA)
+
+        tasks = []
+        for schema in schemas:
+            if ids is not None:
+                placeholders = ','.join('?' * len(ids))
+                cursor.execute(f"""{task_select}
+                    FROM {schema}.tasks t
+                    LEFT JOIN status s ON t.status = s.id
+                    LEFT JOIN origin o ON t.origin = o.id
+                    WHERE t.creator = ? AND t.id IN ({placeholders})
+                    ORDER BY t.id
+                """, [username] + ids)
+            else:
+                from_sql, where_sql, where_args, _ = self._task_filter_sql(filters, username, schema)
+                args = list(where_args)
+                if after_id is not None:
+                    where_sql += " AND t.id > ?"
+                    args.append(after_id)
+                cursor.execute(f"""{task_select}
+                    FROM {from_sql}
+                    WHERE {where_sql}
+                    ORDER BY t.id LIMIT ?
+                """, args + [chunk_size])
+
+            columns = [description[0] for description in cursor.description]
+            tasks += [_task_row_to_dict(columns, row) for row in cursor.fetchall()]
+        if len(schemas) > 1:
+            tasks = sorted(tasks, key=lambda task: task['id'])[:chunk_size]
+        if not tasks:
+            return tasks
+
+        # One query for all milestones of the chunk instead of one call per task
+        milestones_by_task = {task['id']: [] for task in tasks}
+        placeholders = ','.join('?' * len(tasks))
+        for schema in schemas:
+            cursor.execute(f"""
+                SELECT m.*, s.description as status
+                FROM {schema}.milestones m
+                LEFT JOIN status s ON m.status = s.id
+                WHERE m.taskId IN ({placeholders})
+            """, list(milestones_by_task))
+            columns = [description[0] for description in cursor.description]
+            for row in cursor.fetchall():
+                milestone = _milestone_row_to_dict(columns, row)
+                milestones_by_task[milestone['taskId']].append(milestone)
+
+        # Exports carry the attachment contents so that they can be imported elsewhere
+        attachment_lists = load_attachment_lists(cursor, list(milestones_by_task), with_data=True)
+        for task in tasks:
+            task['milestones'] = milestones_by_task[task['id']]
+            task['attachments'] = attachment_lists[task['id']]
+        return tasks
+
+    def _export_tasks_to_file(self, username, selection, chunk_size):
+        try:
+            import webview
+        except ImportError:
+            return {"error": "File export is only available in the desktop app."}
+        if not webview.windows:
+            return {"error": "File export is only available in the desktop app."}
+
+        result = webview.windows[0].create_file_dialog(
+            webview.FileDialog.SAVE, save_filename='selected-tasks-export.json',
+            file_types=('JSON files (*.json)', 'All files (*.*)'))
+        if not result:
+            return {"cancelled": True}
+        path = result if isinstance(result, str) else result[0]
+
+        count = 0
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        try:
+            # Same layout as the old in-browser export, written one chunk at a time
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('{"tasks": [')
+                after_id = None
+                while True:
+                    tasks = self._export_chunk(cursor, username, selection, after_id, chunk_size)
+                    for task in tasks:
+                        f.write(',\n' if count else '\n')
+                        json.dump(task, f, ensure_ascii=False)
+                        count += 1
+                    if len(tasks) < chunk_size:
+                        break
+                    after_id = tasks[-1]['id']
+
+                cursor.execute("SELECT description FROM status ORDER BY description")
+                statuses = [row[0] for row in cursor.fetchall()]
+                cursor.execute("SELECT description FROM origin ORDER BY description")
+                froms = [row[0] for row in cursor.fetchall()]
+                cursor.execute("""
+                    SELECT DISTINCT tc.category FROM task_categories tc
+                    JOIN tasks t ON t.id = tc.task_id
+                    WHERE t.creator = ?
+                    ORDER BY tc.category
+                """, (username,))
+                categories = [row[0] for row in cursor.fetchall()]
+                f.write('\n], "categories": ' + json.dumps(categories, ensure_ascii=False))
+                f.write(', "statuses": ' + json.dumps(statuses, ensure_ascii=False))
+                f.write(', "froms": ' + json.dumps(froms, ensure_ascii=False) + '}\n')
+        except OSError as e:
+            return {"error": f"Could not write export file: {e}"}
+        finally:
+            conn.close()
+
+        return {"message": f"Exported {count} tasks.", "path": path, "count": count}
+
+
+
+    def import_tasks(self, token, payload, options={}):
+        """
+        Imports tasks (each optionally carrying a 'milestones' list) in bulk.
+        payload is a list of tasks or an export document ({"tasks": [...]}). Statuses and origins are
+        resolved in one pass, then rows are written with executemany inside a single transaction, or one
+        transaction per options['batchSize'] tasks. A failing batch is retried task by task so that only
+        the offending records are reported in "errors".
+        """
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
+
+        started = time.perf_counter()
+        tasks = payload.get('tasks') if isinstance(payload, dict) else payload
+        if not isinstance(tasks, list):
+            return {"error": "Import payload must contain a list of tasks."}
+
+        errors = []
+        valid_tasks = {}  # id -> task; a later duplicate id replaces the earlier one, like sequential saves
+        for index, task in enumerate(tasks):
+            task_errors, task = self._validate_import_task(index, task)
+            errors.extend(task_errors)
+            if task is not None:
+                valid_tasks.pop(task['id'], None)
+                valid_tasks[task['id']] = task
+        valid_tasks = list(valid_tasks.values())
+
+        try:
+            batch_size = max(1, int(options.get('batchSize') or len(valid_tasks) or 1))
+        except (TypeError, ValueError):
+            return {"error": "batchSize must be a number."}
+
+        imported_tasks = 0
+        imported_milestones = 0
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        try:
+            status_ids = self._resolve_lookup_ids(cursor, 'status',
+                [t.get('status') for t in valid_tasks] + [m.get('status') for t in valid_tasks for m in t['milestones']])
+            origin_ids = self._resolve_lookup_ids(cursor, 'origin', [t.get('from') for t in valid_tasks])
+            conn.commit()
+            valid_tasks = self._drop_foreign_import_records(cursor, username, valid_tasks, errors)
+
+            for batch_start in range(0, len(valid_tasks), batch_size):
+                batch = valid_tasks[batch_start:batch_start + batch_size]
+                try:
+                    self._write_import_batch(cursor, username, batch, status_ids, origin_ids)
+                    conn.commit()
+                    imported_tasks += len(batch)
+                    imported_milestones += sum(len(t['milestones']) for t in batch)
+                except (sqlite3.Error, ValueError):
+                    conn.rollback()
+                    for task in batch:
+                        try:
+                            self._write_import_batch(cursor, username, [task], status_ids, origin_ids)
+                            conn.commit()
+                            imported_tasks += 1
+                            imported_milestones += len(task['milestones'])
+                        except (sqlite3.Error, ValueError) as e:
+                            conn.rollback()
+                            errors.append({"type": "task", "id": task['id'], "error": str(e)})
+        finally:
+            conn.close()
+            _dashboard_cache.clear()
+
+        seconds = time.perf_counter() - started
+        return {
+            "message": f"Imported {imported_tasks} tasks and {imported_milestones} milestones.",
+            "imported": {"tasks": imported_tasks, "milestones": imported_milestones},
+            "errors": errors,
+            "seconds": round(seconds, 3),
+            "tasksPerSecond": round(imported_tasks / seconds, 1) if seconds > 0 else None,
+        }
+
+    def _validate_import_task(self, index, task):
+        """Returns (errors, cleaned_task); cleaned_task is None if the task itself cannot be imported."""
+        if not isinstance(task, dict):
+            return [{"type": "task", "index": index, "error": "Task must be an object."}], None
+        task_id = task.get('id')
+        if not isinstance(task_id, str) or not task_id:
+            return [{"type": "task", "index": index, "error": "Task is missing an id."}], None
+        for field in ('categories', 'attachments', 'milestones'):
+            if task.get(field) is not None and not isinstance(task.get(field), list):
+                return [{"type": "task", "id": task_id, "error": f"'{field}' must be a list."}], None
+
+        errors = []
+        milestones = []
+        for milestone in task.get('milestones') or []:
+            if not isinstance(milestone, dict) or not isinstance(milestone.get('id'), str) or not milestone.get('id'):
+                errors.append({"type": "milestone", "taskId": task_id, "error": "Milestone is missing an id."})
+                continue
+            milestones.append(milestone)
+
+        cleaned = {key: value for key, value in task.items() if key != 'milestones'}
+        cleaned['milestones'] = milestones
+        return errors, cleaned
+
+    def _foreign_task_ids(self, cursor, username, task_ids):
+        """The ids among task_ids that are tasks (live or archived) of another user."""
+        foreign = set()
+        for chunk_start in range(0, len(task_ids), MAX_IN_PARAMS):
+            chunk = task_ids[chunk_start:chunk_start + MAX_IN_PARAMS]
+            cursor.execute(f"""
+                SELECT id FROM {ALL_TASKS_SQL} WHERE id IN ({','.join('?' * len(chunk))}) AND creator != ?
+            """, chunk + [username])
+            foreign.update(row[0] for row in cursor.fetchall())
+        return foreign
+
+    def _drop_foreign_import_records(self, cursor, username, tasks, errors):
+        """
+        Leaves out imported tasks owned by another user and milestones that already belong to another
+        task (ids are global, the upserts would otherwise take them over), reporting each in errors.
+        """
+        foreign_tasks = self._foreign_task_ids(cursor, username, [t['id'] for t in tasks])
+        milestone_tasks = {m['id']: t['id'] for t in tasks for m in t['milestones']}
+        milestone_ids = list(milestone_tasks)
+        foreign_milestones = set()
+        for chunk_start in range(0, len(milestone_ids), MAX_IN_PARAMS):
+            chunk = milestone_ids[chunk_start:chunk_start + MAX_IN_PARAMS]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f"""
+                SELECT id, taskId FROM main.milestones WHERE id IN ({placeholders})
+                UNION ALL
+                SELECT id, taskId FROM {ARCHIVE_SCHEMA}.milestones WHERE id IN ({placeholders})
+            """, chunk + chunk)
+            foreign_milestones.update(mid for mid, task_id in cursor.fetchall() if task_id != milestone_tasks[mid])
+
+        kept = []
+        for task in tasks:
+            if task['id'] in foreign_tasks:
+                errors.append({"type": "task", "id": task['id'], "error": "Task belongs to another user."})
+                continue
+            milestones = []
+            for milestone in task['milestones']:
+                # A milestone listed under two imported tasks only stays with the last one
+                if milestone['id'] in foreign_milestones or milestone_tasks[milestone['id']] != task['id']:
+                    errors.append({"type": "milestone", "taskId": task['id'], "id": milestone['id'],
+                                   "error": "Milestone belongs to another task."})
+                    continue
+                milestones.append(milestone)
+            kept.append({**task, 'milestones': milestones})
+        return kept
+
+    def _resolve_lookup_ids(self, cursor, table, descriptions):
+        """Returns {description: id} for a status/origin table, inserting any missing descriptions."""
+        descriptions = sorted({d for d in descriptions if d})
+        cursor.executemany(f"INSERT OR IGNORE INTO {table} (description) VALUES (?)", [(d,) for d in descriptions])
+        ids = {}
+        for chunk_start in range(0, len(descriptions), MAX_IN_PARAMS):
+            chunk = descriptions[chunk_start:chunk_start + MAX_IN_PARAMS]
+            cursor.execute(f"SELECT description, id FROM {table} WHERE description IN ({','.join('?' * len(chunk))})", chunk)
+            ids.update(cursor.fetchall())
+        return ids
+
+    def _write_import_batch(self, cursor, username, tasks, status_ids, origin_ids):
+        # Re-imported archived tasks are overwritten in the main tables, not duplicated
+        for chunk_start in range(0, len(tasks), MAX_IN_PARAMS):
+            restore_tasks(cursor, username, [t['id'] for t in tasks[chunk_start:chunk_start + MAX_IN_PARAMS]])
+        cursor.executemany(TASK_UPSERT_SQL, [
+            _task_params(t, username, status_ids.get(t.get('status')), origin_ids.get(t.get('from')))
+            for t in tasks
+        ])
+        cursor.executemany("DELETE FROM task_categories WHERE task_id = ?", [(t['id'],) for t in tasks])
+        cursor.executemany("INSERT OR IGNORE INTO task_categories (task_id, category) VALUES (?, ?)", [
+            (t['id'], cat) for t in tasks for cat in set(t.get('categories') or []) if isinstance(cat, str) and cat
+        ])
+        cursor.executemany(MILESTONE_UPSERT_SQL, [
+            _milestone_params(m, t['id'], status_ids.get(m.get('status')))
+            for t in tasks for m in t['milestones']
+        ])
+        # Identical files across the import are stored once
+        for t in tasks:
+            replace_task_attachments(cursor, username, t['id'], t.get('attachments'))
+
+
+
+    def _archive_finished_tasks(self, cutoff, repair=False):
+        """
+        One batch of archive_store.ArchiveJob, run on the writer thread: moves up to ARCHIVE_BATCH_SIZE
+        tasks finished before cutoff into archive.db. repair first drops leftovers of an interrupted run.
+        Returns the number of tasks moved.
+        """
+        startup.wait_ready()
+        conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+        try:
+            if repair:
+                drop_duplicates(cursor)
+            moved = archive_finished_tasks(conn, cutoff)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        if moved:
+            _dashboard_cache.clear()
+        return moved
+
+
+
+    def _maintain_database(self, dbfile):
+        """
+        The vacuum/optimize/checkpoint part of maintenance.MaintenanceJob for dbfile (and what is
+        attached to it), run on the writer thread so the VACUUM steps never wait on our own writes.
+        """
+        startup.wait_ready()
+        return maintain_database(dbfile, DATABASE_KEY)
+
+
+
+    def batch(self, token, calls):
+        """
+        Runs several read calls, [{"method": name, "args": [...]}, ...] with args not including the token,
+        on one connection inside one read transaction, so all results come from the same snapshot.
+        Returns {"results": [...]} in call order; a failing call gets {"error": ...} in its slot.
+        """
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
+        if not isinstance(calls, list) or len(calls) > MAX_BATCH_CALLS:
+            return {"error": f"calls must be a list of at most {MAX_BATCH_CALLS} calls."}
+
+        results = []
+        with pinned_connection(DB_FILE, DATABASE_KEY) as conn:
+            conn.execute("BEGIN")
+            for call in calls:
+                method = call.get('method') if isinstance(call, dict) else None
+                args = (call.get('args') or []) if isinstance(call, dict) else []
+                if method not in READ_CALLS or method in ('batch', 'login') or not isinstance(args, list):
+                    results.append({"error": f"Cannot batch '{method}'."})
+                    continue
+                try:
+                    results.append(getattr(self, method)(token, *args))
+                except Exception as e:
+                    results.append({"error": str(e)})
+        return {"results": results}
+
+    def get_connection_stats(self, token):
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
+
+        return get_pool_stats()
+
+    def get_metrics(self, token, options=None):
+        """
+        Per-method timings (split into auth/connect/sql/other), the most expensive SQL statements,
+        recent slow queries with their query plans and connection setup times.
+        Only filled while instrumentation is enabled; options {"reset": true} starts over afterwards.
+        """
+        username = self._get_authenticated_username(token)
+        if not username:
+            return {"error": "Authentication required."}
+
+        metrics = instrumentation.snapshot(reset_after=bool((options or {}).get('reset')))
+        metrics['pools'] = get_pool_stats()
+        metrics['startup'] = startup.report()
+        return metrics
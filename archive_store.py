@@ -0,0 +1,223 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from search_index import create_search_index
+
+# Hot/archive split for finished tasks.
+# archive.db is ATTACHed to every tasks.db connection as schema 'archive' (same key) and holds
+# tasks whose finishDate is older than ARCHIVE_AFTER_DAYS, with their milestones and categories,
+# in tables shaped like the main ones. The main tables then only carry the active work most
+# queries are about; load_tasks_summary/get_task_counts add the archive when the filters reach it.
+# Attachments stay in the main attachment store, keyed by task id.
+#
+# Writing to an archived task (save, patch, milestones, delete, import) first moves it back,
+# so the write paths never have to know about the archive.
+
+ARCHIVE_DB_FILE = "./data/archive.db"
+ARCHIVE_SCHEMA = 'archive'
+# Stored in PRAGMA archive.user_version; bump it together with a change below
+ARCHIVE_SCHEMA_VERSION = 1
+# Finished tasks are archived this many days after their finishDate; 0 turns the job off
+ARCHIVE_AFTER_DAYS = int(os.getenv('PRISMTASK_ARCHIVE_AFTER_DAYS', '365'))
+# Tasks moved per write transaction, so the writer thread is never blocked for long
+ARCHIVE_BATCH_SIZE = 200
+# Seconds between archiving runs, and before the first one after startup
+ARCHIVE_INTERVAL = 6 * 3600
+ARCHIVE_FIRST_RUN_DELAY = 60
+
+# Columns copied between main and archive. change_seq is left behind on purpose: moving a task
+# out shows up in get_changes as a deletion, moving it back re-stamps it as a new change.
+TASK_COLUMNS = ("id, creator, title, origin, priority, deadline, finishDate, status, description, notes, "
+                "categories, createdAt, updatedAt, difficulty")
+MILESTONE_COLUMNS = "id, taskId, title, deadline, finishDate, status, parentId, notes, updatedAt"
+# Stands in for "tasks" in queries that have to see archived tasks as well
+ALL_TASKS_SQL = f"(SELECT {TASK_COLUMNS} FROM main.tasks UNION ALL SELECT {TASK_COLUMNS} FROM {ARCHIVE_SCHEMA}.tasks)"
+
+
+def create_archive_schema(conn):
+    """Creates the archive tables (once; later startups only read archive.user_version)."""
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA {ARCHIVE_SCHEMA}.user_version")
+    if cursor.fetchone()[0] == ARCHIVE_SCHEMA_VERSION:
+        return
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.tasks (
+            id TEXT PRIMARY KEY, creator TEXT NOT NULL, title TEXT, origin INTEGER, priority INTEGER,
+            deadline TEXT, finishDate TEXT, status INTEGER, description TEXT, notes TEXT,
+            categories TEXT, createdAt TEXT, updatedAt TEXT, difficulty INTEGER
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.milestones (
+            id TEXT PRIMARY KEY, taskId TEXT NOT NULL, title TEXT, deadline TEXT, finishDate TEXT,
+            status INTEGER, parentId TEXT, notes TEXT, updatedAt TEXT
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.task_categories (
+            task_id TEXT NOT NULL, category TEXT NOT NULL,
+            PRIMARY KEY (task_id, category)
+        ) WITHOUT ROWID
+    ''')
+    # Archive queries always filter on creator; finishDate/updatedAt also answer "is the archive needed?"
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_tasks_creator_finishDate ON tasks(creator, finishDate)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_tasks_creator_updatedAt ON tasks(creator, updatedAt)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_tasks_status ON tasks(status)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_tasks_origin ON tasks(origin)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_milestones_taskId ON milestones(taskId)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_task_categories_category ON task_categories(category, task_id)")
+    create_search_index(cursor, ARCHIVE_SCHEMA)
+    cursor.execute(f"PRAGMA {ARCHIVE_SCHEMA}.user_version = {ARCHIVE_SCHEMA_VERSION}")
+    conn.commit()
+
+
+def archive_cutoff(after_days=ARCHIVE_AFTER_DAYS, now=None):
+    """Tasks finished before this day ('YYYY-MM-DD') are due for the archive."""
+    now = now or datetime.now(timezone.utc)
+    return (now - timedelta(days=after_days)).strftime('%Y-%m-%d')
+
+
+def _copy_tasks(cursor, task_ids, source, target):
+    placeholders = ','.join('?' * len(task_ids))
+    # Delete-then-insert rather than INSERT OR REPLACE: REPLACE skips the delete triggers of tasks_fts
+    cursor.execute(f"DELETE FROM {target}.milestones WHERE taskId IN ({placeholders})", task_ids)
+    cursor.execute(f"DELETE FROM {target}.task_categories WHERE task_id IN ({placeholders})", task_ids)
+    cursor.execute(f"DELETE FROM {target}.tasks WHERE id IN ({placeholders})", task_ids)
+    cursor.execute(f"""
+        INSERT INTO {target}.tasks ({TASK_COLUMNS})
+        SELECT {TASK_COLUMNS} FROM {source}.tasks WHERE id IN ({placeholders})
+    """, task_ids)
+    cursor.execute(f"""
+        INSERT INTO {target}.milestones ({MILESTONE_COLUMNS})
+        SELECT {MILESTONE_COLUMNS} FROM {source}.milestones WHERE taskId IN ({placeholders})
+    """, task_ids)
+    cursor.execute(f"""
+        INSERT INTO {target}.task_categories (task_id, category)
+        SELECT task_id, category FROM {source}.task_categories WHERE task_id IN ({placeholders})
+    """, task_ids)
+
+
+def _delete_tasks(cursor, task_ids, schema):
+    placeholders = ','.join('?' * len(task_ids))
+    cursor.execute(f"DELETE FROM {schema}.milestones WHERE taskId IN ({placeholders})", task_ids)
+    cursor.execute(f"DELETE FROM {schema}.task_categories WHERE task_id IN ({placeholders})", task_ids)
+    cursor.execute(f"DELETE FROM {schema}.tasks WHERE id IN ({placeholders})", task_ids)
+
+
+def archive_finished_tasks(conn, cutoff, limit=ARCHIVE_BATCH_SIZE):
+    """
+    Moves up to limit tasks finished before cutoff into the archive. Returns how many moved.
+    Commits the copy before deleting from main (the caller commits the delete): a transaction
+    over both files is only atomic per file and main commits first, so a crash in between
+    would otherwise keep the delete and lose the copy.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id FROM main.tasks
+        WHERE finishDate IS NOT NULL AND finishDate < ?
+        LIMIT ?
+    """, (cutoff, limit))
+    task_ids = [row[0] for row in cursor.fetchall()]
+    if task_ids:
+        _copy_tasks(cursor, task_ids, 'main', ARCHIVE_SCHEMA)
+        conn.commit()
+        # Until the delete commits the tasks are in both files, which drop_duplicates resolves
+        _delete_tasks(cursor, task_ids, 'main')
+    return len(task_ids)
+
+
+def restore_tasks(cursor, username, task_ids):
+    """Moves the user's archived tasks among task_ids back into the main tables. Returns how many moved."""
+    task_ids = list(task_ids)
+    if not task_ids:
+        return 0
+    placeholders = ','.join('?' * len(task_ids))
+    cursor.execute(f"SELECT id FROM {ARCHIVE_SCHEMA}.tasks WHERE creator = ? AND id IN ({placeholders})",
+                   [username] + task_ids)
+    archived = [row[0] for row in cursor.fetchall()]
+    if archived:
+        # One transaction is fine this way round: main (the copy) commits first
+        _copy_tasks(cursor, archived, ARCHIVE_SCHEMA, 'main')
+        _delete_tasks(cursor, archived, ARCHIVE_SCHEMA)
+    return len(archived)
+
+
+def drop_duplicates(cursor):
+    """
+    Removes archive copies of tasks that are also in the main tables; main wins. Such pairs are
+    what a crash leaves behind, either between the two commits of archive_finished_tasks or between
+    the two files' commits of a restore, so this is the only recovery either direction needs.
+    """
+    cursor.execute(f"SELECT id FROM {ARCHIVE_SCHEMA}.tasks WHERE id IN (SELECT id FROM main.tasks)")
+    task_ids = [row[0] for row in cursor.fetchall()]
+    if task_ids:
+        placeholders = ','.join('?' * len(task_ids))
+        cursor.execute(f"DELETE FROM {ARCHIVE_SCHEMA}.milestones WHERE taskId IN ({placeholders})", task_ids)
+        cursor.execute(f"DELETE FROM {ARCHIVE_SCHEMA}.task_categories WHERE task_id IN ({placeholders})", task_ids)
+        cursor.execute(f"DELETE FROM {ARCHIVE_SCHEMA}.tasks WHERE id IN ({placeholders})", task_ids)
+    return len(task_ids)
+
+
+def task_schema(cursor, username, task_id):
+    """'main' or 'archive' for where the user's task lives, None if it does not exist."""
+    cursor.execute("SELECT 1 FROM main.tasks WHERE id = ? AND creator = ?", (task_id, username))
+    if cursor.fetchone():
+        return 'main'
+    cursor.execute(f"SELECT 1 FROM {ARCHIVE_SCHEMA}.tasks WHERE id = ? AND creator = ?", (task_id, username))
+    return ARCHIVE_SCHEMA if cursor.fetchone() else None
+
+
+def newest_archived(cursor, username, column):
+    """Latest finishDate/updatedAt among the user's archived tasks, None if nothing is archived."""
+    cursor.execute(f"SELECT MAX({column}) FROM {ARCHIVE_SCHEMA}.tasks WHERE creator = ?", (username,))
+    return cursor.fetchone()[0]
+
+
+class ArchiveJob:
+    """
+    Background thread that archives old finished tasks every ARCHIVE_INTERVAL seconds.
+    Each batch runs as Api._archive_finished_tasks on the executor's writer thread,
+    so user writes are queued between batches instead of waiting for the whole run.
+    """
+
+    def __init__(self, executor, after_days=ARCHIVE_AFTER_DAYS, interval=ARCHIVE_INTERVAL):
+        self._executor = executor
+        self._after_days = after_days
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._after_days <= 0:
+            return
+        self._thread = threading.Thread(target=self._loop, name='prismtask-archive', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def run_once(self):
+        """Archives everything currently due. Returns the number of tasks moved."""
+        cutoff = archive_cutoff(self._after_days)
+        moved, first = 0, True
+        while not self._stop.is_set():
+            count = self._executor.submit('_archive_finished_tasks', (cutoff, first)).result()
+            moved += count
+            first = False
+            if count < ARCHIVE_BATCH_SIZE:
+                break
+        return moved
+
+    def _loop(self):
+        delay = ARCHIVE_FIRST_RUN_DELAY
+        while not self._stop.wait(delay):
+            try:
+                moved = self.run_once()
+                if moved:
+                    print(f"Archived {moved} finished tasks.")
+            except Exception as e:
+                print(f"Archiving failed: {e}")
+            delay = self._interval
@@ -0,0 +1,205 @@
+import base64
+import binascii
+import hashlib
+import json
+from urllib.parse import unquote_to_bytes
+
+from archive_store import ARCHIVE_SCHEMA
+
+# Task attachments, kept out of the tasks rows.
+# File contents are stored once per distinct SHA-256 in attachments/attachment_chunks
+# and referenced from task_attachments, which holds the per-task name, type and order.
+# Contents are split into fixed-size chunks so Api.read_attachment can hand them out
+# piece by piece without SQLite loading (and decrypting) the whole file for every piece.
+
+ATTACHMENT_CHUNK_SIZE = 256 * 1024
+
+
+def create_attachment_store(cursor):
+    """Creates the attachment tables and moves the inline tasks.attachments JSON into them."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attachments (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            chunk_count INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    # Ordinary rowid table: WITHOUT ROWID tables are a poor fit for large blob rows
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attachment_chunks (
+            hash TEXT NOT NULL,
+            chunk INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (hash, chunk)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_attachments (
+            task_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT,
+            type TEXT,
+            hash TEXT NOT NULL,
+            PRIMARY KEY (task_id, position)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_task_attachments_hash ON task_attachments(hash)")
+
+    cursor.execute("SELECT id, attachments FROM tasks WHERE attachments IS NOT NULL AND attachments NOT IN ('', '[]')")
+    for task_id, attachments_json in cursor.fetchall():
+        try:
+            attachments = json.loads(attachments_json)
+        except (json.JSONDecodeError, TypeError):
+            continue
+        if not isinstance(attachments, list):
+            continue
+        rows = []
+        for att in attachments:
+            if not isinstance(att, dict) or not isinstance(att.get('data'), str):
+                continue
+            try:
+                mime, data = decode_data_url(att['data'])
+            except ValueError:
+                # Not a data URL; keep whatever was stored rather than dropping it
+                mime, data = None, att['data'].encode('utf-8')
+            rows.append((task_id, len(rows), att.get('name'), att.get('type') or mime, store_blob(cursor, data)))
+        cursor.executemany(
+            "INSERT OR REPLACE INTO task_attachments (task_id, position, name, type, hash) VALUES (?, ?, ?, ?, ?)", rows)
+    cursor.execute("UPDATE tasks SET attachments = NULL WHERE attachments IS NOT NULL")
+
+
+def decode_data_url(data_url):
+    """Returns (mime type, bytes) of a data: URL as produced by FileReader.readAsDataURL."""
+    if not isinstance(data_url, str) or not data_url.startswith('data:') or ',' not in data_url:
+        raise ValueError("Attachment data must be a data: URL.")
+    header, payload = data_url[5:].split(',', 1)
+    params = header.split(';')
+    mime = params[0] or None
+    if 'base64' in params[1:]:
+        try:
+            return mime, base64.b64decode(payload, validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueError("Attachment data is not valid base64.")
+    return mime, unquote_to_bytes(payload)
+
+
+def encode_data_url(mime, data):
+    return f"data:{mime or 'application/octet-stream'};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def store_blob(cursor, data):
+    """Stores data unless identical content is already there and returns its hash."""
+    digest = hashlib.sha256(data).hexdigest()
+    chunk_count = (len(data) + ATTACHMENT_CHUNK_SIZE - 1) // ATTACHMENT_CHUNK_SIZE
+    cursor.execute("INSERT OR IGNORE INTO attachments (hash, size, chunk_count) VALUES (?, ?, ?)",
+                   (digest, len(data), chunk_count))
+    if cursor.rowcount > 0:
+        cursor.executemany("INSERT INTO attachment_chunks (hash, chunk, data) VALUES (?, ?, ?)", [
+            (digest, i, data[i * ATTACHMENT_CHUNK_SIZE:(i + 1) * ATTACHMENT_CHUNK_SIZE]) for i in range(chunk_count)
+        ])
+    return digest
+
+
+def _user_has_blob(cursor, username, digest):
+    # Archived tasks keep their attachments here, so their owners can still open them
+    cursor.execute(f"""
+        SELECT 1 FROM task_attachments ta
+        WHERE ta.hash = ? AND (
+            EXISTS (SELECT 1 FROM main.tasks t WHERE t.id = ta.task_id AND t.creator = ?)
+            OR EXISTS (SELECT 1 FROM {ARCHIVE_SCHEMA}.tasks t WHERE t.id = ta.task_id AND t.creator = ?)
+        ) LIMIT 1
+    """, (digest, username, username))
+    return cursor.fetchone() is not None
+
+
+def _purge_unreferenced(cursor, hashes):
+    for digest in set(hashes):
+        cursor.execute("""
+            DELETE FROM attachments WHERE hash = ?
+            AND NOT EXISTS (SELECT 1 FROM task_attachments WHERE hash = ?)
+        """, (digest, digest))
+        if cursor.rowcount > 0:
+            cursor.execute("DELETE FROM attachment_chunks WHERE hash = ?", (digest,))
+
+
+def replace_task_attachments(cursor, username, task_id, attachments):
+    """
+    Makes attachments the task's attachment list. New attachments carry their content as a
+    data URL in 'data'; ones the client got from load_task only carry their 'hash'.
+    Raises ValueError for malformed entries or hashes the user has no access to.
+    """
+    rows = []
+    for att in attachments or []:
+        if not isinstance(att, dict):
+            raise ValueError("Attachments must be objects.")
+        if att.get('data'):
+            mime, data = decode_data_url(att['data'])
+            digest = store_blob(cursor, data)
+        elif att.get('hash'):
+            # Knowing a hash is not enough, the content has to be attached to one of the user's tasks
+            digest, mime = att['hash'], None
+            if not _user_has_blob(cursor, username, digest):
+                raise ValueError(f"Attachment '{att.get('name')}' not found.")
+        else:
+            raise ValueError(f"Attachment '{att.get('name')}' has no content.")
+        rows.append((task_id, len(rows), att.get('name'), att.get('type') or mime, digest))
+
+    cursor.execute("SELECT hash FROM task_attachments WHERE task_id = ?", (task_id,))
+    old_hashes = [row[0] for row in cursor.fetchall()]
+    cursor.execute("DELETE FROM task_attachments WHERE task_id = ?", (task_id,))
+    cursor.executemany("INSERT INTO task_attachments (task_id, position, name, type, hash) VALUES (?, ?, ?, ?, ?)", rows)
+    _purge_unreferenced(cursor, old_hashes)
+
+
+def delete_task_attachments(cursor, task_id):
+    cursor.execute("SELECT hash FROM task_attachments WHERE task_id = ?", (task_id,))
+    old_hashes = [row[0] for row in cursor.fetchall()]
+    cursor.execute("DELETE FROM task_attachments WHERE task_id = ?", (task_id,))
+    _purge_unreferenced(cursor, old_hashes)
+
+
+def load_attachment_lists(cursor, task_ids, with_data=False):
+    """
+    Returns {task_id: [{name, type, size, hash}, ...]} for task_ids. with_data adds the
+    content as a data URL (used by exports, which have to stand on their own).
+    """
+    lists = {task_id: [] for task_id in task_ids}
+    task_ids = list(lists)
+    for start in range(0, len(task_ids), 500):
+        chunk = task_ids[start:start + 500]
+        cursor.execute(f"""
+            SELECT ta.task_id, ta.name, ta.type, a.size, ta.hash
+            FROM task_attachments ta JOIN attachments a ON a.hash = ta.hash
+            WHERE ta.task_id IN ({','.join('?' * len(chunk))})
+            ORDER BY ta.task_id, ta.position
+        """, chunk)
+        for task_id, name, mime, size, digest in cursor.fetchall():
+            lists[task_id].append({"name": name, "type": mime, "size": size, "hash": digest})
+
+    if with_data:
+        for attachments in lists.values():
+            for att in attachments:
+                cursor.execute("SELECT data FROM attachment_chunks WHERE hash = ? ORDER BY chunk", (att['hash'],))
+                att['data'] = encode_data_url(att['type'], b''.join(row[0] for row in cursor.fetchall()))
+    return lists
+
+
+def read_chunk(cursor, username, digest, chunk):
+    """Returns {hash, size, chunkCount, chunk, data (base64)} or None if the user cannot see the attachment."""
+    if not _user_has_blob(cursor, username, digest):
+        return None
+    cursor.execute("""
+        SELECT a.size, a.chunk_count, c.data
+        FROM attachments a LEFT JOIN attachment_chunks c ON c.hash = a.hash AND c.chunk = ?
+        WHERE a.hash = ?
+    """, (chunk, digest))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    size, chunk_count, data = row
+    if data is None and chunk_count > 0:
+        return None
+    return {
+        "hash": digest, "size": size, "chunkCount": chunk_count, "chunk": chunk,
+        "data": base64.b64encode(data or b'').decode('ascii'),
+    }
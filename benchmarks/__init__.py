@@ -0,0 +1 @@
+# Benchmarks for the Python API layer. Run modules with "python -m benchmarks.<name>" from the project root.
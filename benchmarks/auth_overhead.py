@@ -0,0 +1,79 @@
+"""
+Per-call authentication overhead of Api._get_authenticated_username.
+
+Compares the full verify_jwt path (split, HMAC-SHA256, base64 + JSON decode,
+revocation lookup) with the verified-token cache that now sits in front of it.
+
+    python -m benchmarks.auth_overhead --calls 100000
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+
+def _time_calls(fn, calls, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        samples.append((time.perf_counter() - start) / calls * 1e6)
+    return {'median_us': round(statistics.median(samples), 3), 'max_us': round(max(samples), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    project_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # api creates its databases under ./data, keep them out of the working tree
+        os.chdir(tmp)
+        try:
+            import api
+            from env_variables import SECRET_KEY
+            from DBconnector import close_all_pools
+
+            token = api.generate_jwt({'username': 'bench', 'exp': int(time.time() + 3600)}, SECRET_KEY)
+            instance = api.Api()
+
+            def uncached():
+                api._token_cache.clear()
+                return instance._get_authenticated_username(token)
+
+            def jwt_only():
+                payload = api.verify_jwt(token, SECRET_KEY)
+                return payload['username'] if payload else None
+
+            def cached():
+                return instance._get_authenticated_username(token)
+
+            # The uncached path includes a revocation lookup in auth.db, so it gets fewer calls
+            slow_calls = max(1, args.calls // 20)
+            results = {
+                'uncached (verify_jwt + revocation check)': _time_calls(uncached, slow_calls, args.repeat),
+                'verify_jwt only': _time_calls(jwt_only, args.calls, args.repeat),
+                'cached': _time_calls(cached, args.calls, args.repeat),
+            }
+            close_all_pools()
+        finally:
+            os.chdir(project_dir)
+
+    report = {
+        'calls': args.calls, 'repeat': args.repeat,
+        'per_call': results,
+        'speedup_vs_uncached': round(results['uncached (verify_jwt + revocation check)']['median_us'] /
+                                     max(results['cached']['median_us'], 1e-6), 1),
+        'speedup_vs_verify_jwt': round(results['verify_jwt only']['median_us'] /
+                                       max(results['cached']['median_us'], 1e-6), 1),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
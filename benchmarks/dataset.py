@@ -0,0 +1,173 @@
+"""
+Synthetic encrypted fixtures for the benchmark suite.
+
+Writes data/tasks.db and data/auth.db (keyed with TASK_DB_KEY like the app's own)
+below --out: --users users with --tasks tasks each, milestone trees up to
+--max-depth levels deep, and description/notes/category distributions shaped like
+real use (a few dominant categories, mostly short texts with a long tail).
+A fixture.json manifest next to data/ records the parameters and logins.
+
+    python -m benchmarks.dataset --out bench-fixtures/medium --users 5 --tasks 2000
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+PASSWORD = 'bench-password'
+IMPORT_BATCH_SIZE = 1000
+
+WORDS = (
+    "report review budget client meeting draft release server invoice design test plan deploy "
+    "migrate schedule contract update sprint backlog feedback audit onboarding roadmap analysis "
+    "dashboard vendor training security backup network licence workshop presentation survey "
+    "quarterly proposal hiring interview research prototype support ticket escalation outage"
+).split()
+STATUSES = [('Open', 30), ('In Progress', 25), ('Waiting', 10), ('Done', 30), ('Cancelled', 5)]
+MILESTONE_STATUSES = [('Open', 45), ('In Progress', 20), ('Done', 35)]
+ORIGINS = [f"Source {i}" for i in range(15)]
+CATEGORIES = [f"category-{i}" for i in range(30)]
+# Zipf-like weights: the first categories and origins are used far more often than the rest
+CATEGORY_WEIGHTS = [1 / (rank + 1) for rank in range(len(CATEGORIES))]
+ORIGIN_WEIGHTS = [1 / (rank + 1) for rank in range(len(ORIGINS))]
+# Data spans this many days back from "now"
+HISTORY_DAYS = 730
+
+
+def _weighted(rng, pairs):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights)[0]
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def _html_text(rng, median_words):
+    """Editor-style HTML whose length follows a log-normal distribution around median_words."""
+    words = max(1, int(rng.lognormvariate(0, 0.9) * median_words))
+    paragraphs = []
+    while words > 0:
+        length = min(words, rng.randint(8, 60))
+        paragraphs.append(f"<p>{_sentence(rng, length)}</p>")
+        words -= length
+    return ''.join(paragraphs)
+
+
+def _milestones(rng, task_id, created, max_depth):
+    """A forest of milestones; each picks its parent among earlier ones above max_depth."""
+    count = min(int(rng.expovariate(1 / 3)), 25)
+    milestones, depths = [], {}
+    for i in range(count):
+        milestone_id = f"{task_id}-m{i}"
+        candidates = [m['id'] for m in milestones if depths[m['id']] < max_depth - 1]
+        parent_id = rng.choice(candidates) if candidates and rng.random() < 0.7 else None
+        depths[milestone_id] = depths[parent_id] + 1 if parent_id else 0
+        status = _weighted(rng, MILESTONE_STATUSES)
+        deadline = created + timedelta(days=rng.randint(1, 120))
+        milestones.append({
+            'id': milestone_id, 'title': _sentence(rng, rng.randint(2, 6)), 'status': status,
+            'parentId': parent_id, 'deadline': deadline.strftime('%Y-%m-%d'),
+            'finishDate': deadline.strftime('%Y-%m-%d') if status == 'Done' else None,
+            'notes': _html_text(rng, 15) if rng.random() < 0.4 else '',
+            'updatedAt': (created + timedelta(days=rng.randint(0, 60))).strftime('%Y-%m-%d %H:%M:%S'),
+        })
+    return milestones
+
+
+def generate_tasks(rng, user_index, count, max_depth, now=None):
+    """Returns count tasks (import format, milestones included) for one user."""
+    now = now or datetime.now(timezone.utc)
+    tasks = []
+    for i in range(count):
+        task_id = f"u{user_index}-t{i}"
+        created = now - timedelta(days=rng.randint(0, HISTORY_DAYS), minutes=rng.randint(0, 1440))
+        status = _weighted(rng, STATUSES)
+        deadline = created + timedelta(days=rng.randint(1, 180)) if rng.random() < 0.7 else None
+        category_count = rng.choices([0, 1, 2, 3], [15, 50, 25, 10])[0]
+        tasks.append({
+            'id': task_id,
+            'title': _sentence(rng, rng.randint(3, 9)),
+            'from': rng.choices(ORIGINS, ORIGIN_WEIGHTS)[0] if rng.random() < 0.8 else None,
+            'priority': rng.choice([1, 2, 3, 4, 5, None]),
+            'difficulty': rng.randint(1, 10),
+            'status': status,
+            'deadline': deadline.strftime('%Y-%m-%d') if deadline else None,
+            'finishDate': (created + timedelta(days=rng.randint(0, 90))).strftime('%Y-%m-%d') if status == 'Done' else None,
+            'description': _html_text(rng, 60),
+            'notes': _html_text(rng, 40) if rng.random() < 0.6 else '',
+            'categories': sorted(set(rng.choices(CATEGORIES, CATEGORY_WEIGHTS, k=category_count))),
+            'createdAt': created.strftime('%Y-%m-%d %H:%M:%S'),
+            'updatedAt': (created + timedelta(days=rng.randint(0, 30))).strftime('%Y-%m-%d %H:%M:%S'),
+            'milestones': _milestones(rng, task_id, created, max_depth),
+        })
+    return tasks
+
+
+def build_fixture(users, tasks_per_user, max_depth=4, seed=1):
+    """
+    Fills ./data (relative to the current directory, like the app) with a fixture and returns its manifest.
+    api is imported here, so call this after changing into the fixture directory.
+    """
+    import api
+    import startup
+    import user_manager
+
+    # register_user below writes auth.db directly, so the schema has to exist first
+    startup.wait_ready()
+    rng = random.Random(seed)
+    instance = api.Api()
+    manifest = {
+        'users': [], 'tasks_per_user': tasks_per_user, 'max_depth': max_depth, 'seed': seed,
+        'milestones': 0, 'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+    started = time.perf_counter()
+    for user_index in range(users):
+        username = f"bench-user-{user_index}"
+        user_manager.register_user(username, PASSWORD)
+        token = instance.login(username, PASSWORD)['token']
+        tasks = generate_tasks(rng, user_index, tasks_per_user, max_depth)
+        result = instance.import_tasks(token, tasks, {'batchSize': IMPORT_BATCH_SIZE})
+        if result.get('errors'):
+            raise RuntimeError(f"Import for {username} reported errors: {result['errors'][:3]}")
+        manifest['milestones'] += sum(len(task['milestones']) for task in tasks)
+        manifest['users'].append({'username': username, 'password': PASSWORD,
+                                  'task_ids': [task['id'] for task in tasks]})
+    manifest['seconds'] = round(time.perf_counter() - started, 2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--out', required=True, help="Directory to create the fixture in (must not contain data/ yet)")
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--tasks', type=int, default=1000, help="Tasks per user")
+    parser.add_argument('--max-depth', type=int, default=4, help="Deepest milestone tree level")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    out_dir = os.path.abspath(args.out)
+    if os.path.exists(os.path.join(out_dir, 'data')):
+        raise SystemExit(f"{out_dir} already holds a fixture.")
+    os.makedirs(out_dir, exist_ok=True)
+
+    project_dir = os.getcwd()
+    # api creates its databases under ./data
+    os.chdir(out_dir)
+    try:
+        from DBconnector import close_all_pools
+        manifest = build_fixture(args.users, args.tasks, args.max_depth, args.seed)
+        close_all_pools()
+    finally:
+        os.chdir(project_dir)
+
+    with open(os.path.join(out_dir, 'fixture.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    print(json.dumps({key: value for key, value in manifest.items() if key != 'users'}
+                     | {'users': len(manifest['users']), 'out': out_dir}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
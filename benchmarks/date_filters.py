@@ -0,0 +1,148 @@
+"""
+Date range filter latency before and after the canonical-date migration.
+
+Builds a throwaway encrypted database with mixed date spellings (as older
+installs have), times the legacy date(column) filters, applies the migration
+that normalizes the values and adds the date indexes, then times the
+index-friendly range predicates used by load_tasks_summary today.
+
+    python -m benchmarks.date_filters --tasks 100000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from DBconnector import connectDB, close_all_pools
+from date_utils import range_condition
+from env_variables import DATABASE_KEY
+from migrations import create_base_schema, migrate
+
+# Everything before the date normalization migration
+PRE_NORMALIZATION_VERSION = 4
+
+# (label, column, from, to, is_timestamp)
+SCENARIOS = [
+    ('created last 30 days', 't.createdAt', '2025-05-02', '2025-06-01', True),
+    ('updated in one week', 't.updatedAt', '2025-05-01', '2025-05-07', True),
+    ('deadline in one month', 't.deadline', '2025-07-01', '2025-07-31', False),
+    ('finished in Q1', 't.finishDate', '2025-01-01', '2025-03-31', False),
+]
+
+LEGACY_ORDER = "CASE WHEN t.deadline IS NULL OR t.deadline = '' THEN 1 ELSE 0 END, t.deadline ASC"
+CURRENT_ORDER = "(t.deadline IS NULL), t.deadline ASC"
+
+SUMMARY_SELECT = """
+    SELECT t.id, t.title, t.priority, t.deadline, t.finishDate, t.createdAt, t.updatedAt
+    FROM tasks t
+    WHERE t.creator = ? AND {condition}
+    ORDER BY {order}, t.id LIMIT 50
+"""
+
+
+def _legacy_timestamp(rng, dt):
+    # Older rows: a mix of toISOString(), Python isoformat() and plain dates
+    choice = rng.random()
+    if choice < 0.7:
+        return dt.strftime('%Y-%m-%dT%H:%M:%S.') + f"{dt.microsecond // 1000:03d}Z"
+    if choice < 0.9:
+        return dt.strftime('%Y-%m-%d %H:%M:%S')
+    return dt.strftime('%Y-%m-%d')
+
+
+def build_database(path, task_count, user_count, seed=42):
+    rng = random.Random(seed)
+    conn, cursor = connectDB(path, DATABASE_KEY)
+    create_base_schema(cursor)
+    conn.commit()
+    migrate(conn, target_version=PRE_NORMALIZATION_VERSION)
+
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(task_count):
+        created = base + timedelta(seconds=rng.randint(0, 540 * 86400))
+        updated = created + timedelta(seconds=rng.randint(0, 60 * 86400))
+        deadline = (created + timedelta(days=rng.randint(1, 120))).strftime('%Y-%m-%d') if rng.random() < 0.8 else rng.choice(['', None])
+        finish = (updated.strftime('%Y-%m-%d') if rng.random() < 0.5 else rng.choice(['', None]))
+        rows.append((
+            f"t_{i}", f"user{i % user_count}", f"Task {i}", rng.randint(1, 3), deadline, finish,
+            _legacy_timestamp(rng, created), _legacy_timestamp(rng, updated),
+        ))
+    cursor.executemany(
+        "INSERT INTO tasks (id, creator, title, priority, deadline, finishDate, createdAt, updatedAt) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+    cursor.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def _time_query(cursor, sql, args, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(sql, args)
+        cursor.fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': round(statistics.median(samples), 3), 'max_ms': round(max(samples), 3)}
+
+
+def run_legacy(cursor, user, repeat):
+    results = {}
+    for label, column, from_date, to_date, _ in SCENARIOS:
+        condition = f"date({column}) BETWEEN date(?) AND date(?)"
+        sql = SUMMARY_SELECT.format(condition=condition, order=LEGACY_ORDER)
+        results[label] = _time_query(cursor, sql, [user, from_date, to_date], repeat)
+    return results
+
+
+def run_current(cursor, user, repeat):
+    results = {}
+    for label, column, from_date, to_date, is_timestamp in SCENARIOS:
+        condition, args = range_condition(column, from_date, to_date, is_timestamp)
+        sql = SUMMARY_SELECT.format(condition=condition, order=CURRENT_ORDER)
+        results[label] = _time_query(cursor, sql, [user] + args, repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench_tasks.db')
+        build_start = time.perf_counter()
+        build_database(path, args.tasks, args.users)
+        print(f"Built {args.tasks} tasks for {args.users} users in {time.perf_counter() - build_start:.1f}s")
+
+        conn, cursor = connectDB(path, DATABASE_KEY)
+        before = run_legacy(cursor, 'user0', args.repeat)
+        migrate_start = time.perf_counter()
+        migrate(conn)
+        migrate_seconds = time.perf_counter() - migrate_start
+        after = run_current(cursor, 'user0', args.repeat)
+        conn.close()
+        close_all_pools()
+
+    report = {
+        'tasks': args.tasks, 'users': args.users, 'repeat': args.repeat,
+        'migration_seconds': round(migrate_seconds, 2),
+        'scenarios': {
+            label: {'before': before[label], 'after': after[label],
+                    'speedup': round(before[label]['median_ms'] / max(after[label]['median_ms'], 1e-6), 1)}
+            for label in before
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
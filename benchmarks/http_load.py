@@ -0,0 +1,168 @@
+"""
+Concurrent-client load test for server.py.
+
+Starts the server in-process on a throwaway database (or targets a running one
+with --url), seeds tasks, then lets --clients threads issue a mix of list, open,
+search and save calls for --seconds. Reports throughput, per-call latency
+percentiles, errors and the server's worker-pool metrics.
+
+    python -m benchmarks.http_load --clients 16 --seconds 20
+    python -m benchmarks.http_load --url http://127.0.0.1:8765 --username bob --password ...
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import urllib.request
+
+# (call, weight) of the simulated client session
+CALL_MIX = [
+    ('load_tasks_summary', 40),
+    ('load_task', 30),
+    ('search', 15),
+    ('get_dashboard', 5),
+    ('save_task', 10),
+]
+
+
+class Client:
+    def __init__(self, url):
+        self.url = url.rstrip('/') + '/api/'
+        self.client_id = f"load-{random.getrandbits(32):x}"
+
+    def call(self, method, *args):
+        request = urllib.request.Request(
+            self.url + method, data=json.dumps(list(args)).encode('utf-8'),
+            headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip', 'X-Client-Id': self.client_id})
+        with urllib.request.urlopen(request) as response:
+            body = response.read()
+            if response.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+        return json.loads(body)
+
+
+def _seed(client, token, tasks):
+    for i in range(tasks):
+        client.call('save_task', token, {
+            'id': f'load-{i}', 'title': f'Load test task {i}', 'status': random.choice(['Open', 'Done', 'Waiting']),
+            'priority': random.randint(1, 5), 'deadline': f'2025-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}',
+            'description': 'lorem ipsum dolor ' * random.randint(5, 50), 'categories': [f'cat{i % 7}'],
+        })
+
+
+def _session(client, token, task_count, deadline, latencies, errors, lock):
+    methods, weights = zip(*CALL_MIX)
+    while time.perf_counter() < deadline:
+        method = random.choices(methods, weights)[0]
+        task_id = f'load-{random.randrange(task_count)}'
+        started = time.perf_counter()
+        try:
+            if method == 'load_tasks_summary':
+                result = client.call('load_tasks_summary', token, {'sortBy': 'deadline'}, {'limit': 20, 'cursor': None})
+            elif method == 'load_task':
+                result = client.call('load_task', token, task_id)
+            elif method == 'search':
+                result = client.call('call_latest', 'search', 'load_tasks_summary', token,
+                                     {'q': random.choice(['lorem', 'ipsum', 'task 1'])}, {'limit': 20, 'cursor': None})
+            elif method == 'get_dashboard':
+                result = client.call('get_dashboard', token)
+            else:
+                result = client.call('save_task', token, {'id': task_id, 'title': f'Edited {time.time()}', 'status': 'Open'})
+            failed = isinstance(result, dict) and 'error' in result and not result.get('cancelled')
+        except Exception:
+            failed = True
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.setdefault(method, []).append(elapsed)
+            if failed:
+                errors[method] = errors.get(method, 0) + 1
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+    return {'calls': len(ordered), 'p50_ms': pick(0.5), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99),
+            'mean_ms': round(statistics.fmean(ordered) * 1000, 2)}
+
+
+def run(url, username, password, clients, seconds, tasks):
+    client = Client(url)
+    login = client.call('login', username, password)
+    if 'error' in login:
+        raise SystemExit(f"Login failed: {login['error']}")
+    token = login['token']
+    _seed(client, token, tasks)
+
+    latencies, errors, lock = {}, {}, threading.Lock()
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=_session, args=(Client(url), token, tasks, deadline, latencies, errors, lock))
+               for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(samples) for samples in latencies.values())
+    return {
+        'clients': clients, 'seconds': round(elapsed, 2), 'calls': total,
+        'calls_per_second': round(total / elapsed, 1),
+        'errors': errors,
+        'per_call': {method: _summary(samples) for method, samples in sorted(latencies.items())},
+        'server_workers': client.call('get_worker_stats', token),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help="Running server to test; by default one is started on a temporary database")
+    parser.add_argument('--username', default='loadtest')
+    parser.add_argument('--password', default='loadtest')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--tasks', type=int, default=500)
+    args = parser.parse_args()
+
+    if args.url:
+        report = run(args.url, args.username, args.password, args.clients, args.seconds, args.tasks)
+        print(json.dumps(report, indent=2))
+        return
+
+    project_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # api creates its databases under ./data, keep them out of the working tree
+        os.chdir(tmp)
+        try:
+            import api
+            import user_manager
+            from executor import ApiExecutor
+            from server import ApiServer
+            from DBconnector import close_all_pools
+            import startup
+
+            startup.wait_ready()
+            user_manager.register_user(args.username, args.password)
+            executor = ApiExecutor(api.Api(), api.READ_CALLS)
+            httpd = ApiServer(('127.0.0.1', 0), executor, diagnostics=True)
+            threading.Thread(target=httpd.serve_forever, daemon=True).start()
+            try:
+                report = run(f'http://127.0.0.1:{httpd.server_port}', args.username, args.password,
+                             args.clients, args.seconds, args.tasks)
+            finally:
+                httpd.shutdown()
+                httpd.server_close()
+                executor.shutdown()
+                close_all_pools()
+        finally:
+            os.chdir(project_dir)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
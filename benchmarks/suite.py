@@ -0,0 +1,280 @@
+"""
+Timed scenario suite over the real Api methods.
+
+Runs every scenario against a copy of a fixture from benchmarks.dataset (or a
+freshly generated throwaway one) and reports p50/p95/p99 latency and throughput
+per scenario as JSON, tagged with the current commit so runs can be compared.
+
+    python -m benchmarks.suite --fixture bench-fixtures/medium --output run.json
+    python -m benchmarks.suite --users 2 --tasks 1000 --compare run.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+SUMMARY_SORTS = ['updatedAt', 'deadline', 'priority', 'from']
+SUMMARY_GROUPS = [None, 'status', 'from', 'priority', 'deadlineYear', 'createdAtMonthYear', 'finishDateYear']
+SUMMARY_PAGE = {'limit': 50, 'cursor': None}
+SEARCH_TERMS = ['report', 'budget; review', 'deploy server', 'quarterly proposal', 'outage']
+SAVE_BURST = 50
+EXPORT_IDS = 200
+
+
+class Context:
+    """Shared state handed to every scenario: the Api, logins and the fixture's task ids."""
+
+    def __init__(self, api_module, manifest, seed):
+        self.api = api_module.Api()
+        self.rng = random.Random(seed)
+        self.users = []
+        for user in manifest['users']:
+            token = self.api.login(user['username'], user['password'])['token']
+            self.users.append((token, user['task_ids']))
+
+    def user(self):
+        return self.rng.choice(self.users)
+
+    def task(self):
+        token, task_ids = self.user()
+        return token, self.rng.choice(task_ids)
+
+
+def _check(result):
+    if isinstance(result, dict) and 'error' in result:
+        raise RuntimeError(result['error'])
+    return result
+
+
+def _summary_scenarios():
+    scenarios = []
+    for sort_by, group_by in itertools.product(SUMMARY_SORTS, SUMMARY_GROUPS):
+        filters = {'sortBy': sort_by} | ({'groupBy': group_by} if group_by else {})
+        name = f"summary sortBy={sort_by}" + (f" groupBy={group_by}" if group_by else '')
+        scenarios.append((name, lambda ctx, filters=filters: _check(
+            ctx.api.load_tasks_summary(ctx.user()[0], filters, SUMMARY_PAGE))))
+
+    filtered = {
+        'status': {'statuses': ['Open', 'In Progress']},
+        'category': {'categories': ['category-0', 'category-5']},
+        'deadline range': {'deadlineRF': '2025-01-01', 'deadlineRT': '2025-03-31', 'sortBy': 'deadline'},
+        'unfinished': {'hasFinishDate': 'false', 'sortBy': 'deadline'},
+        'combined': {'statuses': ['Open'], 'categories': ['category-1'], 'createdRF': '2024-06-01'},
+    }
+    for label, filters in filtered.items():
+        scenarios.append((f"summary filter={label}", lambda ctx, filters=filters: _check(
+            ctx.api.load_tasks_summary(ctx.user()[0], filters, SUMMARY_PAGE))))
+
+    def five_pages(ctx):
+        token = ctx.user()[0]
+        cursor = None
+        for _ in range(5):
+            page = _check(ctx.api.load_tasks_summary(token, {'sortBy': 'deadline'}, {'limit': 50, 'cursor': cursor}))
+            cursor = page['nextCursor']
+            if not cursor:
+                break
+    scenarios.append(("summary 5 pages (cursor)", five_pages))
+    return scenarios
+
+
+def _search(ctx):
+    _check(ctx.api.load_tasks_summary(ctx.user()[0], {'q': ctx.rng.choice(SEARCH_TERMS), 'sortBy': 'relevance'}, SUMMARY_PAGE))
+
+
+def _load_task(ctx):
+    _check(ctx.api.load_task(*ctx.task()))
+
+
+def _load_milestones(ctx):
+    _check(ctx.api.load_milestones_for_task(*ctx.task()))
+
+
+def _milestone_tree(ctx):
+    _check(ctx.api.get_milestone_tree(*ctx.task()))
+
+
+def _save_burst(ctx):
+    token, task_ids = ctx.user()
+    for task_id in ctx.rng.sample(task_ids, min(SAVE_BURST, len(task_ids))):
+        task = _check(ctx.api.load_task(token, task_id))
+        task['title'] = f"Edited {ctx.rng.random():.6f}"
+        _check(ctx.api.save_task(token, task))
+
+
+def _export(ctx):
+    token, task_ids = ctx.user()
+    selection = {'ids': ctx.rng.sample(task_ids, min(EXPORT_IDS, len(task_ids)))}
+    cursor = None
+    while True:
+        chunk = _check(ctx.api.export_tasks(token, selection, {'cursor': cursor}))
+        cursor = chunk['nextCursor']
+        if not cursor:
+            break
+
+
+def _export_import(ctx):
+    token, task_ids = ctx.user()
+    exported = _check(ctx.api.export_tasks(token, {'ids': ctx.rng.sample(task_ids, min(EXPORT_IDS, len(task_ids)))},
+                                           {'chunkSize': EXPORT_IDS}))
+    _check(ctx.api.import_tasks(token, exported))
+
+
+def _distinct_lookups(ctx):
+    token = ctx.user()[0]
+    only_active = ctx.rng.random() < 0.5
+    _check(ctx.api.get_distinct_statuses(token, only_active))
+    _check(ctx.api.get_distinct_from_values(token, only_active))
+    _check(ctx.api.get_distinct_categories(token, only_active))
+
+
+def _dashboard(ctx):
+    _check(ctx.api.get_dashboard(ctx.user()[0], 21, {'refresh': True}))
+
+
+def _facets(ctx):
+    group_by = ctx.rng.choice(['status', 'priority', 'category', 'deadlineMonthYear'])
+    _check(ctx.api.get_task_facets(ctx.user()[0], {'groupBy': group_by, 'sortBy': 'updatedAt'}))
+
+
+def _upcoming_milestones(ctx):
+    _check(ctx.api.query_milestones(ctx.user()[0], {'hasFinishDate': 'false', 'sortBy': 'deadline'}, {'limit': 50, 'cursor': None}))
+
+
+def _full_sync(ctx):
+    token = ctx.user()[0]
+    sync_token = None
+    while True:
+        page = _check(ctx.api.get_changes(token, sync_token))
+        sync_token = page['syncToken']
+        if not page['hasMore']:
+            break
+
+
+# (name, function(ctx), repeat multiplier); heavy scenarios run fewer times
+SCENARIOS = [(name, fn, 1) for name, fn in _summary_scenarios()] + [
+    ("search", _search, 1),
+    ("load_task", _load_task, 5),
+    ("load_milestones_for_task", _load_milestones, 2),
+    ("get_milestone_tree", _milestone_tree, 2),
+    ("distinct lookups", _distinct_lookups, 1),
+    ("dashboard (uncached)", _dashboard, 0.5),
+    ("task facets (grouped)", _facets, 1),
+    ("query_milestones unfinished", _upcoming_milestones, 1),
+    (f"save burst ({SAVE_BURST} load+save)", _save_burst, 0.2),
+    (f"export {EXPORT_IDS} tasks", _export, 0.2),
+    (f"export+import {EXPORT_IDS} tasks", _export_import, 0.2),
+    ("full delta sync", _full_sync, 0.2),
+]
+
+
+def _percentile(ordered, q):
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+
+def run_scenarios(ctx, repeat, only=None):
+    results = {}
+    for name, fn, multiplier in SCENARIOS:
+        if only and not any(part in name for part in only):
+            continue
+        runs = max(1, int(repeat * multiplier))
+        fn(ctx)  # warm-up: first-use caches and page cache
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            fn(ctx)
+            samples.append(time.perf_counter() - started)
+        ordered = sorted(samples)
+        results[name] = {
+            'calls': runs,
+            'p50_ms': _percentile(ordered, 0.5), 'p95_ms': _percentile(ordered, 0.95),
+            'p99_ms': _percentile(ordered, 0.99), 'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+            'ops_per_sec': round(runs / sum(ordered), 1),
+        }
+    return results
+
+
+def _commit(project_dir):
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_dir,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """p50/p95 ratios (this run / baseline) for the scenarios both runs share; below 1.0 is faster."""
+    ratios = {}
+    for name, result in report['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name)
+        if old and old['p50_ms'] and old['p95_ms']:
+            ratios[name] = {'p50_ratio': round(result['p50_ms'] / old['p50_ms'], 3),
+                            'p95_ratio': round(result['p95_ms'] / old['p95_ms'], 3)}
+    return {'baseline_commit': baseline.get('meta', {}).get('commit'), 'scenarios': ratios}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--fixture', help="Fixture directory from benchmarks.dataset (it is copied, never modified)")
+    parser.add_argument('--users', type=int, default=2, help="Without --fixture: users of the generated fixture")
+    parser.add_argument('--tasks', type=int, default=1000, help="Without --fixture: tasks per user")
+    parser.add_argument('--max-depth', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=20, help="Timed runs per scenario (heavy ones run fewer)")
+    parser.add_argument('--only', nargs='*', help="Run only scenarios whose name contains one of these")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="Write the JSON report here as well")
+    parser.add_argument('--compare', help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    project_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.fixture:
+            shutil.copytree(os.path.join(args.fixture, 'data'), os.path.join(tmp, 'data'))
+            with open(os.path.join(args.fixture, 'fixture.json'), encoding='utf-8') as f:
+                manifest = json.load(f)
+        # api opens ./data relative to the working directory
+        os.chdir(tmp)
+        try:
+            if not args.fixture:
+                from benchmarks.dataset import build_fixture
+                manifest = build_fixture(args.users, args.tasks, args.max_depth, args.seed)
+            import api
+            import sqlcipher3.dbapi2 as sqlite3
+            from DBconnector import close_all_pools
+
+            ctx = Context(api, manifest, args.seed)
+            scenarios = run_scenarios(ctx, args.repeat, args.only)
+            close_all_pools()
+        finally:
+            os.chdir(project_dir)
+
+    report = {
+        'meta': {
+            'commit': _commit(project_dir),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'fixture': {key: (len(value) if key == 'users' else value) for key, value in manifest.items()},
+            'repeat': args.repeat,
+        },
+        'scenarios': scenarios,
+    }
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            report['comparison'] = compare(report, json.load(f))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
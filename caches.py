@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Small in-process caches shared by the Api methods.
+# Every desktop client runs its own Python process, so anything cached here only
+# sees this client's writes; callers must bound staleness (TTL, change counters).
+
+
+class TTLCache:
+    """Thread-safe key/value cache whose entries expire ttl seconds after being stored."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (expires_at_monotonic, value)
+
+    def get(self, key):
+        """Returns the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class LRUCache:
+    """Thread-safe key/value cache holding at most max_size entries; the least recently used one is dropped first."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """Returns the cached value (marking it as recently used), or None if missing."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            return self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
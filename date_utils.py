@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta, timezone
+
+# Canonical storage formats for date columns.
+# Calendar dates (deadline, finishDate) are stored as 'YYYY-MM-DD'.
+# Timestamps (createdAt, updatedAt) are stored as UTC 'YYYY-MM-DDTHH:MM:SS.sssZ',
+# the same shape the frontend produces with Date.toISOString().
+# Empty values are stored as NULL. Both formats sort correctly as plain strings,
+# which is what lets range filters and ORDER BY use the column indexes directly.
+
+DATE_COLUMNS = ('deadline', 'finishDate')
+TIMESTAMP_COLUMNS = ('createdAt', 'updatedAt')
+
+_FALLBACK_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y/%m/%d', '%Y-%m-%d', '%Y-%m')
+
+
+def parse_datetime(value):
+    """Parses the date/datetime spellings found in older databases. Returns an aware UTC datetime or None."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value).strip()
+        if not text:
+            return None
+        if text.endswith('Z') or text.endswith('z'):
+            text = text[:-1] + '+00:00'
+        try:
+            parsed = datetime.fromisoformat(text)
+        except ValueError:
+            parsed = None
+            for fmt in _FALLBACK_FORMATS:
+                try:
+                    parsed = datetime.strptime(text, fmt)
+                    break
+                except ValueError:
+                    continue
+            if parsed is None:
+                return None
+    if parsed.tzinfo is None:
+        # Naive values were always compared as UTC by SQLite's date()
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def format_timestamp(dt):
+    return dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.') + f"{dt.microsecond // 1000:03d}Z"
+
+
+def normalize_date(value):
+    """Returns value as 'YYYY-MM-DD', None for empty values, or the original text if it cannot be parsed."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, str) and len(value) >= 10 and value[4] == '-' and value[7] == '-':
+        # A date (or datetime) already written as YYYY-MM-DD...: keep the calendar day the user picked
+        try:
+            return datetime.strptime(value[:10], '%Y-%m-%d').strftime('%Y-%m-%d')
+        except ValueError:
+            pass
+    parsed = parse_datetime(value)
+    return parsed.strftime('%Y-%m-%d') if parsed else value
+
+
+def normalize_timestamp(value):
+    """Returns value as a canonical UTC timestamp, None for empty values, or the original text if unparseable."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    parsed = parse_datetime(value)
+    return format_timestamp(parsed) if parsed else value
+
+
+def range_condition(column, from_date, to_date, is_timestamp=False):
+    """
+    Builds an index-friendly range predicate for a date filter.
+    from_date/to_date are inclusive calendar days ('YYYY-MM-DD'). For timestamp columns the
+    upper bound becomes "before the next day", so no function has to be applied to the column.
+    Returns (sql, args), or None if one of the bounds is not a valid date.
+    """
+    conditions = []
+    args = []
+    if from_date:
+        start = normalize_date(from_date)
+        if parse_datetime(start) is None:
+            return None
+        conditions.append(f"{column} >= ?")
+        args.append(start)
+    if to_date:
+        end = normalize_date(to_date)
+        end_dt = parse_datetime(end)
+        if end_dt is None:
+            return None
+        if is_timestamp:
+            conditions.append(f"{column} < ?")
+            args.append((end_dt + timedelta(days=1)).strftime('%Y-%m-%d'))
+        else:
+            conditions.append(f"{column} <= ?")
+            args.append(end)
+    return " AND ".join(conditions), args
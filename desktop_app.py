@@ -1,11 +1,32 @@
+import startup  # First import: the startup report measures from here
 import webview
-from api import Api
+from api import Api, READ_CALLS, DB_FILE
+from executor import ApiExecutor
+from archive_store import ArchiveJob
+from maintenance import MaintenanceJob
+from user_manager import AUTH_DB_FILE
+from DBconnector import close_all_pools
+
+startup.mark('imports')
 
 def main():
+    # Database checks run in the background while the window opens; API calls wait for them
+    startup.begin()
     api = Api()
-    window = webview.create_window('PrismTask - Task Manager', 'index.html', js_api=api, width=1200, height=800)
+    # Reads run concurrently on read-only connections, writes one at a time (see executor.py)
+    executor = ApiExecutor(api, READ_CALLS)
+    # Moves long-finished tasks to archive.db now and then, one writer batch at a time
+    archive_job = ArchiveJob(executor)
+    archive_job.start()
+    # Vacuum, checkpoint and backup once a day, while nobody is using the app
+    maintenance_job = MaintenanceJob(executor, [DB_FILE, AUTH_DB_FILE])
+    maintenance_job.start()
+    window = webview.create_window('PrismTask - Task Manager', 'index.html', js_api=executor.bridge(), width=1200, height=800)
 
     def on_loaded():
+        if 'first paint' not in startup.report()['marks']:
+            startup.mark('first paint')
+            startup.begin().add_done_callback(lambda _: print(startup.format_report()))
         zoom_script = """
         (function() {
             let zoom = 1.0;
@@ -24,6 +45,10 @@ def main():
     window.events.loaded += on_loaded
     #webview.start(private_mode=False)
     webview.start(debug=False, private_mode=True)
+    archive_job.stop()
+    maintenance_job.stop()
+    executor.shutdown()
+    close_all_pools()
 
 if __name__ == '__main__':
     main()
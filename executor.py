@@ -0,0 +1,200 @@
+import collections
+import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from DBconnector import bind_thread, set_cancel_event
+
+# Execution layer between the pywebview bridge and Api.
+# Read calls (api.READ_CALLS) run on a pool of threads with read-only WAL connections,
+# so a slow search or export never holds up a quick load_task. All other calls run one
+# at a time on a single writer thread, so writers never fight over the database lock.
+
+READ_WORKERS = 4
+# Latency samples kept per lane for the percentiles in metrics()
+LATENCY_SAMPLES = 1000
+
+
+class RequestCancelled(Exception):
+    """Raised for a call that was superseded before or while it ran."""
+
+
+def _percentiles(samples):
+    if not samples:
+        return {"p50": None, "p95": None, "max": None}
+    ordered = sorted(samples)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+    return {"p50": pick(0.5), "p95": pick(0.95), "max": round(ordered[-1] * 1000, 2)}
+
+
+class _LaneStats:
+    """Queue depth and latency counters of one lane (read or write)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.counts = collections.Counter()
+        self.waits = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.runs = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.methods = {}  # name -> [calls, total seconds, max seconds]
+
+    def submitted(self):
+        with self._lock:
+            self.queued += 1
+
+    def started(self, waited):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.waits.append(waited)
+
+    def finished(self, name, outcome, ran):
+        with self._lock:
+            self.running -= 1
+            self.counts[outcome] += 1
+            self.runs.append(ran)
+            calls = self.methods.setdefault(name, [0, 0.0, 0.0])
+            calls[0] += 1
+            calls[1] += ran
+            calls[2] = max(calls[2], ran)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.counts['completed'],
+                "failed": self.counts['failed'],
+                "cancelled": self.counts['cancelled'],
+                "waitMs": _percentiles(self.waits),
+                "runMs": _percentiles(self.runs),
+                "methods": {
+                    name: {"calls": calls, "meanMs": round(total / calls * 1000, 2), "maxMs": round(longest * 1000, 2)}
+                    for name, (calls, total, longest) in sorted(self.methods.items())
+                },
+            }
+
+
+class ApiExecutor:
+    """Routes Api calls to the reader pool or the writer thread."""
+
+    def __init__(self, api, read_calls, read_workers=READ_WORKERS):
+        self._api = api
+        self._read_calls = frozenset(read_calls)
+        self._readers = ThreadPoolExecutor(read_workers, thread_name_prefix='api-read',
+                                           initializer=bind_thread, initargs=(True,))
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix='api-write')
+        self._stats = {'read': _LaneStats(), 'write': _LaneStats()}
+        self._latest = {}  # key -> cancel event of the newest call_latest call with that key
+        self._latest_lock = threading.Lock()
+        self._last_activity = time.monotonic()
+
+    def submit(self, name, args=(), cancel_event=None):
+        """Queues Api.<name>(*args) on its lane and returns the Future."""
+        lane = 'read' if name in self._read_calls else 'write'
+        stats = self._stats[lane]
+        stats.submitted()
+        pool = self._readers if lane == 'read' else self._writer
+        return pool.submit(self._run, stats, name, args, cancel_event or threading.Event(), time.perf_counter())
+
+    def _run(self, stats, name, args, cancel_event, submitted_at):
+        started_at = time.perf_counter()
+        stats.started(started_at - submitted_at)
+        if cancel_event.is_set():
+            stats.finished(name, 'cancelled', 0.0)
+            raise RequestCancelled(name)
+
+        outcome = 'failed'
+        set_cancel_event(cancel_event)
+        try:
+            result = getattr(self._api, name)(*args)
+            outcome = 'completed'
+            return result
+        except Exception:
+            # The interrupted query surfaces as an OperationalError from inside the Api method
+            if cancel_event.is_set():
+                outcome = 'cancelled'
+                raise RequestCancelled(name)
+            raise
+        finally:
+            set_cancel_event(None)
+            stats.finished(name, outcome, time.perf_counter() - started_at)
+            self._last_activity = time.monotonic()
+
+    def call(self, name, *args):
+        """Runs Api.<name>(*args) on its lane and waits for the result."""
+        return self.submit(name, args).result()
+
+    def call_latest(self, key, name, *args):
+        """
+        Like call, but a later call_latest with the same key supersedes this one: if it is still
+        queued it never runs, a running read query is interrupted. A superseded call returns
+        {"error": ..., "cancelled": True}. Writes are never superseded.
+        """
+        if name not in self._read_calls:
+            return self.call(name, *args)
+        cancel_event = threading.Event()
+        with self._latest_lock:
+            previous = self._latest.get(key)
+            self._latest[key] = cancel_event
+        if previous is not None:
+            previous.set()
+        try:
+            return self.submit(name, args, cancel_event).result()
+        except RequestCancelled:
+            return {"error": "Request superseded by a newer one.", "cancelled": True}
+        finally:
+            with self._latest_lock:
+                if self._latest.get(key) is cancel_event:
+                    del self._latest[key]
+
+    def metrics(self):
+        """Queue depth, outcome counts and wait/run latency (ms) per lane."""
+        return {lane: stats.snapshot() for lane, stats in self._stats.items()}
+
+    def idle_seconds(self):
+        """Seconds since the last call finished, 0 while any call is queued or running."""
+        if any(stats.queued or stats.running for stats in self._stats.values()):
+            return 0.0
+        return time.monotonic() - self._last_activity
+
+    def shutdown(self):
+        with self._latest_lock:
+            for cancel_event in self._latest.values():
+                cancel_event.set()
+        self._readers.shutdown(wait=True, cancel_futures=True)
+        self._writer.shutdown(wait=True)
+
+    def bridge(self):
+        """Returns an object for pywebview's js_api whose methods run through this executor."""
+        api, executor = self._api, self
+
+        def routed(name):
+            def method(self, *args):
+                return executor.call(name, *args)
+            method.__name__ = name
+            # pywebview reads the parameter list of every exposed method
+            method.__signature__ = inspect.signature(getattr(type(api), name))
+            return method
+
+        def call_latest(self, key, name, *args):
+            """Runs a bridge call that a newer call with the same key may supersede, e.g. a search as the user types."""
+            if name.startswith('_') or not callable(getattr(api, name, None)):
+                return {"error": f"Unknown method: {name}"}
+            return executor.call_latest(key, name, *args)
+
+        def get_worker_stats(self, token):
+            """Queue depth and latency metrics of the worker pool."""
+            if not api._get_authenticated_username(token):
+                return {"error": "Authentication required."}
+            return executor.metrics()
+
+        namespace = {
+            name: routed(name) for name in dir(api)
+            if not name.startswith('_') and callable(getattr(api, name))
+        }
+        namespace['call_latest'] = call_latest
+        namespace['get_worker_stats'] = get_worker_stats
+        return type('ApiBridge', (), namespace)()
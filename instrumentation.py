@@ -0,0 +1,318 @@
+import collections
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import os
+import re
+import threading
+import time
+
+# Opt-in timing of Api calls and the SQL they run.
+# Enabled with PRISMTASK_METRICS=1 (PRISMTASK_METRICS_LOG=<file> adds a rotating JSONL log)
+# or enable(). While disabled, Api methods pay one flag check and connectDB hands out
+# plain cursors, so there is next to no overhead.
+#
+# Each Api call is split into phases: auth (token check), connect (waiting for a pooled
+# connection), sql (execute + fetch) and other (Python work such as row-to-dict conversion).
+
+SLOW_QUERY_MS = 50.0
+SLOW_QUERY_KEEP = 50
+# Statements listed in get_metrics, by total time
+TOP_STATEMENTS = 30
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+CONNECTION_SAMPLES = 200
+
+enabled = False
+_slow_query_ms = SLOW_QUERY_MS
+_lock = threading.Lock()
+_local = threading.local()
+_log = None
+
+
+def _reset_state():
+    global _methods, _statements, _slow_queries, _connection_setups, _since
+    _methods = {}  # name -> {calls, errors, total, max, auth, connect, sql, rows}
+    _statements = {}  # normalized sql -> {calls, total, max, rows}
+    _slow_queries = collections.deque(maxlen=SLOW_QUERY_KEEP)
+    _connection_setups = collections.deque(maxlen=CONNECTION_SAMPLES)  # (dbfile, seconds)
+    _since = time.time()
+
+
+_reset_state()
+
+
+def enable(log_path=None, slow_query_ms=None):
+    """Starts recording; with log_path every call (and slow query) is also appended to a rotating JSONL file."""
+    global enabled, _log, _slow_query_ms
+    if slow_query_ms is not None:
+        _slow_query_ms = float(slow_query_ms)
+    if log_path and _log is None:
+        handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        _log = logging.getLogger('prismtask.metrics')
+        _log.propagate = False
+        _log.setLevel(logging.INFO)
+        _log.addHandler(handler)
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with _lock:
+        _reset_state()
+
+
+def _write_log(record):
+    if _log is not None:
+        _log.info(json.dumps(record, separators=(',', ':'), default=str))
+
+
+def _normalize_sql(sql):
+    return re.sub(r'\s+', ' ', sql).strip()[:300]
+
+
+# --- Phase accounting ---
+
+def _frames():
+    frames = getattr(_local, 'frames', None)
+    if frames is None:
+        frames = _local.frames = []
+    return frames
+
+
+def _add_phase(phase, seconds, rows=0):
+    # Nested calls (e.g. Api.batch) charge the time to every call on the stack
+    for frame in _frames():
+        frame[phase] += seconds
+        frame['rows'] += rows
+
+
+def _timed_call(name, fn, args, kwargs):
+    frame = {'auth': 0.0, 'connect': 0.0, 'sql': 0.0, 'rows': 0}
+    frames = _frames()
+    frames.append(frame)
+    failed = True
+    started = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+        failed = isinstance(result, dict) and 'error' in result
+        return result
+    finally:
+        elapsed = time.perf_counter() - started
+        frames.pop()
+        with _lock:
+            stats = _methods.setdefault(name, {'calls': 0, 'errors': 0, 'total': 0.0, 'max': 0.0,
+                                                'auth': 0.0, 'connect': 0.0, 'sql': 0.0, 'rows': 0})
+            stats['calls'] += 1
+            stats['errors'] += failed
+            stats['total'] += elapsed
+            stats['max'] = max(stats['max'], elapsed)
+            for phase in ('auth', 'connect', 'sql', 'rows'):
+                stats[phase] += frame[phase]
+        _write_log({'type': 'call', 'method': name, 'ms': round(elapsed * 1000, 3), 'error': failed,
+                    'authMs': round(frame['auth'] * 1000, 3), 'connectMs': round(frame['connect'] * 1000, 3),
+                    'sqlMs': round(frame['sql'] * 1000, 3), 'rows': frame['rows'], 'at': time.time()})
+
+
+def _timed_phase(phase, fn, args, kwargs):
+    started = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _add_phase(phase, time.perf_counter() - started)
+
+
+def instrument_class(phases=None):
+    """
+    Class decorator: public methods are timed as calls, the methods named in phases
+    ({method name: phase}) count towards that phase of the calling method.
+    """
+    phases = phases or {}
+
+    def decorate(cls):
+        for name, fn in list(vars(cls).items()):
+            if not inspect.isfunction(fn) or (name.startswith('_') and name not in phases):
+                continue
+            setattr(cls, name, _wrap(name, fn, phases.get(name)))
+        return cls
+    return decorate
+
+
+def _wrap(name, fn, phase):
+    if phase:
+        @functools.wraps(fn)
+        def method(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            return _timed_phase(phase, fn, args, kwargs)
+    else:
+        @functools.wraps(fn)
+        def method(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            return _timed_call(name, fn, args, kwargs)
+    # pywebview reads parameter lists with getfullargspec, which ignores __wrapped__
+    method.__signature__ = inspect.signature(fn)
+    return method
+
+
+def record_connect_wait(seconds):
+    _add_phase('connect', seconds)
+
+
+def record_connection_setup(dbfile, seconds):
+    with _lock:
+        _connection_setups.append((dbfile, seconds))
+    _write_log({'type': 'connection_setup', 'dbfile': dbfile, 'ms': round(seconds * 1000, 3), 'at': time.time()})
+
+
+# --- SQL statements ---
+
+class InstrumentedCursor:
+    """Cursor wrapper handed out by connectDB while enabled; times execute and fetch per statement."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._current = None  # [statement key, sql, params, seconds so far, slow query entry]
+
+    def _account(self, seconds, rows=0):
+        current = self._current
+        _add_phase('sql', seconds, rows)
+        if current is None:
+            return
+        current[3] += seconds
+        with _lock:
+            stats = _statements.setdefault(current[0], {'calls': 0, 'total': 0.0, 'max': 0.0, 'rows': 0})
+            stats['total'] += seconds
+            stats['rows'] += rows
+            stats['max'] = max(stats['max'], current[3])
+        if current[3] * 1000 >= _slow_query_ms:
+            if current[4] is None:
+                current[4] = self._capture_slow(current)
+            else:
+                current[4]['ms'] = round(current[3] * 1000, 3)
+            current[4]['rows'] += rows
+
+    def _capture_slow(self, current):
+        _, sql, params, seconds, _ = current
+        try:
+            plan_cursor = self._cursor.connection.cursor()
+            plan_cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = [row[-1] for row in plan_cursor.fetchall()]
+        except Exception as e:
+            plan = [f"(no plan: {e})"]
+        entry = {'sql': _normalize_sql(sql), 'ms': round(seconds * 1000, 3), 'rows': 0, 'plan': plan, 'at': time.time()}
+        with _lock:
+            _slow_queries.append(entry)
+        _write_log(dict(entry, type='slow_query'))
+        return entry
+
+    def _start(self, sql, params):
+        key = _normalize_sql(sql)
+        self._current = [key, sql, params, 0.0, None]
+        with _lock:
+            _statements.setdefault(key, {'calls': 0, 'total': 0.0, 'max': 0.0, 'rows': 0})['calls'] += 1
+
+    def execute(self, sql, params=()):
+        self._start(sql, params)
+        started = time.perf_counter()
+        try:
+            self._cursor.execute(sql, params)
+        finally:
+            self._account(time.perf_counter() - started)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._current = None
+        self._start(sql, ())
+        self._current[2] = None  # No single parameter set to explain with
+        started = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, seq_of_params)
+        finally:
+            self._account(time.perf_counter() - started)
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._account(time.perf_counter() - started, 0 if row is None else 1)
+        return row
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._account(time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._account(time.perf_counter() - started, len(rows))
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+# --- Reporting ---
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def snapshot(reset_after=False):
+    """All recorded metrics as plain JSON-able data."""
+    with _lock:
+        methods = {}
+        for name, stats in sorted(_methods.items()):
+            calls = stats['calls']
+            other = stats['total'] - stats['auth'] - stats['connect'] - stats['sql']
+            methods[name] = {
+                'calls': calls, 'errors': stats['errors'],
+                'meanMs': _ms(stats['total'] / calls), 'maxMs': _ms(stats['max']), 'totalMs': _ms(stats['total']),
+                'phasesMs': {'auth': _ms(stats['auth']), 'connect': _ms(stats['connect']),
+                             'sql': _ms(stats['sql']), 'other': _ms(max(other, 0.0))},
+                'rows': stats['rows'],
+            }
+        statements = [
+            {'sql': sql, 'calls': stats['calls'], 'totalMs': _ms(stats['total']),
+             'meanMs': _ms(stats['total'] / stats['calls']) if stats['calls'] else 0.0,
+             'maxMs': _ms(stats['max']), 'rows': stats['rows']}
+            for sql, stats in sorted(_statements.items(), key=lambda item: -item[1]['total'])[:TOP_STATEMENTS]
+        ]
+        setups = [seconds for _, seconds in _connection_setups]
+        result = {
+            'enabled': enabled,
+            'since': _since,
+            'slowQueryMs': _slow_query_ms,
+            'methods': methods,
+            'statements': statements,
+            'slowQueries': list(_slow_queries),
+            'connectionSetup': {
+                'count': len(setups),
+                'meanMs': _ms(sum(setups) / len(setups)) if setups else None,
+                'maxMs': _ms(max(setups)) if setups else None,
+            },
+        }
+        if reset_after:
+            _reset_state()
+    return result
+
+
+if os.getenv('PRISMTASK_METRICS') == '1' or os.getenv('PRISMTASK_METRICS_LOG'):
+    enable(os.getenv('PRISMTASK_METRICS_LOG'), os.getenv('PRISMTASK_SLOW_QUERY_MS'))
@@ -1,16 +1,53 @@
 // js/apiService.js
-// Centralized service for making API calls to the backend using pywebview.
+// Centralized service for making API calls to the backend: the pywebview bridge in the
+// desktop app, or the HTTP/JSON endpoints of server.py when the page was served by it.
 
 let _authToken = null;
 let _authUsername = null;
+// Bumped after every successful write, so syncService knows its mirror is behind
+let _localWriteCount = 0;
 
-export const pywebviewReady = new Promise(resolve => {
+// Set by server.py in the index.html it serves
+const SERVER_URL = window.PRISMTASK_SERVER_URL || null;
+// Lets the server keep call_latest keys of different browser tabs apart
+const CLIENT_ID = Math.random().toString(36).slice(2);
+
+// Resolves once the backend can take calls (immediately in server mode)
+export const pywebviewReady = SERVER_URL ? Promise.resolve() : new Promise(resolve => {
     window.addEventListener('pywebviewready', () => {
         console.log('pywebview is ready');
         resolve();
     });
 });
 
+/**
+ * Posts one call to server.py. Errors raised inside the method come back as { error }.
+ */
+async function postToServer(path, payload) {
+    const response = await fetch(`${SERVER_URL}/${path}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-Client-Id': CLIENT_ID },
+        body: JSON.stringify(payload)
+    });
+    const data = await response.json(); // gzip is decoded by the browser
+    if (!response.ok && !(data && data.error)) {
+        throw new Error(`Server responded with ${response.status}`);
+    }
+    return data;
+}
+
+// Same call shape as window.pywebview.api: httpApi.load_task(token, id) posts to /api/load_task
+const httpApi = new Proxy({}, {
+    get: (_, method) => (...args) => postToServer(method, args)
+});
+
+/**
+ * Returns the object the API methods are called on.
+ */
+function backend() {
+    return SERVER_URL ? httpApi : window.pywebview.api;
+}
+
 /**
  * Initializes authentication by attempting to load the token from sessionStorage.
  */
@@ -29,7 +66,7 @@ export function initAuth() {
 export async function login(username, password) {
     await pywebviewReady;
     try {
-        const data = await window.pywebview.api.login(username, password);
+        const data = await backend().login(username, password);
         if (data.error) {
             throw new Error(data.error);
         }
@@ -45,9 +82,14 @@ export async function login(username, password) {
 }
 
 /**
- * Logs out the user.
+ * Logs out the user. The token is also revoked on the server (fire and forget).
  */
 export function logout() {
+    if (_authToken && (SERVER_URL || (window.pywebview && window.pywebview.api))) {
+        const token = _authToken;
+        Promise.resolve(backend().logout(token))
+            .catch(error => console.error('Failed to revoke token on server:', error));
+    }
     _authToken = null;
     _authUsername = null;
     sessionStorage.removeItem('authToken');
@@ -55,6 +97,13 @@ export function logout() {
     console.log('User logged out.');
 }
 
+/**
+ * Number of successful writes made through this module so far.
+ */
+export function getLocalWriteCount() {
+    return _localWriteCount;
+}
+
 /**
  * Returns the currently authenticated username.
  */
@@ -79,7 +128,7 @@ async function handleApiResponse(response) {
 export async function loadTaskFromServer(taskId) {
     await pywebviewReady;
     try {
-        const response = await window.pywebview.api.load_task(_authToken, taskId);
+        const response = await callBatched('load_task', taskId);
         return await handleApiResponse(response);
     } catch (error) {
         console.error('Failed to load task from server:', error);
@@ -87,13 +136,118 @@ export async function loadTaskFromServer(taskId) {
     }
 }
 
+// Read calls issued in the same tick, sent together as Api.batch calls
+let _pendingCalls = [];
+// Api.batch refuses more calls than this (MAX_BATCH_CALLS in api.py)
+const MAX_BATCH_CALLS = 50;
+
+/**
+ * Queues a read call (args without the token) for the next batch. Calls made in the same tick,
+ * e.g. by Promise.all, cross the bridge once and are answered from one database snapshot.
+ */
+function callBatched(method, ...args) {
+    return new Promise((resolve, reject) => {
+        _pendingCalls.push({ method, args, resolve, reject });
+        if (_pendingCalls.length === 1) setTimeout(flushBatchedCalls, 0);
+    });
+}
+
+function flushBatchedCalls() {
+    const calls = _pendingCalls;
+    _pendingCalls = [];
+    for (let start = 0; start < calls.length; start += MAX_BATCH_CALLS) {
+        sendBatch(calls.slice(start, start + MAX_BATCH_CALLS));
+    }
+}
+
+async function sendBatch(calls) {
+    if (calls.length === 1) {
+        const { method, args, resolve, reject } = calls[0];
+        Promise.resolve(backend()[method](_authToken, ...args)).then(resolve, reject);
+        return;
+    }
+    try {
+        const response = await backend().batch(_authToken, calls.map(({ method, args }) => ({ method, args })));
+        // An error for the whole batch (e.g. expired login) becomes every caller's response
+        calls.forEach((call, i) => call.resolve(response.results ? response.results[i] : response));
+    } catch (error) {
+        calls.forEach(call => call.reject(error));
+    }
+}
+
+/**
+ * Runs a read call that a newer call with the same key supersedes (e.g. a search while typing).
+ * Superseded calls resolve to { error, cancelled: true }. Falls back to a plain call when the
+ * bridge has no worker pool.
+ */
+async function callLatest(key, method, ...args) {
+    if (typeof backend().call_latest === 'function') {
+        return backend().call_latest(key, method, ...args);
+    }
+    return backend()[method](...args);
+}
+
+/**
+ * Returns queue depth and latency metrics of the backend worker pool.
+ */
+export async function getWorkerStatsFromServer() {
+    await pywebviewReady;
+    try {
+        const response = await backend().get_worker_stats(_authToken);
+        return await handleApiResponse(response);
+    } catch (error) {
+        console.error('Failed to load worker stats from server:', error);
+        throw error;
+    }
+}
+
+/**
+ * Reads one chunk of an attachment's content ({ hash, size, chunkCount, chunk, data }, data in base64).
+ */
+export async function readAttachmentFromServer(hash, chunk = 0) {
+    await pywebviewReady;
+    try {
+        const response = await callBatched('read_attachment', hash, chunk);
+        return await handleApiResponse(response);
+    } catch (error) {
+        console.error('Failed to read attachment from server:', error);
+        throw error;
+    }
+}
+
+/**
+ * Fetches a saved attachment chunk by chunk and returns its content as a Blob.
+ * Tasks only carry attachment metadata ({ name, type, size, hash }), so this runs on demand.
+ */
+export async function loadAttachmentBlob(attachment) {
+    const parts = [];
+    let chunkCount = 1;
+    for (let chunk = 0; chunk < chunkCount; chunk++) {
+        const response = await readAttachmentFromServer(attachment.hash, chunk);
+        chunkCount = response.chunkCount;
+        const binary = atob(response.data);
+        const bytes = new Uint8Array(binary.length);
+        for (let i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        parts.push(bytes);
+    }
+    return new Blob(parts, { type: attachment.type || 'application/octet-stream' });
+}
+
 /**
  * Loads a summary of tasks from the server.
+ * Pass { limit, cursor } (cursor null for the first page) to get { tasks, nextCursor } back;
+ * { limit, offset } still returns a plain array.
+ * With a requestKey, a later call with the same key supersedes this one, which then resolves to null.
  */
-export async function loadTasksSummaryFromServer(filters = {}, pagination = {}) {
+export async function loadTasksSummaryFromServer(filters = {}, pagination = {}, requestKey = null) {
     await pywebviewReady;
     try {
-        const response = await window.pywebview.api.load_tasks_summary(_authToken, filters, pagination);
+        const response = requestKey
+            ? await callLatest(requestKey, 'load_tasks_summary', _authToken, filters, pagination)
+            : await callBatched('load_tasks_summary', filters, pagination);
+        if (response && response.cancelled) return null;
         return await handleApiResponse(response);
     } catch (error) {
         console.error('Failed to load task summaries from server:', error);
@@ -101,28 +255,87 @@ export async function loadTasksSummaryFromServer(filters = {}, pagination = {})
     }
 }
 
+/**
+ * Loads counts for the task list under the given filters:
+ * { total, groupBy, groups: [{ key, count }], statuses, froms, categories }.
+ * A group's tasks are loaded with loadTasksSummaryFromServer({ ...filters, groupKey: key }).
+ * With a requestKey, a later call with the same key supersedes this one, which then resolves to null.
+ */
+export async function getTaskFacetsFromServer(filters = {}, requestKey = null) {
+    await pywebviewReady;
+    try {
+        const response = requestKey
+            ? await callLatest(requestKey, 'get_task_facets', _authToken, filters)
+            : await callBatched('get_task_facets', filters);
+        if (response && response.cancelled) return null;
+        return await handleApiResponse(response);
+    } catch (error) {
+        console.error('Failed to load task facets from server:', error);
+        throw error;
+    }
+}
+
 /**
  * Sends task data to the Python server.
  */
 export async function saveTaskToServer(task) {
     await pywebviewReady;
     try {
-        const response = await window.pywebview.api.save_task(_authToken, task);
-        return await handleApiResponse(response);
+        const response = await backend().save_task(_authToken, task);
+        const result = await handleApiResponse(response);
+        _localWriteCount++;
+        return result;
     } catch (error) {
         console.error('Failed to save task to server:', error);
         throw error;
     }
 }
 
+/**
+ * Thrown by the patch calls when the record changed on the server since it was loaded.
+ * `current` holds the server's version.
+ */
+export class ConflictError extends Error {
+    constructor(message, current) {
+        super(message);
+        this.name = 'ConflictError';
+        this.current = current;
+    }
+}
+
+async function handlePatchResponse(response) {
+    if (response && response.conflict) {
+        throw new ConflictError(response.error, response.current);
+    }
+    const result = await handleApiResponse(response);
+    _localWriteCount++;
+    return result;
+}
+
+/**
+ * Sends only the changed fields of a task. expectedUpdatedAt is the updatedAt the editor loaded;
+ * throws ConflictError if someone saved the task in between. Resolves to {message, updatedAt}.
+ */
+export async function patchTaskToServer(taskId, changes, expectedUpdatedAt) {
+    await pywebviewReady;
+    try {
+        return await handlePatchResponse(await backend().patch_task(_authToken, taskId, changes, expectedUpdatedAt));
+    } catch (error) {
+        console.error('Failed to patch task on server:', error);
+        throw error;
+    }
+}
+
 /**
  * Deletes a task from the Python server.
  */
 export async function deleteTaskFromServer(taskId) {
     await pywebviewReady;
     try {
-        const response = await window.pywebview.api.delete_task(_authToken, taskId);
-        return await handleApiResponse(response);
+        const response = await backend().delete_task(_authToken, taskId);
+        const result = await handleApiResponse(response);
+        _localWriteCount++;
+        return result;
     } catch (error) {
         console.error('Failed to delete task from server:', error);
         throw error;
@@ -135,7 +348,7 @@ export async function deleteTaskFromServer(taskId) {
 export async function loadMilestonesForTaskFromServer(taskId) {
     await pywebviewReady;
     try {
-        const response = await window.pywebview.api.load_milestones_for_task(_authToken, taskId);
+        const response = await callBatched('load_milestones_for_task', taskId);
         return await handleApiResponse(response);
     } catch (error) {
         console.error(`Failed to load milestones for task '${taskId}' from server:`, error);
@@ -149,21 +362,36 @@ export async function loadMilestonesForTaskFromServer(taskId) {
 export async function saveMilestoneToServer(milestone, taskId) {
     await pywebviewReady;
     try {
-        const response = await window.pywebview.api.save_milestone(_authToken, milestone, taskId);
-        return await handleApiResponse(response);
+        const response = await backend().save_milestone(_authToken, milestone, taskId);
+        const result = await handleApiResponse(response);
+        _localWriteCount++;
+        return result;
     } catch (error) {
         console.error('Failed to save milestone to server:', error);
         throw error;
     }
 }
 
+/**
+ * Sends only the changed fields of a milestone, see patchTaskToServer.
+ */
+export async function patchMilestoneToServer(taskId, milestoneId, changes, expectedUpdatedAt) {
+    await pywebviewReady;
+    try {
+        return await handlePatchResponse(await backend().patch_milestone(_authToken, taskId, milestoneId, changes, expectedUpdatedAt));
+    } catch (error) {
+        console.error('Failed to patch milestone on server:', error);
+        throw error;
+    }
+}
+
 /**
  * Loads a single milestone's full details from the server.
  */
 export async function loadMilestoneFromServer(taskId, milestoneId) {
     await pywebviewReady;
     try {
-        const response = await window.pywebview.api.load_milestone(_authToken, taskId, milestoneId);
+        const response = await callBatched('load_milestone', taskId, milestoneId);
         return await handleApiResponse(response);
     } catch (error) {
         console.error(`Failed to load milestone '${milestoneId}' from server:`, error);
@@ -177,21 +405,102 @@ export async function loadMilestoneFromServer(taskId, milestoneId) {
 export async function deleteMilestoneFromServer(milestoneId, taskId) {
     await pywebviewReady;
     try {
-        const response = await window.pywebview.api.delete_milestone(_authToken, milestoneId, taskId);
-        return await handleApiResponse(response);
+        const response = await backend().delete_milestone(_authToken, milestoneId, taskId);
+        const result = await handleApiResponse(response);
+        _localWriteCount++;
+        return result;
     } catch (error) {
         console.error('Failed to delete milestone from server:', error);
         throw error;
     }
 }
 
+/**
+ * Finds milestones across all tasks. filters: statuses, deadlineRF/RT, finishedRF/RT,
+ * updatedRF/RT, hasFinishDate, taskIds, sortBy ('deadline' | 'finishDate' | 'updatedAt').
+ * Pagination works like loadTasksSummaryFromServer ({ limit, cursor } -> { milestones, nextCursor }).
+ */
+export async function queryMilestonesFromServer(filters = {}, pagination = {}) {
+    await pywebviewReady;
+    try {
+        const response = await callBatched('query_milestones', filters, pagination);
+        return await handleApiResponse(response);
+    } catch (error) {
+        console.error('Failed to query milestones from server:', error);
+        throw error;
+    }
+}
+
+/**
+ * Saves several milestones of a task in one transaction (e.g. a reparenting).
+ * Fails as a whole if a parent link is invalid or would create a cycle.
+ */
+export async function saveMilestonesToServer(taskId, milestones) {
+    await pywebviewReady;
+    try {
+        const response = await backend().save_milestones(_authToken, taskId, milestones);
+        const result = await handleApiResponse(response);
+        _localWriteCount++;
+        return result;
+    } catch (error) {
+        console.error('Failed to save milestones to server:', error);
+        throw error;
+    }
+}
+
+/**
+ * Deletes several milestones of a task in one transaction.
+ * options.children: 'error' (default), 'reparent' or 'delete' for children of deleted milestones.
+ */
+export async function deleteMilestonesFromServer(taskId, milestoneIds, options = {}) {
+    await pywebviewReady;
+    try {
+        const response = await backend().delete_milestones(_authToken, taskId, milestoneIds, options);
+        const result = await handleApiResponse(response);
+        _localWriteCount++;
+        return result;
+    } catch (error) {
+        console.error('Failed to delete milestones from server:', error);
+        throw error;
+    }
+}
+
+/**
+ * Loads a task's milestones (or the subtree under rootId) in depth-first order,
+ * each with its graph layer as `depth` and its `childCount`.
+ */
+export async function getMilestoneTreeFromServer(taskId, rootId = null) {
+    await pywebviewReady;
+    try {
+        const response = await callBatched('get_milestone_tree', taskId, rootId);
+        return await handleApiResponse(response);
+    } catch (error) {
+        console.error(`Failed to load milestone tree for task '${taskId}' from server:`, error);
+        throw error;
+    }
+}
+
+/**
+ * Loads the ancestors of a milestone, nearest first.
+ */
+export async function getMilestoneAncestorsFromServer(taskId, milestoneId) {
+    await pywebviewReady;
+    try {
+        const response = await callBatched('get_milestone_ancestors', taskId, milestoneId);
+        return await handleApiResponse(response);
+    } catch (error) {
+        console.error(`Failed to load ancestors of milestone '${milestoneId}' from server:`, error);
+        throw error;
+    }
+}
+
 /**
  * Loads a distinct list of statuses from the server.
  */
 export async function getStatusesFromServer(onlyActive = false) {
     await pywebviewReady;
     try {
-        const response = await window.pywebview.api.get_distinct_statuses(_authToken, onlyActive);
+        const response = await callBatched('get_distinct_statuses', onlyActive);
         return await handleApiResponse(response);
     } catch (error) {
         console.error('Failed to load statuses from server:', error);
@@ -205,7 +514,7 @@ export async function getStatusesFromServer(onlyActive = false) {
 export async function getFromValuesFromServer(onlyActive = false) {
     await pywebviewReady;
     try {
-        const response = await window.pywebview.api.get_distinct_from_values(_authToken, onlyActive);
+        const response = await callBatched('get_distinct_from_values', onlyActive);
         return await handleApiResponse(response);
     } catch (error) {
         console.error('Failed to load from values from server:', error);
@@ -219,7 +528,7 @@ export async function getFromValuesFromServer(onlyActive = false) {
 export async function getCategoriesFromServer(onlyActive = false) {
     await pywebviewReady;
     try {
-        const response = await window.pywebview.api.get_distinct_categories(_authToken, onlyActive);
+        const response = await callBatched('get_distinct_categories', onlyActive);
         return await handleApiResponse(response);
     } catch (error) {
         console.error('Failed to load categories from server:', error);
@@ -233,7 +542,7 @@ export async function getCategoriesFromServer(onlyActive = false) {
 export async function getTaskCounts(since = null) {
     await pywebviewReady;
     try {
-        const response = await window.pywebview.api.get_task_counts(_authToken, since);
+        const response = await callBatched('get_task_counts', since);
         return await handleApiResponse(response);
     } catch (error) {
         console.error('Failed to get task counts from server:', error);
@@ -241,13 +550,29 @@ export async function getTaskCounts(since = null) {
     }
 }
 
+/**
+ * Fetches everything the statistics page shows in one call:
+ * { statusCounts, dueSoon, overdue, updatedByWeek, finishedByWeek, ... }.
+ * Counts are exact, task lists are capped. Pass refresh = true to bypass the server-side cache.
+ */
+export async function getDashboardFromServer(windowDays = 21, refresh = false) {
+    await pywebviewReady;
+    try {
+        const response = await callBatched('get_dashboard', windowDays, { refresh });
+        return await handleApiResponse(response);
+    } catch (error) {
+        console.error('Failed to get dashboard from server:', error);
+        throw error;
+    }
+}
+
 /**
  * delete status by its description
  */
 export async function deleteStatusFromServer(description) {
     await pywebviewReady;
     try {
-        const response = await window.pywebview.api.delete_status_values(_authToken, description);
+        const response = await backend().delete_status_values(_authToken, description);
         return await handleApiResponse(response);
     } catch (error) {
         console.error('Failed to delete status from server:', error);
@@ -261,10 +586,61 @@ export async function deleteStatusFromServer(description) {
 export async function deleteFromValueFromServer(description) {
     await pywebviewReady;
     try {
-        const response = await window.pywebview.api.delete_from_values(_authToken, description);
+        const response = await backend().delete_from_values(_authToken, description);
         return await handleApiResponse(response);
     } catch (error) {
         console.error('Failed to delete from value from server:', error);
         throw error;
     }
-}
\ No newline at end of file
+}
+
+/**
+ * Exports full tasks with their milestones.
+ * @param {object} selection - { ids: [...] } or { filters: {...} }.
+ * @param {object} options - { destination: 'file' } to stream into a file chosen in a save dialog,
+ *   otherwise { cursor, chunkSize } to fetch one chunk ({ tasks, nextCursor }) per call.
+ */
+export async function exportTasksFromServer(selection, options = {}) {
+    await pywebviewReady;
+    try {
+        const response = await backend().export_tasks(_authToken, selection, options);
+        return await handleApiResponse(response);
+    } catch (error) {
+        console.error('Failed to export tasks from server:', error);
+        throw error;
+    }
+}
+
+/**
+ * Imports tasks (with their milestones) in one transactional bulk call.
+ * @param {Array<object>} tasks - Tasks as found in an export file.
+ * @param {object} options - Optional { batchSize } to commit every N tasks instead of once.
+ * @returns {Promise<object>} { imported: { tasks, milestones }, errors: [...], seconds, tasksPerSecond }.
+ */
+export async function importTasksToServer(tasks, options = {}) {
+    await pywebviewReady;
+    try {
+        const response = await backend().import_tasks(_authToken, tasks, options);
+        const result = await handleApiResponse(response);
+        _localWriteCount++;
+        return result;
+    } catch (error) {
+        console.error('Failed to import tasks to server:', error);
+        throw error;
+    }
+}
+
+/**
+ * Fetches tasks/milestones changed or deleted since syncToken (null for everything).
+ * Returns { tasks, milestones, deleted: { tasks, milestones }, syncToken, hasMore, reset }.
+ */
+export async function getChangesFromServer(syncToken = null, options = {}) {
+    await pywebviewReady;
+    try {
+        const response = await callBatched('get_changes', syncToken, options);
+        return await handleApiResponse(response);
+    } catch (error) {
+        console.error('Failed to get changes from server:', error);
+        throw error;
+    }
+}
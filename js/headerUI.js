@@ -6,9 +6,11 @@ import { DB } from './storage.js';
 import { escapeHtml, showModalAlert, showModalAlertConfirm } from './utilUI.js';
 // Import the new functions for login, logout, and getting authenticated username
 import { login, logout, getAuthenticatedUsername, initAuth, saveTaskToServer, saveMilestoneToServer, loadTasksSummaryFromServer, loadTaskFromServer, loadMilestonesForTaskFromServer, 
-  getCategoriesFromServer, getStatusesFromServer, getFromValuesFromServer, deleteFromValueFromServer, deleteStatusFromServer
+  getCategoriesFromServer, getStatusesFromServer, getFromValuesFromServer, deleteFromValueFromServer, deleteStatusFromServer,
+  exportTasksFromServer, importTasksToServer
 } from './apiService.js';
 import { renderTaskList, getCurrentFilters } from './leftMenuTaskUI.js';
+import { clearLocalMirror } from './syncService.js';
 
 // Internal state, initialized by the main UI module
 let categories = [];
@@ -443,6 +445,7 @@ async function manageAuthentication(onUpdateUsernameCallback) {
         await DB.putMeta('categories', []);
         await DB.putMeta('statuses', []);
         await DB.putMeta('froms', []);
+        await clearLocalMirror();
 
         if (onUpdateUsernameCallback) onUpdateUsernameCallback(null); // Update global UI state
         
@@ -503,9 +506,10 @@ async function manageAuthentication(onUpdateUsernameCallback) {
 }
 
 async function updateListsFromServer() {
-    const serverCategories = await getCategoriesFromServer();
-    const serverStatuses = await getStatusesFromServer();
-    const serverFroms = await getFromValuesFromServer();
+    // Requested together so apiService sends them as one batch
+    const [serverCategories, serverStatuses, serverFroms] = await Promise.all([
+        getCategoriesFromServer(), getStatusesFromServer(), getFromValuesFromServer()
+    ]);
 
     categories = [...new Set([...categories, ...serverCategories])];
     statuses = [...new Set([...statuses, ...serverStatuses])];
@@ -598,39 +602,26 @@ async function exportJSON() {
         return;
       }
 
-      const tasksToExport = [];
-      for (const taskId of selectedTaskIds) {
+      const selection = { ids: selectedTaskIds };
+      try {
+        // The server streams tasks and milestones straight into the file picked in its save dialog
+        const result = await exportTasksFromServer(selection, { destination: 'file' });
+        if (result.cancelled) return; // Save dialog dismissed: keep the selection modal open
+        showModalAlert(`Exported ${result.count} tasks to ${result.path}`);
+      } catch (error) {
+        if (!/only available in the desktop app/.test(error.message)) {
+          showModalAlert(`Error exporting tasks: ${error.message}`);
+          return;
+        }
+        // No native save dialog: fetch the export in chunks and download it from the browser
         try {
-          // Fetch full task details and its milestones from the server
-          const fullTask = await loadTaskFromServer(taskId);
-          if (fullTask) {
-            const milestones = await loadMilestonesForTaskFromServer(taskId);
-            tasksToExport.push({ ...fullTask, milestones: milestones || [] });
-          } else {
-            console.warn(`Task '${taskId}' not found on server during export.`);
-          }
-        } catch (fetchError) {
-          console.error(`Failed to fetch task '${taskId}' or its milestones from server for export:`, fetchError);
-          showModalAlert(`Error fetching task '${taskId}' for export. Some data might be missing.`);
+          await downloadExportInChunks(selection);
+          showModalAlert('Selected tasks exported successfully!');
+        } catch (chunkError) {
+          showModalAlert(`Error exporting tasks: ${chunkError.message}`);
+          return;
         }
       }
-
-      const data = {
-          tasks: tasksToExport,
-          categories: categories, // Still export all categories/statuses/froms (from local state)
-          statuses: statuses,
-          froms: froms,
-      };
-      const blob = new Blob([JSON.stringify(data, null, 2)], {
-        type: 'application/json'
-      });
-      const url = URL.createObjectURL(blob);
-      const a = document.createElement('a');
-      a.href = url;
-      a.download = 'selected-tasks-export.json';
-      a.click();
-      URL.revokeObjectURL(url);
-      showModalAlert('Selected tasks exported successfully!');
       cleanupAndResolve(true); // Resolve with true indicating export was successful
     };
 
@@ -640,6 +631,34 @@ async function exportJSON() {
 }
 
 
+/**
+ * Fetches an export chunk by chunk and offers it as a download.
+ * @param {object} selection - { ids: [...] } or { filters: {...} }.
+ */
+async function downloadExportInChunks(selection) {
+  const parts = [];
+  let cursor = null;
+  do {
+    const chunk = await exportTasksFromServer(selection, { cursor });
+    chunk.tasks.forEach(task => parts.push(JSON.stringify(task)));
+    cursor = chunk.nextCursor;
+  } while (cursor);
+
+  const data = [
+    '{"tasks": [', parts.join(',\n'), '],',
+    '"categories": ', JSON.stringify(categories), ',', // Still export all categories/statuses/froms (from local state)
+    '"statuses": ', JSON.stringify(statuses), ',',
+    '"froms": ', JSON.stringify(froms), '}'
+  ];
+  const blob = new Blob(data, { type: 'application/json' });
+  const url = URL.createObjectURL(blob);
+  const a = document.createElement('a');
+  a.href = url;
+  a.download = 'selected-tasks-export.json';
+  a.click();
+  URL.revokeObjectURL(url);
+}
+
 /**
  * Imports tasks, categories, statuses, and froms from a JSON file.
  * Tasks and milestones will now be saved to the server.
@@ -680,26 +699,11 @@ async function importJSON(e) {
       await DB.putMeta('froms', froms); // Still saving to IndexedDB for now
     }
 
+    let importResult = null;
     if (j.tasks) {
-      for (const t of j.tasks) {
-        try {
-          // Temporarily extract milestones if they exist
-          const milestonesToImport = t.milestones || [];
-          // Remove milestones property from task before saving the task itself
-          delete t.milestones;
-
-          // Save task to server
-          await saveTaskToServer(t);
-
-          // Save associated milestones to server
-          for (const m of milestonesToImport) {
-            await saveMilestoneToServer(m, t.id);
-          }
-        } catch (saveError) {
-          console.error(`Failed to import task '${t.id}' or its milestones to server:`, saveError);
-          showModalAlert(`Error importing task '${t.id}': ${saveError.message}. Some data might not be saved.`);
-        }
-      }
+      // One bulk call: the server validates everything and writes tasks and milestones in one transaction
+      importResult = await importTasksToServer(j.tasks);
+      importResult.errors.forEach(err => console.error('Import error:', err));
     }
 
     // Call callbacks provided by the main UI module
@@ -708,7 +712,11 @@ async function importJSON(e) {
       document.querySelector(selectors.settingsDropdown).classList.remove('show');
     }
 
-    showModalAlert('Import successful! Tasks and milestones are now saved on the server.');
+    if (importResult && importResult.errors.length > 0) {
+      showModalAlert(`${importResult.message} ${importResult.errors.length} record(s) could not be imported; see the console for details.`);
+    } else {
+      showModalAlert('Import successful! Tasks and milestones are now saved on the server.');
+    }
   } catch (e) {
     console.error(e);
     showModalAlert('Error importing file. Please ensure it is a valid task export JSON.');
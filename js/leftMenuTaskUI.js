@@ -3,7 +3,8 @@
 // search, filtering (category, status, date ranges), sorting, and grouping.
 
 import { escapeHtml } from './utilUI.js';
-import { loadTaskFromServer, loadTasksSummaryFromServer } from './apiService.js';
+import { loadTasksSummaryFromServer, getTaskFacetsFromServer } from './apiService.js';
+import { getTask } from './syncService.js';
 import { DB } from './storage.js'; // Keep DB for persisting filter metadata
 
 // Internal state, initialized by the main UI module
@@ -21,10 +22,16 @@ let currentUsername = null;
 
 // Pagination state
 let loadedTasks = []; // Holds all currently displayed tasks
-let currentOffset = 0;
+let nextCursor = null; // Opaque keyset cursor for the next page, returned by the server
 let isFetching = false; // Prevents multiple simultaneous fetches
+let taskListRequestSeq = 0; // Identifies the newest renderTaskList fetch
 let allTasksLoaded = false; // Flag to indicate if all tasks have been fetched
 
+// Grouped list: group sizes come from get_task_facets, a group's tasks are fetched once it is expanded
+let facetCounts = null; // { statuses, froms, categories } task counts under the current filters
+let expandedGroups = new Set(); // JSON-encoded keys of the groups the user opened
+let expandedGroupBy = null; // groupBy value expandedGroups belongs to
+
 const selectors = {
   newTaskBtn: '#newTaskBtn',
   searchInput: '#searchInput',
@@ -56,6 +63,7 @@ const selectors = {
   deadlineRangeTo: '#deadlineRangeTo',
   finishedRangeFrom: '#finishedRangeFrom',
   finishedRangeTo: '#finishedRangeTo',
+  includeArchived: '#includeArchived',
   toggleFilterBtn: '#toggleFilterBtn',
   filterSection: '#filterSection',
   filterColumn: '#filterColumn',
@@ -125,6 +133,7 @@ export async function initLeftMenuTaskUI(initialState, onOpenEditor, onOpenViewe
   document.querySelector(selectors.deadlineRangeTo)?.addEventListener('change', () => renderTaskList(true));
   document.querySelector(selectors.finishedRangeFrom)?.addEventListener('change', () => renderTaskList(true));
   document.querySelector(selectors.finishedRangeTo)?.addEventListener('change', () => renderTaskList(true));
+  document.querySelector(selectors.includeArchived)?.addEventListener('change', () => renderTaskList(true));
   document.querySelector(selectors.searchInput)?.addEventListener('input', () => renderTaskList(true));
   document.querySelector(selectors.sortBy)?.addEventListener('change', () => renderTaskList(true));
   document.querySelector(selectors.groupBy)?.addEventListener('change', () => renderTaskList(true));
@@ -221,34 +230,53 @@ export function updateLeftMenuTaskUIState(updatedState) {
  * @param {boolean} isNewFilter - True if filters changed, requiring a full refresh. False for pagination.
  */
 export async function renderTaskList(isNewFilter = true) {
-  if (isFetching) return;
+  // A new filter supersedes a fetch in flight; only "load more" waits for it
+  if (isFetching && !isNewFilter) return;
+  if (!isNewFilter && allTasksLoaded) return; // A null cursor would restart from the first page
   isFetching = true;
+  const requestSeq = ++taskListRequestSeq;
 
   if (isNewFilter) {
-    currentOffset = 0;
+    nextCursor = null;
     allTasksLoaded = false;
     loadedTasks = []; // Clear task list on new filter application
   }
 
   const filters = getCurrentFilters();
+  const groupVal = filters.groupBy;
+
+  if (groupVal !== '__none') {
+    await renderGroupedTaskList(filters, requestSeq);
+    if (requestSeq === taskListRequestSeq) isFetching = false;
+    return;
+  }
+
+  if (isNewFilter) {
+    // Counts for the filter dropdowns, fetched alongside the first page
+    getTaskFacetsFromServer(filters, 'task-facets')
+      .then(facets => { if (facets && requestSeq === taskListRequestSeq) updateFacetCounts(facets); })
+      .catch(() => {});
+  }
 
   const limit = parseInt(document.querySelector(selectors.tasksPerPage)?.value, 10) || 10;
   let newTasks = [];
   try {
-    newTasks = await loadTasksSummaryFromServer(filters, { limit, offset: currentOffset });
+    const page = await loadTasksSummaryFromServer(filters, { limit, cursor: nextCursor }, 'task-list');
+    if (!page || requestSeq !== taskListRequestSeq) return; // Superseded, the newer fetch renders
+    newTasks = page.tasks;
+    nextCursor = page.nextCursor;
   } catch (error) {
+    if (requestSeq !== taskListRequestSeq) return;
     console.error("Error fetching tasks from server:", error);
-    const container = document.querySelector(selectors.taskList);
-    if(container) container.innerHTML = '<div class="error-message">Failed to load tasks. Please try again or log in.</div>';
+    showTaskListError();
     isFetching = false;
     return;
   }
   
-  if (newTasks.length < limit) {
+  if (!nextCursor) {
     allTasksLoaded = true;
   }
   
-  currentOffset += newTasks.length;
   loadedTasks.push(...newTasks);
   
   const container = document.querySelector(selectors.taskList);
@@ -257,76 +285,135 @@ export async function renderTaskList(isNewFilter = true) {
       return;
   }
   container.innerHTML = ''; // Always clear before re-rendering the combined list
+  renderTaskItems(container, loadedTasks);
+  isFetching = false;
+}
 
-  const groupVal = document.querySelector(selectors.groupBy)?.value || '__none';
+function showTaskListError() {
+  const container = document.querySelector(selectors.taskList);
+  if(container) container.innerHTML = '<div class="error-message">Failed to load tasks. Please try again or log in.</div>';
+}
 
-  if (groupVal === '__none') {
-      renderTaskItems(container, loadedTasks);
-  } else {
-      const groupedTasks = {};
-      
-      loadedTasks.forEach(task => {
-          if (groupVal === 'category' && task.categories && task.categories.length > 0) {
-              task.categories.forEach(category => {
-                  const groupKey = category || 'No Category';
-                  if (!groupedTasks[groupKey]) {
-                      groupedTasks[groupKey] = [];
-                  }
-                  if (!groupedTasks[groupKey].some(t => t.id === task.id)) {
-                      groupedTasks[groupKey].push(task);
-                  }
-              });
-          } else {
-              let groupKey;
-              switch (groupVal) {
-                  case 'from': groupKey = task.from || 'No From'; break;
-                  case 'status': groupKey = task.status || 'No Status'; break;
-                  case 'priority': groupKey = task.priority ? `Priority ${task.priority}` : "No Priority"; break;
-                  case 'deadlineYear': groupKey = task.deadline ? new Date(task.deadline).getFullYear().toString() : 'No Deadline'; break;
-                  case 'deadlineMonthYear': groupKey = task.deadline ? new Date(task.deadline).toLocaleDateString('en-US', { year: 'numeric', month: 'long' }) : 'No Deadline'; break;
-                  case 'finishDateYear': groupKey = task.finishDate ? new Date(task.finishDate).getFullYear().toString() : 'No Finish Date'; break;
-                  case 'finishDateMonthYear': groupKey = task.finishDate ? new Date(task.finishDate).toLocaleDateString('en-US', { year: 'numeric', month: 'long' }) : 'No Finish Date'; break;
-                  case 'createdAtYear': groupKey = task.createdAt ? new Date(task.createdAt).getFullYear().toString() : 'No Creation Date'; break;
-                  case 'createdAtMonthYear': groupKey = task.createdAt ? new Date(task.createdAt).toLocaleDateString('en-US', { year: 'numeric', month: 'long' }) : 'No Creation Date'; break;
-                  default: groupKey = 'No Group';
-              }
-              if (!groupedTasks[groupKey]) groupedTasks[groupKey] = [];
-              groupedTasks[groupKey].push(task);
-          }
-      });
+/**
+ * Renders one collapsible header per group with its task count, all from a single get_task_facets call.
+ * A group's tasks are only fetched when it is expanded, one page at a time.
+ * @param {object} filters - The current filters (groupBy included).
+ * @param {number} requestSeq - The renderTaskList call this belongs to.
+ */
+async function renderGroupedTaskList(filters, requestSeq) {
+  let facets;
+  try {
+    facets = await getTaskFacetsFromServer(filters, 'task-list');
+    if (!facets || requestSeq !== taskListRequestSeq) return; // Superseded, the newer fetch renders
+  } catch (error) {
+    if (requestSeq !== taskListRequestSeq) return;
+    console.error("Error fetching task groups from server:", error);
+    showTaskListError();
+    return;
+  }
+  updateFacetCounts(facets);
+  allTasksLoaded = true; // Groups page on their own, the list-wide "Show Next" has nothing to add
+
+  if (expandedGroupBy !== filters.groupBy) {
+    expandedGroups = new Set();
+    expandedGroupBy = filters.groupBy;
+  }
 
-      const sortedGroupKeys = Object.keys(groupedTasks).sort((a, b) => {
-          if (groupVal.includes('MonthYear')) {
-              const dateA = new Date(a); const dateB = new Date(b);
-              if (!isNaN(dateA.getTime()) && !isNaN(dateB.getTime())) return dateA.getTime() - dateB.getTime();
-          } else if (groupVal.includes('Year')) {
-              const yearA = parseInt(a.replace(/\D/g, ''), 10); const yearB = parseInt(b.replace(/\D/g, ''), 10);
-              if (!isNaN(yearA) && !isNaN(yearB)) return yearA - yearB;
-          } else if (groupVal === 'priority') {
-              const pA = parseInt(a.replace('Priority ', ''), 10); const pB = parseInt(b.replace('Priority ', ''), 10);
-              if (!isNaN(pA) && !isNaN(pB)) return pA - pB;
+  const container = document.querySelector(selectors.taskList);
+  if (!container) return;
+  container.innerHTML = '';
+
+  facets.groups.forEach(group => {
+      const groupId = JSON.stringify(group.key);
+      const groupHeaderDiv = document.createElement('div');
+      groupHeaderDiv.className = 'group-header';
+      groupHeaderDiv.innerHTML = `<h4>${escapeHtml(formatGroupLabel(filters.groupBy, group.key))} <span class="group-count">${group.count}</span></h4><button class="toggle-group-btn">&#9658;</button>`;
+      const groupContentDiv = document.createElement('div');
+      groupContentDiv.className = 'group-content';
+      container.appendChild(groupHeaderDiv);
+      container.appendChild(groupContentDiv);
+
+      const btn = groupHeaderDiv.querySelector('.toggle-group-btn');
+      const setExpanded = (expanded) => {
+          groupContentDiv.classList.toggle('show', expanded);
+          btn.innerHTML = expanded ? '&#9660;' : '&#9658;';
+          if (expanded) expandedGroups.add(groupId);
+          else expandedGroups.delete(groupId);
+          if (expanded && !groupContentDiv.dataset.loaded) {
+              groupContentDiv.dataset.loaded = 'true';
+              loadGroupPage(groupContentDiv, filters, group.key, null);
           }
-          if (a.startsWith('No ')) return 1; if (b.startsWith('No ')) return -1;
-          return a.localeCompare(b);
-      });
+      };
+      groupHeaderDiv.addEventListener('click', () => setExpanded(!groupContentDiv.classList.contains('show')));
+      if (expandedGroups.has(groupId)) setExpanded(true);
+  });
+}
 
-      sortedGroupKeys.forEach(groupKey => {
-          const groupHeaderDiv = document.createElement('div');
-          groupHeaderDiv.className = 'group-header';
-          groupHeaderDiv.innerHTML = `<h4>${escapeHtml(groupKey)}</h4><button class="toggle-group-btn" data-group-key="${escapeHtml(groupKey)}">&#9660;</button>`;
-          const groupContentDiv = document.createElement('div');
-          groupContentDiv.className = 'group-content show';
-          container.appendChild(groupHeaderDiv);
-          container.appendChild(groupContentDiv);
-          groupHeaderDiv.querySelector('.toggle-group-btn')?.addEventListener('click', (e) => {
-              const btn = e.target; const content = btn.parentElement.nextElementSibling;
-              content?.classList.toggle('show');
-              if (content) btn.innerHTML = content.classList.contains('show') ? '&#9660;' : '&#9658;';
-          });
-          renderTaskItems(groupContentDiv, groupedTasks[groupKey]);
+/**
+ * Appends the next page of a group's tasks, with a "Show more" button while there are more.
+ */
+async function loadGroupPage(groupContentDiv, filters, groupKey, cursor) {
+  const limit = parseInt(document.querySelector(selectors.tasksPerPage)?.value, 10) || 10;
+  try {
+    const page = await loadTasksSummaryFromServer({ ...filters, groupKey }, { limit, cursor });
+    groupContentDiv.querySelector('.group-more-btn')?.remove();
+    renderTaskItems(groupContentDiv, page.tasks);
+    if (page.nextCursor) {
+      const moreBtn = document.createElement('button');
+      moreBtn.className = 'show-next-btn group-more-btn';
+      moreBtn.textContent = 'Show more';
+      moreBtn.addEventListener('click', (e) => {
+        e.stopPropagation();
+        moreBtn.disabled = true;
+        loadGroupPage(groupContentDiv, filters, groupKey, page.nextCursor);
       });
+      groupContentDiv.appendChild(moreBtn);
+    }
+  } catch (error) {
+    console.error("Error fetching group tasks from server:", error);
+    delete groupContentDiv.dataset.loaded; // Retried on the next expand
   }
-  isFetching = false;
+}
+
+/**
+ * Turns a group key from the server ('YYYY', 'YYYY-MM', a priority, a name or null) into a header.
+ */
+function formatGroupLabel(groupVal, key) {
+  if (key === null || key === undefined || key === '') {
+    if (groupVal.startsWith('deadline')) return 'No Deadline';
+    if (groupVal.startsWith('finishDate')) return 'No Finish Date';
+    if (groupVal.startsWith('createdAt')) return 'No Creation Date';
+    return { from: 'No From', status: 'No Status', priority: 'No Priority', category: 'No Category' }[groupVal] || 'No Group';
+  }
+  if (groupVal === 'priority') return `Priority ${key}`;
+  if (groupVal.endsWith('MonthYear')) {
+    const [year, month] = String(key).split('-').map(Number);
+    return new Date(year, month - 1, 1).toLocaleDateString('en-US', { year: 'numeric', month: 'long' });
+  }
+  return String(key);
+}
+
+/**
+ * Stores the per-value task counts from get_task_facets and shows them in the filter dropdowns.
+ */
+function updateFacetCounts(facets) {
+  facetCounts = { statuses: facets.statuses, froms: facets.froms, categories: facets.categories };
+  renderFilterCategoriesMultiSelect();
+  renderFilterStatusMultiSelect();
+  renderFilterFromsMultiSelect();
+}
+
+/**
+ * Adds the facet count of a filter value to its dropdown item; values without tasks are dimmed.
+ */
+function appendFacetCount(item, facet, value) {
+  if (!facetCounts) return;
+  const count = facetCounts[facet]?.[value] || 0;
+  const countSpan = document.createElement('span');
+  countSpan.className = 'facet-count';
+  countSpan.textContent = ` (${count})`;
+  item.appendChild(countSpan);
+  item.classList.toggle('no-results', count === 0);
 }
 
 /**
@@ -345,6 +432,9 @@ function renderTaskItems(container, tasksToRender) {
 
     el.querySelector('.title').textContent = t.title || '(no title)';
     el.querySelector('.meta').textContent = `${escapeHtml(t.from || '—')} • ${escapeHtml(t.categories?.join(', ') || 'No Category')} • ${escapeHtml(t.status)}`;
+
+    const snippetEl = el.querySelector('.snippet');
+    if (snippetEl) snippetEl.innerHTML = formatSearchSnippet(t.snippet);
     
     const deadlineText = t.deadline ? `Due: ${new Date(t.deadline).toLocaleDateString()}` : '';
     const finishDateText = t.finishDate ? `Finished: ${new Date(t.finishDate).toLocaleDateString()}` : '';
@@ -367,7 +457,7 @@ function renderTaskItems(container, tasksToRender) {
       el.classList.add('selected-task-item');
       currentSelectedTaskId = t.id;
       
-      let fullTask = await loadTaskFromServer(t.id) || t;
+      let fullTask = await getTask(t.id) || t;
       if (openTaskViewerFn) openTaskViewerFn(fullTask, false);
 
       const appContainer = document.querySelector(selectors.appContainer);
@@ -380,6 +470,19 @@ function renderTaskItems(container, tasksToRender) {
   });
 }
 
+/**
+ * Converts a search snippet from the server into safe HTML.
+ * Matched words arrive wrapped in \u0002...\u0003 markers; the surrounding text may contain
+ * (possibly cut-off) editor HTML, which is stripped before escaping.
+ * @param {string} snippet - The raw snippet, or undefined when not searching.
+ * @returns {string} HTML with matches wrapped in <mark>.
+ */
+function formatSearchSnippet(snippet) {
+  if (!snippet) return '';
+  const text = snippet.replace(/<[^>]*>?/g, ' ').replace(/^[^<]*?>/, ' ').replace(/\s+/g, ' ').trim();
+  return escapeHtml(text).replace(/\u0002/g, '<mark>').replace(/\u0003/g, '</mark>');
+}
+
 /**
  * Renders the multi-select category filter UI.
  */
@@ -415,6 +518,7 @@ export async function renderFilterCategoriesMultiSelect() {
     const item = document.createElement('div');
     item.className = 'dropdown-item';
     item.textContent = escapeHtml(cat);
+    appendFacetCount(item, 'categories', cat);
     if (selectedFilterCategories.includes(cat)) item.classList.add('selected');
     item.addEventListener('click', async (e) => {
       e.stopPropagation();
@@ -466,6 +570,7 @@ export async function renderFilterStatusMultiSelect() {
     const item = document.createElement('div');
     item.className = 'dropdown-item';
     item.textContent = escapeHtml(status);
+    appendFacetCount(item, 'statuses', status);
     if (selectedFilterStatuses.includes(status)) item.classList.add('selected');
 
     item.addEventListener('click', async (e) => {
@@ -518,6 +623,7 @@ export async function renderFilterFromsMultiSelect() {
     const item = document.createElement('div');
     item.className = 'dropdown-item';
     item.textContent = escapeHtml(from);
+    appendFacetCount(item, 'froms', from);
     if (selectedFilterFroms.includes(from)) item.classList.add('selected');
 
     item.addEventListener('click', async (e) => {
@@ -571,6 +677,8 @@ export function getCurrentFilters() {
     deadlineRT: document.querySelector(selectors.deadlineRangeTo)?.value,
     finishedRF: document.querySelector(selectors.finishedRangeFrom)?.value,
     finishedRT: document.querySelector(selectors.finishedRangeTo)?.value,
+    // Tasks finished long ago live in the archive; finished-date ranges reach it on their own
+    includeArchived: document.querySelector(selectors.includeArchived)?.checked || false,
     groupBy: document.querySelector(selectors.groupBy)?.value || '__none',
   };
   return filters;
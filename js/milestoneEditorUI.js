@@ -6,11 +6,14 @@
 import { Editor } from './editor.js'; // Assuming Editor is a separate module
 import { escapeHtml, showModalAlert, showModalAlertConfirm } from './utilUI.js';
 // Import from centralized API service
-import { saveMilestoneToServer, deleteMilestoneFromServer, loadMilestoneFromServer, loadTaskFromServer, loadMilestonesForTaskFromServer } from './apiService.js'; 
+import { saveMilestoneToServer, patchMilestoneToServer, deleteMilestoneFromServer, getMilestoneTreeFromServer, ConflictError } from './apiService.js'; 
+import { getTask, getMilestone, getMilestonesForTask } from './syncService.js';
 
 // Internal state for global options and callbacks
 let statuses = [];
 let currentMilestone = null; // Stores the milestone currently being edited
+let isNewMilestone = false; // New milestones are saved whole, existing ones are patched
+let editorBaseline = null; // Form values as the editor opened, so saving sends only what changed
 let currentTaskId = null; // Stores the ID of the task this milestone belongs to
 let currentUsername = null; // Added current username
 let taskCreator = null; // Stores the creator of the parent task
@@ -108,14 +111,15 @@ function updateButtonStates(editorArea) {
  * @param {object} milestoneData - The milestone object (might be partial or new).
  * @param {string} taskId - The ID of the parent task.
  * @param {boolean} isNew - True if this is a new milestone being created.
+ * @param {boolean} isFull - True if milestoneData is already the full server copy (e.g. from a conflict), so it is shown as is.
  */
-export async function openMilestoneEditor(milestoneData, taskId, isNew = false) {
+export async function openMilestoneEditor(milestoneData, taskId, isNew = false, isFull = false) {
   currentTaskId = taskId; // Store the task ID
 
   // Fetch the parent task from the server to get its creator
   let parentTask = null;
   try {
-      parentTask = await loadTaskFromServer(taskId); // Use centralized API service
+      parentTask = await getTask(taskId); // Use centralized API service
   } catch (error) {
       console.error("Error fetching parent task for milestone editor:", error);
       showModalAlert(`Cannot open milestone editor: Error loading parent task (${error.message}).`);
@@ -131,10 +135,10 @@ export async function openMilestoneEditor(milestoneData, taskId, isNew = false)
   taskCreator = parentTask.creator; // Store the creator of the parent task
 
   // Fetch the full milestone data from the server to ensure notes are present
-  let fullMilestone = null;
-  if (!isNew && milestoneData.id) { // Only attempt to load from server if it's an existing milestone
+  let fullMilestone = isFull ? milestoneData : null;
+  if (!isNew && !isFull && milestoneData.id) { // Only attempt to load from server if it's an existing milestone
       try {
-          fullMilestone = await loadMilestoneFromServer(taskId, milestoneData.id);
+          fullMilestone = await getMilestone(taskId, milestoneData.id);
       } catch (error) {
           console.error("Error fetching full milestone details:", error);
           showModalAlert('Failed to load full milestone details from server. Notes may not be available.');
@@ -147,6 +151,7 @@ export async function openMilestoneEditor(milestoneData, taskId, isNew = false)
       fullMilestone = { ...milestoneData, notes: milestoneData.notes || '' }; // Ensure notes are at least an empty string
   }
   currentMilestone = fullMilestone; // Set the currently selected milestone to the full version
+  isNewMilestone = isNew;
 
   if (updateCurrentMilestoneCallback) updateCurrentMilestoneCallback(currentMilestone); // Inform graph UI
 
@@ -179,8 +184,15 @@ export async function openMilestoneEditor(milestoneData, taskId, isNew = false)
 
   // Populate parent milestone dropdown
   let allMilestones = [];
+  let ownSubtreeIds = new Set([currentMilestone.id]);
   try {
-      allMilestones = await loadMilestonesForTaskFromServer(taskId); // Fetch all milestones for this task from the server
+      // The milestone and its descendants cannot become its parent (that would be a cycle)
+      const [milestones, subtree] = await Promise.all([
+          getMilestonesForTask(taskId), // All milestones of this task, from the local mirror
+          !isNew && currentMilestone.id ? getMilestoneTreeFromServer(taskId, currentMilestone.id) : []
+      ]);
+      allMilestones = milestones;
+      ownSubtreeIds = new Set([currentMilestone.id, ...subtree.map(m => m.id)]);
   } catch (error) {
       console.error("Error fetching all milestones for parent dropdown:", error);
       showModalAlert('Failed to load all milestones for parent selection. Parent dropdown might be incomplete.');
@@ -189,7 +201,7 @@ export async function openMilestoneEditor(milestoneData, taskId, isNew = false)
   const parentSelect = milestoneEditorArea.querySelector(selectors.milestoneParentSelect);
   parentSelect.innerHTML = '<option value="">-- No Parent Milestone --</option>' + 
                            allMilestones
-                             .filter(m => m.id !== currentMilestone.id) // Cannot be its own parent
+                             .filter(m => !ownSubtreeIds.has(m.id)) // Cannot be its own parent or ancestor
                              .map(m => `<option value="${escapeHtml(m.id)}" ${m.id === currentMilestone.parentId ? 'selected' : ''}>${escapeHtml(m.title)}</option>`)
                              .join('');
 
@@ -198,6 +210,7 @@ export async function openMilestoneEditor(milestoneData, taskId, isNew = false)
   notesEditorInstance = Editor.init(milestoneEditorArea.querySelector(selectors.milestoneNotesEditor));
   // Set the notes content from the fullMilestone object
   milestoneEditorArea.querySelector(selectors.milestoneNotesEditor + ' .text-area').innerHTML = currentMilestone.notes || ''; // Ensure it's not undefined
+  editorBaseline = readMilestoneForm(milestoneEditorArea);
 
   // Add event listeners
   milestoneEditorArea.querySelector(selectors.saveMilestoneBtn)?.addEventListener('click', saveMilestone);
@@ -234,7 +247,44 @@ function renderStatusSelectOptions(container, optionsArray, selectedValue) {
 
 
 /**
- * Saves the current milestone to the server.
+ * Reads the editable fields from the form.
+ * @param {HTMLElement} milestoneEditorArea - The milestone editor container.
+ */
+function readMilestoneForm(milestoneEditorArea) {
+  return {
+    title: milestoneEditorArea.querySelector(selectors.milestoneTitleInput)?.value || '',
+    deadline: milestoneEditorArea.querySelector(selectors.milestoneDeadlineInput)?.value || null,
+    finishDate: milestoneEditorArea.querySelector(selectors.milestoneFinishDateInput)?.value || null,
+    status: milestoneEditorArea.querySelector(selectors.milestoneStatusSelect)?.value || '',
+    parentId: milestoneEditorArea.querySelector(selectors.milestoneParentSelect)?.value || null, // Capture parentId
+    notes: (notesEditorInstance) ? notesEditorInstance.getHTML() : '',
+  };
+}
+
+/**
+ * Patches the changed fields; if the milestone was saved elsewhere meanwhile, asks before
+ * writing the changes on top of the newer version. Resolves to null if the user declines.
+ */
+async function patchMilestone(changes) {
+  try {
+    return await patchMilestoneToServer(currentTaskId, currentMilestone.id, changes, currentMilestone.updatedAt);
+  } catch (error) {
+    if (!(error instanceof ConflictError)) throw error;
+    const overwrite = await showModalAlertConfirm(
+      'This milestone was changed elsewhere since you opened it. Save your changes on top of the newer version?'
+    );
+    if (!overwrite) {
+      currentMilestone = error.current;
+      return null;
+    }
+    currentMilestone = { ...error.current, ...changes };
+    return patchMilestoneToServer(currentTaskId, currentMilestone.id, changes, error.current.updatedAt);
+  }
+}
+
+/**
+ * Saves the current milestone to the server. New milestones are saved whole, existing ones
+ * send only the fields that changed since the editor was opened.
  */
 async function saveMilestone() {
   if (!currentMilestone || !currentTaskId) return;
@@ -248,17 +298,33 @@ async function saveMilestone() {
   const milestoneEditorArea = document.querySelector(selectors.milestoneEditorArea);
   if (!milestoneEditorArea) return;
 
-  currentMilestone.title = milestoneEditorArea.querySelector(selectors.milestoneTitleInput)?.value || '';
-  currentMilestone.deadline = milestoneEditorArea.querySelector(selectors.milestoneDeadlineInput)?.value || null;
-  currentMilestone.finishDate = milestoneEditorArea.querySelector(selectors.milestoneFinishDateInput)?.value || null;
-  currentMilestone.status = milestoneEditorArea.querySelector(selectors.milestoneStatusSelect)?.value || '';
-  currentMilestone.parentId = milestoneEditorArea.querySelector(selectors.milestoneParentSelect)?.value || null; // Capture parentId
-  currentMilestone.notes = (notesEditorInstance) ? notesEditorInstance.getHTML() : '';
-  currentMilestone.updatedAt = new Date().toISOString();
+  const formValues = readMilestoneForm(milestoneEditorArea);
+  const changes = Object.fromEntries(
+    Object.entries(formValues).filter(([field, value]) => !editorBaseline || value !== editorBaseline[field])
+  );
+  Object.assign(currentMilestone, formValues);
+  let declined = false;
 
   try {
-    await saveMilestoneToServer(currentMilestone, currentTaskId); // Use centralized API service to save full milestone including notes
-    showModalAlert('Milestone saved!');
+    if (isNewMilestone) {
+      currentMilestone.updatedAt = new Date().toISOString();
+      await saveMilestoneToServer(currentMilestone, currentTaskId); // Use centralized API service to save full milestone including notes
+      isNewMilestone = false;
+      editorBaseline = formValues;
+      showModalAlert('Milestone saved!');
+    } else if (Object.keys(changes).length === 0) {
+      showModalAlert('No changes to save.');
+    } else {
+      const result = await patchMilestone(changes);
+      if (result) {
+        currentMilestone.updatedAt = result.updatedAt;
+        editorBaseline = formValues;
+        showModalAlert('Milestone saved!');
+      } else {
+        declined = true;
+        showModalAlert('Your changes were discarded; showing the newer version.');
+      }
+    }
   } catch (error) {
     showModalAlert(`Error saving milestone: ${error.message}`);
   }
@@ -271,8 +337,9 @@ async function saveMilestone() {
         renderMilestoneBubblesCallback(currentTaskId, milestonesGraphContainer);
     }
   }
-  // Re-open editor to ensure dropdowns are re-rendered and notes are re-fetched from server
-  openMilestoneEditor(currentMilestone, currentTaskId);
+  // Re-open editor to ensure dropdowns are re-rendered and notes are re-fetched from server;
+  // after a declined overwrite the form shows the server copy from the conflict instead
+  openMilestoneEditor(currentMilestone, currentTaskId, false, declined);
 }
 
 /**
@@ -289,24 +356,7 @@ async function deleteMilestone() {
       return;
   }
 
-  // Before deleting, check if this milestone is a parent to any other milestones
-  // Fetch from server for the most up-to-date data
-  let allMilestones = [];
-  try {
-      allMilestones = await loadMilestonesForTaskFromServer(currentTaskId);
-  } catch (error) {
-      console.error("Error fetching milestones for parent check:", error);
-      showModalAlert('Failed to check milestone dependencies due to a server error. Cannot delete.');
-      return;
-  }
-
-  const childrenMilestones = allMilestones.filter(m => m.parentId === currentMilestone.id);
-
-  if (childrenMilestones.length > 0) {
-      showModalAlert(`Cannot delete milestone "${escapeHtml(currentMilestone.title)}" because it is a parent to other milestones. Please remove its children's parent link first.`);
-      return;
-  }
-
+  // The server refuses to delete a milestone that still has children; that error is shown below.
   const confirmed = await showModalAlertConfirm(`Are you sure you want to delete milestone "${escapeHtml(currentMilestone.title)}"?`);
 
   if (confirmed) {
@@ -4,7 +4,7 @@
 
 // import { DB } from './storage.js'; // DB is no longer needed for milestone fetching
 import { escapeHtml } from './utilUI.js';
-import { loadMilestonesForTaskFromServer } from './apiService.js'; // Import the API service function
+import { getMilestoneTreeFromServer } from './apiService.js'; // Milestones with their layer, computed by the server
 
 // Internal state
 let currentMilestone = null; // Holds the currently selected milestone
@@ -133,6 +133,7 @@ function createEmptyMilestone(taskId) {
  * Renders the milestone bubbles and SVG lines representing dependencies.
  * Implements a layered graph layout to ensure children are below parents
  * and minimize line crossings by dynamically calculating positions.
+ * Layers (depth) and the depth-first order come from the server's milestone tree query.
  * @param {string} taskId - The ID of the task whose milestones are being rendered.
  * @param {HTMLElement} containerEl - The container element for the graph.
  */
@@ -141,7 +142,7 @@ export async function renderMilestoneBubbles(taskId, containerEl) {
   
   let milestones = [];
   try {
-    milestones = await loadMilestonesForTaskFromServer(taskId); // Fetch milestones from server
+    milestones = await getMilestoneTreeFromServer(taskId); // Depth-first order, each with its depth
   } catch (error) {
     console.error("Error fetching milestones from server:", error);
     containerEl.innerHTML = '<div class="error-message">Failed to load milestones. Please try again.</div>';
@@ -166,56 +167,25 @@ export async function renderMilestoneBubbles(taskId, containerEl) {
     childrenMap.set(m.id, []); // Initialize children array for all milestones
   });
 
-  // Build childrenMap, parentMap, and identify root milestones
+  // Build childrenMap and parentMap; the server already ordered siblings depth-first
   milestones.forEach(m => {
-    // If parentId is set and the parent exists in the current milestone set
-    if (m.parentId && milestoneMap.has(m.parentId)) {
+    if (m.depth === 0) {
+      rootMilestones.push(m);
+    } else {
       childrenMap.get(m.parentId).push(m);
       parentMap.set(m.id, milestoneMap.get(m.parentId));
-    } else {
-      rootMilestones.push(m);
     }
   });
 
-  // --- Level Assignment (Vertical Positioning) using BFS ---
-  // Assigns each milestone to a 'level' based on its distance from a root.
-  // This determines the Y-coordinate.
-  const levelMap = new Map();     // milestoneId -> level_number
+  // --- Level Assignment (Vertical Positioning) ---
+  // A milestone's level is its depth in the tree, which determines the Y-coordinate.
   const levels = new Map();       // level_number -> [milestone_ids (ordered)]
-  const queue = [];
-
-  // Sort root milestones for consistent initial horizontal ordering
-  rootMilestones.sort((a, b) => new Date(a.createdAt).getTime() - new Date(b.createdAt).getTime());
-
-  // Initialize queue with roots and assign them level 0
-  rootMilestones.forEach(m => {
-    levelMap.set(m.id, 0);
-    queue.push(m.id);
-    if (!levels.has(0)) levels.set(0, []);
-    levels.get(0).push(m.id);
-  });
-
-  let head = 0;
   let maxLevel = 0;
-  while (head < queue.length) {
-    const currentId = queue[head++];
-    const currentLevel = levelMap.get(currentId);
-    maxLevel = Math.max(maxLevel, currentLevel);
-
-    const children = childrenMap.get(currentId) || [];
-    // Sort children for consistent horizontal ordering within a parent's group
-    children.sort((a, b) => new Date(a.createdAt).getTime() - new Date(b.createdAt).getTime());
-
-    children.forEach(child => {
-      // Only process if child hasn't been assigned a level yet (prevents infinite loops for cycles)
-      if (!levelMap.has(child.id)) {
-        levelMap.set(child.id, currentLevel + 1);
-        queue.push(child.id);
-        if (!levels.has(currentLevel + 1)) levels.set(currentLevel + 1, []);
-        levels.get(currentLevel + 1).push(child.id);
-      }
-    });
-  }
+  milestones.forEach(m => {
+    if (!levels.has(m.depth)) levels.set(m.depth, []);
+    levels.get(m.depth).push(m.id);
+    maxLevel = Math.max(maxLevel, m.depth);
+  });
 
   // --- Layout Constants (adjust for desired spacing and estimated bubble size) ---
   const estimatedBubbleWidth = 200;
@@ -2,101 +2,21 @@
 import { DB } from './storage.js';
 import * as apiService from './apiService.js';
 import { openTaskViewer } from './taskViewerUI.js';
+import { escapeHtml } from './utilUI.js';
 
-const sevenDaysInMs = 7 * 24 * 60 * 60 * 1000;
-const threeWeeksInMs = 21 * 24 * 60 * 60 * 1000;
+const DASHBOARD_WINDOW_DAYS = 21;
 
 let allTasks = [];
 
-function getDueSoonAndOverdueTasks(tasks) {
-    const dueSoon = [];
-    const overdue = [];
-    const now = new Date();
-
-    for (const task of tasks) {
-        if (task.deadline) {
-            const deadline = new Date(task.deadline);
-            const diff = deadline - now;
-
-            if (diff > 0 && diff <= sevenDaysInMs) {
-                dueSoon.push(task);
-            } else if (diff < 0 && !task.finishDate) {
-                overdue.push(task);
-            }
-        }
-    }
-    return { dueSoon, overdue };
-}
-
-function getRecentlyUpdatedTasks(tasks) {
-    const recentlyUpdated = [];
-    const now = new Date();
-
-    for (const task of tasks) {
-        if (task.updatedAt) {
-            const updatedAt = new Date(task.updatedAt);
-            const diff = now - updatedAt;
-
-            if (diff <= threeWeeksInMs) {
-                recentlyUpdated.push(task);
-            }
-        }
-    }
-    return recentlyUpdated;
-}
-
-function getRecentlyFinishedTasks(tasks) {
-    const recentlyFinished = [];
-    const now = new Date();
-
-    for (const task of tasks) {
-        if (task.finishDate) {
-            const finishDate = new Date(task.finishDate);
-            const diff = now - finishDate;
-
-
-            if (diff <= threeWeeksInMs) {
-                recentlyFinished.push(task);
-            }
-        }
-    }
-    return recentlyFinished;
-}
-
-function groupTasksByWeek(tasks, dateField) {
-    const now = new Date();
-    const oneWeekInMs = 7 * 24 * 60 * 60 * 1000;
-    const groupedTasks = {
-        "Week 1 (last 7 days)": [],
-        "Week 2 (7-14 days ago)": [],
-        "Week 3 (14-21 days ago)": []
-    };
-
-    for (const task of tasks) {
-        if (task[dateField]) {
-            const taskDate = new Date(task[dateField]);
-            const diff = now - taskDate;
-
-            if (diff <= oneWeekInMs) {
-                groupedTasks["Week 1 (last 7 days)"].push(task);
-            } else if (diff <= oneWeekInMs * 2) {
-                groupedTasks["Week 2 (7-14 days ago)"].push(task);
-            } else if (diff <= oneWeekInMs * 3) {
-                groupedTasks["Week 3 (14-21 days ago)"].push(task);
-            }
-        }
-    }
-    return groupedTasks;
-}
-
-function renderWeeklyTaskList(groupedTasks, showDeadline, showFinishDate, showUpdatedDate) {
+function renderWeeklyTaskList(weeks, showDeadline, showFinishDate, showUpdatedDate) {
     let html = '';
-    for (const week in groupedTasks) {
-        if (groupedTasks[week].length > 0) {
+    for (const week of weeks) {
+        if (week.count > 0) {
             html += `
                 <details open>
-                    <summary>${week}</summary>
-                    ${renderTaskList(groupedTasks[week], showDeadline, showFinishDate, showUpdatedDate)}
+                    <summary>${week.label} (${week.count})</summary>
+                    ${renderTaskList(week.tasks, showDeadline, showFinishDate, showUpdatedDate)}
+                    ${renderMoreNote(week)}
                 </details>
             `;
         }
@@ -104,6 +24,11 @@ function renderWeeklyTaskList(groupedTasks, showDeadline, showFinishDate, showUp
     return html || '<div>Nothing to show.</div>';
 }
 
+// Lists from the server are capped, the counts are not
+function renderMoreNote(section) {
+    const hidden = section.count - section.tasks.length;
+    return hidden > 0 ? `<div class="more-note">...and ${hidden} more</div>` : '';
+}
 
 function renderTaskList(tasks, showDeadline = true, showFinishDate = true, showUpdatedDate = true) {
     if (!tasks || tasks.length === 0) {
@@ -153,49 +78,49 @@ function renderTaskList(tasks, showDeadline = true, showFinishDate = true, showU
     `;
 }
 
+function renderMilestoneList(milestones) {
+    if (!milestones || milestones.length === 0) {
+        return '<div>Nothing to show.</div>';
+    }
+
+    const listItems = milestones.map(milestone => {
+        const deadlineText = milestone.deadline ? ` (Deadline: ${new Date(milestone.deadline).toLocaleDateString()})` : '';
+        return `<li class="clickable-task" data-task-id="${milestone.taskId}">${escapeHtml(milestone.title || '(no title)')} <span class="milestone-task-title">- ${escapeHtml(milestone.taskTitle || '')}</span>${deadlineText}</li>`;
+    }).join('');
+
+    return `
+        <ul>
+            ${listItems}
+        </ul>
+    `;
+}
+
 function handleTaskListClick(event) {
     const target = event.target.closest('.clickable-task');
     if (target) {
         const taskId = target.dataset.taskId;
-        const task = allTasks.find(t => t.id === taskId);
-        if (task) {
-            openTaskViewer(task);
-        }
+        // Milestone entries point at their task, which may not be in any task list
+        const task = allTasks.find(t => t.id === taskId) || { id: taskId };
+        openTaskViewer(task);
     }
 }
 
-export async function renderStatistics() {
+export async function renderStatistics(refresh = false) {
     const placeholder = document.getElementById('statistics-placeholder');
     if (!placeholder) return;
 
     try {
         const statuses = await DB.getMeta('statuses');
-        const taskCounts = await apiService.getTaskCounts();
-
-        let now = new Date();
-
-        
-        const taskWithDeadline = await apiService.loadTasksSummaryFromServer({
-            deadlineRT: new Date(now.getTime() + sevenDaysInMs).toISOString().split('T')[0],
-            hasFinishDate: false
-        }, { limit: 100 });
-
-        const updatedTasks = await apiService.loadTasksSummaryFromServer({
-            updatedRF: new Date(now.getTime() - threeWeeksInMs).toISOString().split('T')[0]
-        }, { limit: 100 });
-
-        const finishedTask = await apiService.loadTasksSummaryFromServer({
-            finishedRF: new Date(now.getTime() - threeWeeksInMs).toISOString().split('T')[0]
-        }, { limit: 100 });
+        const dashboard = await apiService.getDashboardFromServer(DASHBOARD_WINDOW_DAYS, refresh);
+        const taskCounts = dashboard.statusCounts;
+        const { dueSoon, overdue } = dashboard;
 
-        allTasks = [...taskWithDeadline, ...updatedTasks, ...finishedTask];
-
-        const { dueSoon, overdue } = getDueSoonAndOverdueTasks(taskWithDeadline);
-        const recentlyUpdated = getRecentlyUpdatedTasks(updatedTasks);
-        const recentlyFinished = getRecentlyFinishedTasks(finishedTask);
-
-        const weeklyUpdated = groupTasksByWeek(recentlyUpdated, 'updatedAt');
-        const weeklyFinished = groupTasksByWeek(recentlyFinished, 'finishDate');
+        allTasks = [
+            ...dueSoon.tasks,
+            ...overdue.tasks,
+            ...dashboard.updatedByWeek.flatMap(week => week.tasks),
+            ...dashboard.finishedByWeek.flatMap(week => week.tasks)
+        ];
 
         let statisticsHTML = `
             <div class="statistics-section">
@@ -212,23 +137,32 @@ export async function renderStatistics() {
                 </div>
 
                 <div class="statistic-widget task-list-widget">
-                    <h3>Due Soon (<= 7 days)</h3>
-                    ${renderTaskList(dueSoon, true, false, false)}
+                    <h3>Due Soon (<= 7 days): ${dueSoon.count}</h3>
+                    ${renderTaskList(dueSoon.tasks, true, false, false)}
+                    ${renderMoreNote(dueSoon)}
+                </div>
+
+                <div class="statistic-widget task-list-widget">
+                    <h3>Overdue Tasks: ${overdue.count}</h3>
+                    ${renderTaskList(overdue.tasks, true, false, false)}
+                    ${renderMoreNote(overdue)}
                 </div>
 
                 <div class="statistic-widget task-list-widget">
-                    <h3>Overdue Tasks</h3>
-                    ${renderTaskList(overdue, true, false, false)}
+                    <h3>Upcoming Milestones (<= 7 days): ${dashboard.upcomingMilestones.count}</h3>
+                    ${renderMilestoneList(dashboard.upcomingMilestones.milestones)}
+                    ${renderMoreNote({ count: dashboard.upcomingMilestones.count, tasks: dashboard.upcomingMilestones.milestones })}
+                    <div class="more-note">Overdue milestones: ${dashboard.overdueMilestones.count}</div>
                 </div>
 
                 <div class="statistic-widget task-list-widget">
                     <h3>Progress Last 3 Week (updated in last 21 days)</h3>
-                    ${renderWeeklyTaskList(weeklyUpdated, false, false, true)}
+                    ${renderWeeklyTaskList(dashboard.updatedByWeek, false, false, true)}
                 </div>
 
                 <div class="statistic-widget task-list-widget">
                     <h3>Finished Last 3 Week</h3>
-                    ${renderWeeklyTaskList(weeklyFinished, false, true, false)}
+                    ${renderWeeklyTaskList(dashboard.finishedByWeek, false, true, false)}
                 </div>
             </div>
         `;
@@ -237,7 +171,7 @@ export async function renderStatistics() {
 
         const refreshButton = document.getElementById('refresh-statistics-btn');
         if (refreshButton) {
-            refreshButton.addEventListener('click', renderStatistics);
+            refreshButton.addEventListener('click', () => renderStatistics(true));
         }
 
         document.querySelectorAll('.task-list-widget').forEach(widget => {
@@ -249,7 +183,7 @@ export async function renderStatistics() {
         placeholder.innerHTML = '<div class="error">Failed to load statistics. <button id="refresh-statistics-btn" class="action-btn">Refresh</button></div>';
         const refreshButton = document.getElementById('refresh-statistics-btn');
         if (refreshButton) {
-            refreshButton.addEventListener('click', renderStatistics);
+            refreshButton.addEventListener('click', () => renderStatistics(true));
         }
     }
 }
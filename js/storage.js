@@ -1,27 +1,55 @@
 export const DB = (function(){
   const DB_NAME = 'taskmgr-v1';
   const STORE_META = 'meta';
-  let db;
+  // Local mirror of the server's tasks/milestones, kept current by syncService.js
+  const STORE_TASKS = 'tasks';
+  const STORE_MILESTONES = 'milestones';
+  const STORES = [STORE_META, STORE_TASKS, STORE_MILESTONES];
+  let opening; // Promise of the open connection
 
-  function open(){
+  function createStores(e){
+    const idb = e.target.result;
+
+    // Meta store for custom categories, statuses, etc.
+    if(!idb.objectStoreNames.contains(STORE_META)){
+      idb.createObjectStore(STORE_META,{keyPath:'key'});
+    }
+
+    if(!idb.objectStoreNames.contains(STORE_TASKS)){
+      idb.createObjectStore(STORE_TASKS,{keyPath:'id'});
+    }
+    if(!idb.objectStoreNames.contains(STORE_MILESTONES)){
+      idb.createObjectStore(STORE_MILESTONES,{keyPath:'id'}).createIndex('taskId','taskId');
+    }
+  }
+
+  function request(version){
     return new Promise((resolve,reject)=>{
-      if(db) return resolve(db);
-      // Version bump to 4 to trigger onupgradeneeded for milestones
-      const r = indexedDB.open(DB_NAME); 
-      r.onupgradeneeded = e => {
-        const idb = e.target.result;
-        
-        // Meta store for custom categories, statuses, etc.
-        if(!idb.objectStoreNames.contains(STORE_META)){
-          idb.createObjectStore(STORE_META,{keyPath:'key'});
-        }
-
-      };
-      r.onsuccess = e => { db = e.target.result; resolve(db); };
+      const r = version ? indexedDB.open(DB_NAME, version) : indexedDB.open(DB_NAME);
+      r.onupgradeneeded = createStores;
+      r.onsuccess = e => resolve(e.target.result);
       r.onerror = e => reject(e.target.error);
     });
   }
 
+  function open(){
+    // Calls made while the database is still opening share that attempt
+    if(!opening) opening = openDatabase().catch(error => { opening = null; throw error; });
+    return opening;
+  }
+
+  async function openDatabase(){
+    // Opened at whatever version it already has: earlier builds shipped several, so a fixed one may be too low
+    let conn = await request();
+    if(STORES.some(name => !conn.objectStoreNames.contains(name))){
+      // Stores can only be added in an upgrade, so go one version up
+      const version = conn.version + 1;
+      conn.close();
+      conn = await request(version);
+    }
+    return conn;
+  }
+
   // --- Meta Operations (Existing) ---
   async function putMeta(key,value){
     const conn = await open();
@@ -42,13 +70,78 @@ export const DB = (function(){
     });
   }
 
+  // --- Task/Milestone Mirror Operations ---
+
+  // Applies one get_changes page in a single transaction: deletions first, then upserts.
+  async function applyChanges({tasks = [], milestones = [], deletedTasks = [], deletedMilestones = [], reset = false}){
+    const conn = await open();
+    return new Promise((res,rej)=>{
+      const tx = conn.transaction([STORE_TASKS, STORE_MILESTONES],'readwrite');
+      const taskStore = tx.objectStore(STORE_TASKS);
+      const milestoneStore = tx.objectStore(STORE_MILESTONES);
+      if(reset){
+        taskStore.clear();
+        milestoneStore.clear();
+      }
+      // The cascade below runs asynchronously, so it must not hit milestones re-sent in this page
+      const incomingMilestones = new Set(milestones.map(m => m.id));
+      for(const id of deletedTasks){
+        taskStore.delete(id);
+        // Milestones of a deleted task go with it
+        milestoneStore.index('taskId').openKeyCursor(IDBKeyRange.only(id)).onsuccess = e => {
+          const cursor = e.target.result;
+          if(cursor){
+            if(!incomingMilestones.has(cursor.primaryKey)) milestoneStore.delete(cursor.primaryKey);
+            cursor.continue();
+          }
+        };
+      }
+      for(const id of deletedMilestones) milestoneStore.delete(id);
+      for(const task of tasks) taskStore.put(task);
+      for(const milestone of milestones) milestoneStore.put(milestone);
+      tx.oncomplete = ()=>res();
+      tx.onerror = e => rej(e.target.error);
+    });
+  }
+
+  async function getTask(id){
+    const conn = await open();
+    return new Promise((res,rej)=>{
+      const tx = conn.transaction([STORE_TASKS],'readonly');
+      tx.objectStore(STORE_TASKS).get(id).onsuccess = e => res(e.target.result);
+      tx.onerror = e => rej(e.target.error);
+    });
+  }
+
+  async function getMilestone(id){
+    const conn = await open();
+    return new Promise((res,rej)=>{
+      const tx = conn.transaction([STORE_MILESTONES],'readonly');
+      tx.objectStore(STORE_MILESTONES).get(id).onsuccess = e => res(e.target.result);
+      tx.onerror = e => rej(e.target.error);
+    });
+  }
+
+  async function getMilestonesForTask(taskId){
+    const conn = await open();
+    return new Promise((res,rej)=>{
+      const tx = conn.transaction([STORE_MILESTONES],'readonly');
+      tx.objectStore(STORE_MILESTONES).index('taskId').getAll(IDBKeyRange.only(taskId)).onsuccess = e => res(e.target.result);
+      tx.onerror = e => rej(e.target.error);
+    });
+  }
+
+  async function clearMirror(){
+    return applyChanges({reset: true});
+  }
+
   // New function to close the IndexedDB connection
   function close() {
-    if (db) {
-      db.close();
-      db = null; // Clear the reference
+    if (opening) {
+      opening.then(conn => conn.close(), () => {});
+      opening = null; // Clear the reference
     }
   }
 
-  return {putMeta,getMeta,close};
+  return {putMeta,getMeta,applyChanges,getTask,getMilestone,getMilestonesForTask,clearMirror,close};
 })();
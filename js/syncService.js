@@ -0,0 +1,110 @@
+// js/syncService.js
+// Keeps the IndexedDB mirror (see storage.js) in step with the server through get_changes,
+// so opening tasks and milestones reads local data and only deltas cross the bridge.
+
+import { DB } from './storage.js';
+import {
+    getChangesFromServer, getLocalWriteCount, getAuthenticatedUsername,
+    loadTaskFromServer, loadMilestonesForTaskFromServer, loadMilestoneFromServer
+} from './apiService.js';
+
+// Writes from other clients sharing the database show up at most this late.
+// Our own writes always trigger a pull before the next local read.
+const SYNC_INTERVAL_MS = 5000;
+
+let lastSyncAt = 0;
+let syncedWriteCount = -1;
+let syncInFlight = null;
+
+/**
+ * Pulls all pending changes into the mirror. Concurrent callers share one pull.
+ * @returns {Promise<boolean>} false when nobody is logged in.
+ */
+export function syncChanges() {
+    if (!syncInFlight) {
+        syncInFlight = pullChanges().finally(() => { syncInFlight = null; });
+    }
+    return syncInFlight;
+}
+
+async function pullChanges() {
+    const username = getAuthenticatedUsername();
+    if (!username) return false;
+
+    // Writes made while this pull runs are not guaranteed to be in it
+    const writeCount = getLocalWriteCount();
+    let syncToken = (await DB.getMeta('syncUser')) === username ? await DB.getMeta('syncToken') : null;
+    let page;
+    do {
+        page = await getChangesFromServer(syncToken);
+        await DB.applyChanges({
+            tasks: page.tasks,
+            milestones: page.milestones,
+            deletedTasks: page.deleted.tasks,
+            deletedMilestones: page.deleted.milestones,
+            reset: page.reset
+        });
+        syncToken = page.syncToken;
+        await DB.putMeta('syncToken', syncToken);
+        await DB.putMeta('syncUser', username);
+    } while (page.hasMore);
+
+    lastSyncAt = Date.now();
+    syncedWriteCount = writeCount;
+    return true;
+}
+
+async function ensureFresh() {
+    if (syncedWriteCount === getLocalWriteCount() && Date.now() - lastSyncAt < SYNC_INTERVAL_MS) {
+        return true;
+    }
+    try {
+        return await syncChanges();
+    } catch (error) {
+        console.warn('Delta sync failed, reading from the server instead:', error);
+        return false;
+    }
+}
+
+/**
+ * Returns the full task from the mirror, falling back to the server.
+ */
+export async function getTask(taskId) {
+    if (await ensureFresh()) {
+        const task = await DB.getTask(taskId);
+        if (task) return task;
+    }
+    return loadTaskFromServer(taskId);
+}
+
+/**
+ * Returns all milestones of a task from the mirror, falling back to the server.
+ */
+export async function getMilestonesForTask(taskId) {
+    if (await ensureFresh() && await DB.getTask(taskId)) {
+        return DB.getMilestonesForTask(taskId);
+    }
+    return loadMilestonesForTaskFromServer(taskId);
+}
+
+/**
+ * Returns a single milestone from the mirror, falling back to the server.
+ */
+export async function getMilestone(taskId, milestoneId) {
+    if (await ensureFresh()) {
+        const milestone = await DB.getMilestone(milestoneId);
+        if (milestone && milestone.taskId === taskId) return milestone;
+    }
+    return loadMilestoneFromServer(taskId, milestoneId);
+}
+
+/**
+ * Drops the mirror, e.g. on logout.
+ */
+export async function clearLocalMirror() {
+    lastSyncAt = 0;
+    syncedWriteCount = -1;
+    await DB.clearMirror();
+    await DB.putMeta('syncToken', null);
+    await DB.putMeta('syncUser', null);
+}
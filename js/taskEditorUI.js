@@ -4,8 +4,9 @@
 
 // import { DB } from './storage.js'; // DB is no longer needed for task operations
 import { Editor } from './editor.js';
-import { escapeHtml, showModalAlert, showModalAlertConfirm } from './utilUI.js';
-import { loadTaskFromServer, saveTaskToServer, deleteTaskFromServer } from './apiService.js'; // Import from centralized API service
+import { escapeHtml, showModalAlert, showModalAlertConfirm, createAttachmentLink } from './utilUI.js';
+import { saveTaskToServer, patchTaskToServer, deleteTaskFromServer, ConflictError } from './apiService.js'; // Import from centralized API service
+import { getTask } from './syncService.js';
 
 // Internal state for the currently edited task and global options
 let currentTask = null;
@@ -17,6 +18,7 @@ let renderTaskListCallback = null; // Callback to re-render the task list after
 let openMilestonesViewCallback = null; // Callback to open the milestone view
 let openTaskViewerCallback = null; // New: Callback to open the task viewer
 let closeEditorCallback = null; // Callback to close the editor (for mobile UX)
+let editorBaseline = null; // Field values as the editor opened, so saving sends only what changed
 
 // Editor instances for description and notes
 let descEditorInstance = null;
@@ -144,17 +146,16 @@ function updateButtonStates(editorContainer) {
  * Opens the task editor for a given task.
  * @param {object} task - The task object to edit.
  * @param {boolean} isNewTask - True if this is a new task being created.
+ * @param {boolean} isFullTask - True if task is already the full server copy (e.g. from a conflict), so it is shown as is.
  */
-export async function openTaskEditor(task, isNewTask = false) {
+export async function openTaskEditor(task, isNewTask = false, isFullTask = false) {
   let fetchedTask = task; // Start with the provided task (could be a summary)
 
-  // Always fetch the full task details from the server if it's an existing task,
+  // Always load the full task (local mirror first, then the server) if it's an existing task,
   // to ensure we have description, notes, and attachments.
-  if (!isNewTask && task.id) {
+  if (!isNewTask && !isFullTask && task.id) {
       try {
-          // If task.creator is needed for auth, and not present, loadTaskFromServer might fail.
-          // The server handles the creator check based on the JWT.
-          const fullTask = await loadTaskFromServer(task.id);
+          const fullTask = await getTask(task.id);
           if (fullTask) {
               fetchedTask = fullTask;
           } else {
@@ -316,6 +317,7 @@ export async function openTaskEditor(task, isNewTask = false) {
   }
 
   updateButtonStates(editorContainer); // Call to set initial button states
+  editorBaseline = comparableFields(editorContainer);
 
   // On mobile, show the main content (editor) and hide the sidebar
   const appContainer = document.querySelector(selectors.appContainer);
@@ -348,7 +350,60 @@ function renderStatusOptions(container) {
 }
 
 /**
- * Saves the current task to the server.
+ * Reads the editable fields from the form.
+ * @param {HTMLElement} editorContainer - The task editor container.
+ */
+function readTaskForm(editorContainer) {
+  return {
+    title: editorContainer.querySelector(selectors.taskTitleInput)?.value || '',
+    from: editorContainer.querySelector(selectors.taskFromSelect)?.value || '',
+    priority: parseInt(editorContainer.querySelector(selectors.taskPriorityInput)?.value, 10) || 3,
+    deadline: editorContainer.querySelector(selectors.taskDeadlineInput)?.value || null,
+    finishDate: editorContainer.querySelector(selectors.taskFinishDateInput)?.value || null,
+    status: editorContainer.querySelector(selectors.taskStatusSelect)?.value || '',
+    difficulty: parseInt(editorContainer.querySelector('#taskDifficulty')?.value, 10) || 5,
+    description: (descEditorInstance) ? descEditorInstance.getHTML() : '',
+    notes: (notesEditorInstance) ? notesEditorInstance.getHTML() : '',
+  };
+}
+
+/**
+ * Form fields plus categories and attachments as JSON strings, for change detection.
+ * Read from the form itself so the editor's own HTML normalization never counts as a change.
+ */
+function comparableFields(editorContainer) {
+  const fields = {
+    ...readTaskForm(editorContainer),
+    categories: [...(currentTask.categories || [])].sort(),
+    attachments: currentTask.attachments || [],
+  };
+  return Object.fromEntries(Object.entries(fields).map(([key, value]) => [key, JSON.stringify(value)]));
+}
+
+/**
+ * Patches the changed fields; if the task was saved elsewhere meanwhile, asks before
+ * writing the changes on top of the newer version.
+ */
+async function patchTask(changes) {
+  try {
+    return await patchTaskToServer(currentTask.id, changes, currentTask.updatedAt);
+  } catch (error) {
+    if (!(error instanceof ConflictError)) throw error;
+    const overwrite = await showModalAlertConfirm(
+      'This task was changed elsewhere since you opened it. Save your changes on top of the newer version?'
+    );
+    if (!overwrite) {
+      currentTask = error.current;
+      return null;
+    }
+    currentTask = { ...error.current, ...changes };
+    return patchTaskToServer(currentTask.id, changes, error.current.updatedAt);
+  }
+}
+
+/**
+ * Saves the current task to the server. New tasks are saved whole, existing ones
+ * send only the fields that changed since the editor was opened.
  */
 async function saveTask() {
   if (!currentTask) return;
@@ -362,25 +417,39 @@ async function saveTask() {
   const editorContainer = document.querySelector(selectors.taskEditor);
   if (!editorContainer) return;
 
-  currentTask.title = editorContainer.querySelector(selectors.taskTitleInput)?.value || '';
-  currentTask.from = editorContainer.querySelector(selectors.taskFromSelect)?.value || '';
-  currentTask.priority = parseInt(editorContainer.querySelector(selectors.taskPriorityInput)?.value, 10) || 3;
-  currentTask.deadline = editorContainer.querySelector(selectors.taskDeadlineInput)?.value || null;
-  currentTask.finishDate = editorContainer.querySelector(selectors.taskFinishDateInput)?.value || null;
-  currentTask.status = editorContainer.querySelector(selectors.taskStatusSelect)?.value || '';
-  currentTask.difficulty = parseInt(editorContainer.querySelector('#taskDifficulty')?.value, 10) || 5;
-  currentTask.description = (descEditorInstance) ? descEditorInstance.getHTML() : '';
-  currentTask.notes = (notesEditorInstance) ? notesEditorInstance.getHTML() : '';
-  currentTask.updatedAt = new Date().toISOString();
-
-  // Set creator if it's a new task (i.e., creator is null/undefined)
-  if (!currentTask.creator) {
-      currentTask.creator = currentUsername;
-  } 
+  const current = comparableFields(editorContainer);
+  const formValues = readTaskForm(editorContainer);
+  const changes = {};
+  for (const [field, value] of Object.entries(current)) {
+    if (!editorBaseline || value !== editorBaseline[field]) {
+      changes[field] = field in formValues ? formValues[field] : currentTask[field];
+    }
+  }
+  Object.assign(currentTask, formValues);
 
   try {
-    await saveTaskToServer(currentTask); // Use centralized API service
-    showModalAlert('Task saved!');
+    if (!currentTask.creator) {
+      // Set creator if it's a new task (i.e., creator is null/undefined)
+      currentTask.creator = currentUsername;
+      currentTask.updatedAt = new Date().toISOString();
+      await saveTaskToServer(currentTask); // Use centralized API service
+      editorBaseline = comparableFields(editorContainer);
+      showModalAlert('Task saved!');
+    } else if (Object.keys(changes).length === 0) {
+      showModalAlert('No changes to save.');
+    } else {
+      const result = await patchTask(changes);
+      if (result) {
+        currentTask.updatedAt = result.updatedAt;
+        editorBaseline = comparableFields(editorContainer);
+        showModalAlert('Task saved!');
+      } else {
+        // Put the server copy in the form, otherwise the discarded edits would still be on screen
+        await openTaskEditor(currentTask, false, true);
+        showModalAlert('Your changes were discarded; showing the newer version.');
+        return;
+      }
+    }
   } catch (error) {
     showModalAlert(`Error saving task: ${error.message}`);
   }
@@ -487,7 +556,7 @@ function renderAttachments(){
     const div = document.createElement('div'); div.className = 'attachment';
     const left = document.createElement('div'); left.textContent = att.name;
     const right = document.createElement('div');
-    const dl = document.createElement('a'); dl.href = att.data; dl.download = att.name; dl.textContent = 'download';
+    const dl = createAttachmentLink(att);
     const rm = document.createElement('button'); rm.textContent='remove'; 
     
     // Disable remove button based on permissions
@@ -1,9 +1,9 @@
 // js/taskViewerUI.js
 // This module manages the read-only task viewing area.
 
-import { escapeHtml } from './utilUI.js';
+import { escapeHtml, createAttachmentLink } from './utilUI.js';
 import { Editor } from './editor.js'; // Import Editor for rendering static content
-import { loadTaskFromServer } from './apiService.js'; // Import from centralized API service
+import { getTask } from './syncService.js'; // Full tasks come from the local mirror
 
 // Internal state for the currently viewed task
 let currentTask = null;
@@ -53,7 +53,7 @@ export function initTaskViewerUI(onOpenTaskEditor, onOpenMilestonesView, onClose
 export async function openTaskViewer(task, isNewTask = false) {
   // If description, notes, or attachments are missing, fetch the full task from the server
   if (!isNewTask && (!task.description || !task.notes || !task.attachments)) {
-      const fullTask = await loadTaskFromServer(task.id); // Use centralized API service
+      const fullTask = await getTask(task.id); // Local mirror, server as fallback
       if (fullTask) {
           currentTask = fullTask; // Use the full task from the server
       } else {
@@ -180,7 +180,7 @@ function renderAttachments(){
     const div = document.createElement('div'); div.className = 'attachment';
     const left = document.createElement('div'); left.textContent = att.name;
     const right = document.createElement('div');
-    const dl = document.createElement('a'); dl.href = att.data; dl.download = att.name; dl.textContent = 'download';
+    const dl = createAttachmentLink(att);
     right.appendChild(dl);
     div.appendChild(left); div.appendChild(right); el.appendChild(div);
   });
@@ -2,6 +2,8 @@
 // This module provides utility functions for common UI operations
 // like HTML escaping and generic modal creation/management.
 
+import { loadAttachmentBlob } from './apiService.js';
+
 /**
  * Escapes HTML special characters in a string to prevent XSS.
  * @param {string} unsafe - The string to escape.
@@ -104,3 +106,33 @@ export function showModalAlertConfirm(message) {
         document.body.appendChild(modalFragment);
     });
 }
+
+/**
+ * Creates the download link for an attachment. Attachments added in the editor still carry
+ * their data URL; saved ones only have a hash and are fetched from the server when clicked.
+ * @param {object} att - The attachment ({ name, type, data } or { name, type, size, hash }).
+ * @returns {HTMLAnchorElement} The link element.
+ */
+export function createAttachmentLink(att) {
+  const dl = document.createElement('a');
+  dl.download = att.name;
+  dl.textContent = 'download';
+  if (att.data) {
+    dl.href = att.data;
+    return dl;
+  }
+  dl.href = '#';
+  dl.addEventListener('click', async (e) => {
+    if (dl.dataset.loaded) return; // Object URL is in place, let the browser download it
+    e.preventDefault();
+    try {
+      const blob = await loadAttachmentBlob(att);
+      dl.href = URL.createObjectURL(blob);
+      dl.dataset.loaded = 'true';
+      dl.click();
+    } catch (error) {
+      showModalAlert(`Could not load "${att.name}": ${error.message}`);
+    }
+  });
+  return dl;
+}
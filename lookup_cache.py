@@ -0,0 +1,108 @@
+import threading
+
+from archive_store import ARCHIVE_SCHEMA
+
+# In-process copies of the small status/origin lookup tables.
+# Several desktop clients can share one database file, so a cached copy is only
+# trusted while the matching row in change_counters still has the version it was
+# loaded at. Triggers bump those versions on every change, whichever client (or
+# pooled connection) made it, so inserts and deletes invalidate the cache by themselves.
+
+LOOKUP_TABLES = ('status', 'origin')
+# Bumped whenever tasks gain, lose or switch a status/origin; drives the only_active lists.
+# Moving tasks to or from the archive inserts/deletes main.tasks rows, so it bumps it as well.
+TASK_REFS_COUNTER = 'task_lookup_refs'
+
+
+def create_change_counters(cursor):
+    """Creates change_counters and the triggers that keep it up to date."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_counters (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    for name in LOOKUP_TABLES + (TASK_REFS_COUNTER,):
+        cursor.execute("INSERT OR IGNORE INTO change_counters (name, version) VALUES (?, 0)", (name,))
+
+    for table in LOOKUP_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_counter_{event.lower()} AFTER {event} ON {table} BEGIN
+                    UPDATE change_counters SET version = version + 1 WHERE name = '{table}';
+                END
+            ''')
+
+    bump_refs = f"UPDATE change_counters SET version = version + 1 WHERE name = '{TASK_REFS_COUNTER}';"
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS tasks_refs_counter_insert AFTER INSERT ON tasks BEGIN {bump_refs} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS tasks_refs_counter_delete AFTER DELETE ON tasks BEGIN {bump_refs} END")
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tasks_refs_counter_update AFTER UPDATE OF status, origin ON tasks
+        WHEN old.status IS NOT new.status OR old.origin IS NOT new.origin
+        BEGIN {bump_refs} END
+    ''')
+
+
+class LookupCache:
+    """Cached description->id map and sorted description lists of one lookup table."""
+
+    def __init__(self, table):
+        if table not in LOOKUP_TABLES:
+            raise ValueError(f"Unknown lookup table: {table}")
+        self.table = table
+        self._lock = threading.Lock()
+        self._version = None
+        self._ids = {}
+        self._descriptions = []
+        self._active_versions = None
+        self._active_descriptions = []
+
+    def _read_versions(self, cursor):
+        cursor.execute("SELECT name, version FROM change_counters WHERE name IN (?, ?)", (self.table, TASK_REFS_COUNTER))
+        versions = dict(cursor.fetchall())
+        return versions.get(self.table), versions.get(TASK_REFS_COUNTER)
+
+    def _refresh(self, cursor):
+        """Reloads the table if it changed since it was cached. Caller holds the lock."""
+        table_version, refs_version = self._read_versions(cursor)
+        if table_version is None or table_version != self._version:
+            cursor.execute(f"SELECT description, id FROM {self.table} ORDER BY description")
+            rows = cursor.fetchall()
+            self._ids = dict(rows)
+            self._descriptions = [description for description, _ in rows]
+            self._version = table_version
+        return table_version, refs_version
+
+    def get_id(self, cursor, description, create=True):
+        """Returns the id for description, inserting it first if create is set and it does not exist yet."""
+        if not description:
+            return None
+        with self._lock:
+            self._refresh(cursor)
+            lookup_id = self._ids.get(description)
+        if lookup_id is not None or not create:
+            return lookup_id
+
+        # Not cached on purpose: the caller's transaction may still roll back. The insert bumps
+        # the table's version, so the next lookup after the commit reloads the cache anyway.
+        cursor.execute(f"INSERT OR IGNORE INTO {self.table} (description) VALUES (?)", (description,))
+        cursor.execute(f"SELECT id FROM {self.table} WHERE description = ?", (description,))
+        return cursor.fetchone()[0]
+
+    def descriptions(self, cursor, only_active=False):
+        """Returns the sorted descriptions, or only those referenced by at least one (possibly archived) task."""
+        with self._lock:
+            versions = self._refresh(cursor)
+            if not only_active:
+                return list(self._descriptions)
+            if versions[1] is None or versions != self._active_versions:
+                # Values only archived tasks still use stay listed, like get_distinct_categories does
+                cursor.execute(f"""
+                    SELECT l.description FROM main.{self.table} l
+                    WHERE EXISTS (SELECT 1 FROM main.tasks t WHERE t.{self.table} = l.id)
+                       OR EXISTS (SELECT 1 FROM {ARCHIVE_SCHEMA}.tasks t WHERE t.{self.table} = l.id)
+                    ORDER BY l.description
+                """)
+                self._active_descriptions = [row[0] for row in cursor.fetchall()]
+                self._active_versions = versions
+            return list(self._active_descriptions)
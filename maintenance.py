@@ -0,0 +1,272 @@
+import argparse
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import sqlcipher3.dbapi2 as sqlite3
+
+from DBconnector import connectDB, attached_databases, bind_thread
+from env_variables import DATABASE_KEY
+from search_index import rebuild_search_index
+
+# Housekeeping for the SQLCipher files (tasks.db with its attached archive.db, and auth.db).
+# WAL mode never shrinks the -wal file by itself, deleted tasks and attachments leave free
+# pages behind and the planner statistics go stale, so every MAINTENANCE_INTERVAL_HOURS,
+# once the app has been idle for a while, each database gets:
+#   - PRAGMA incremental_vacuum, after a one-time switch to auto_vacuum=INCREMENTAL
+#     (that switch needs a full VACUUM, which renumbers rowids, so tasks_fts is rebuilt after it)
+#   - PRAGMA optimize
+#   - PRAGMA wal_checkpoint(TRUNCATE)
+# followed by an online backup of every file into BACKUP_DIR/<timestamp>/, keyed like the
+# originals. Only the newest BACKUP_KEEP sets are kept.
+#
+# Run by hand (e.g. from a scheduled task on a shared server):
+#     python maintenance.py [--no-backup] [--backup-dir DIR] [--keep N]
+
+BACKUP_DIR = "./data/backups"
+# Backup sets kept; 0 turns backups off
+BACKUP_KEEP = int(os.getenv('PRISMTASK_BACKUP_KEEP', '7'))
+# Hours between maintenance runs; 0 turns the job off (the CLI still works)
+MAINTENANCE_INTERVAL_HOURS = float(os.getenv('PRISMTASK_MAINTENANCE_HOURS', '24'))
+# Seconds without any Api call before the job starts a due run
+MAINTENANCE_IDLE_SECONDS = 120
+# Seconds between idle checks, and before the first one after startup
+MAINTENANCE_POLL_INTERVAL = 30
+MAINTENANCE_FIRST_RUN_DELAY = 300
+
+AUTO_VACUUM_INCREMENTAL = 2
+_BACKUP_SET_RE = re.compile(r'^\d{8}-\d{6}$')
+
+
+def _file_bytes(path):
+    """Size of a database file plus its -wal file, 0 for what does not exist."""
+    total = 0
+    for name in (path, path + '-wal'):
+        try:
+            total += os.path.getsize(name)
+        except OSError:
+            pass
+    return total
+
+
+def _has_table(cursor, schema, name):
+    cursor.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name = ?", (name,))
+    return cursor.fetchone() is not None
+
+
+def enable_incremental_vacuum(conn, schema='main'):
+    """
+    Switches schema to auto_vacuum=INCREMENTAL. Existing files only take the new mode with a
+    full VACUUM, so this is slow once and a no-op afterwards. Returns True if it vacuumed.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA {schema}.auto_vacuum")
+    if cursor.fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+        return False
+    cursor.execute(f"PRAGMA {schema}.auto_vacuum = INCREMENTAL")
+    cursor.execute(f"VACUUM {schema}")
+    # VACUUM may hand tasks new rowids, and tasks_fts finds its rows by rowid
+    if _has_table(cursor, schema, 'tasks_fts'):
+        rebuild_search_index(cursor, schema)
+        conn.commit()
+    return True
+
+
+def incremental_vacuum(cursor, schema='main'):
+    """Gives every free page of schema back to the file system. Returns the number of pages freed."""
+    cursor.execute(f"PRAGMA {schema}.freelist_count")
+    free_pages = cursor.fetchone()[0]
+    if free_pages:
+        # Frees one page per result row, so the rows have to be stepped through
+        cursor.execute(f"PRAGMA {schema}.incremental_vacuum").fetchall()
+    return free_pages
+
+
+def checkpoint(cursor, schema='main'):
+    """Copies the WAL into schema's file and truncates it. Returns False if a reader kept it from finishing."""
+    cursor.execute(f"PRAGMA {schema}.wal_checkpoint(TRUNCATE)")
+    busy, _, _ = cursor.fetchone()
+    return not busy
+
+
+def maintain_database(dbfile, key=DATABASE_KEY):
+    """
+    Vacuums, optimizes and checkpoints dbfile and the databases attached to it. Needs the write
+    lock for the VACUUM steps, so the app runs it on the writer thread (Api._maintain_database).
+    Returns {"file", "ms", "reclaimedBytes", "databases": {path: {...}}}.
+    """
+    start = time.perf_counter()
+    files = [('main', dbfile)] + attached_databases(dbfile)
+    sizes = {path: _file_bytes(path) for _, path in files}
+    report = {}
+    conn, cursor = connectDB(dbfile, key)
+    try:
+        for schema, path in files:
+            report[path] = {
+                'vacuumed': enable_incremental_vacuum(conn, schema),
+                'freedPages': incremental_vacuum(cursor, schema),
+            }
+        # Without arguments optimize covers the attached databases as well
+        cursor.execute("PRAGMA optimize")
+        for schema, path in files:
+            report[path]['checkpointed'] = checkpoint(cursor, schema)
+            report[path]['reclaimedBytes'] = sizes[path] - _file_bytes(path)
+    finally:
+        conn.close()
+    return {
+        'file': dbfile,
+        'ms': round((time.perf_counter() - start) * 1000, 1),
+        'reclaimedBytes': sum(entry['reclaimedBytes'] for entry in report.values()),
+        'databases': report,
+    }
+
+
+def _backup_sets(backup_dir):
+    try:
+        return sorted(name for name in os.listdir(backup_dir) if _BACKUP_SET_RE.match(name))
+    except FileNotFoundError:
+        return []
+
+
+def last_backup_time(backup_dir=BACKUP_DIR):
+    """When the newest backup set was taken (epoch seconds), or None."""
+    sets = _backup_sets(backup_dir)
+    if not sets:
+        return None
+    return datetime.strptime(sets[-1], '%Y%m%d-%H%M%S').timestamp()
+
+
+def backup_databases(dbfiles, key=DATABASE_KEY, backup_dir=BACKUP_DIR, keep=BACKUP_KEEP):
+    """
+    Copies every dbfile, with its attached databases, into a new backup_dir/<timestamp>/ set using
+    the SQLite backup API, encrypted with key. The copies of one dbfile come from one read snapshot,
+    so tasks.db and archive.db agree even while tasks are being archived. Deletes all but the
+    newest keep sets. Returns {"path", "ms", "bytes"}.
+    """
+    start = time.perf_counter()
+    target_dir = os.path.join(backup_dir, datetime.now().strftime('%Y%m%d-%H%M%S'))
+    # Written under a temporary name so an interrupted backup never looks like a complete set
+    partial_dir = target_dir + '.partial'
+    shutil.rmtree(partial_dir, ignore_errors=True)
+    os.makedirs(partial_dir)
+    size = 0
+    for dbfile in dbfiles:
+        files = [('main', dbfile)] + attached_databases(dbfile)
+        conn, cursor = connectDB(dbfile, key)
+        try:
+            # WAL snapshots start with the first read of each file, so read them all up front
+            cursor.execute("BEGIN")
+            for schema, _ in files:
+                cursor.execute(f"SELECT 1 FROM {schema}.sqlite_master LIMIT 1").fetchall()
+            for schema, path in files:
+                dest = os.path.join(partial_dir, os.path.basename(path))
+                target = sqlite3.connect(dest)
+                try:
+                    target.execute(f"PRAGMA key = '{key}';")
+                    conn.backup(target, name=schema)
+                finally:
+                    target.close()
+                size += os.path.getsize(dest)
+        finally:
+            conn.rollback()
+            conn.close()
+    # A second run within the same second replaces the first one's set
+    shutil.rmtree(target_dir, ignore_errors=True)
+    os.replace(partial_dir, target_dir)
+    for name in _backup_sets(backup_dir)[:-keep or None]:
+        shutil.rmtree(os.path.join(backup_dir, name), ignore_errors=True)
+    return {'path': target_dir, 'ms': round((time.perf_counter() - start) * 1000, 1), 'bytes': size}
+
+
+def format_result(result):
+    return (f"Maintenance of {result['file']}: {result['ms']:.1f} ms, "
+            f"{result['reclaimedBytes'] / 1024:.1f} KiB reclaimed")
+
+
+class MaintenanceJob:
+    """
+    Background thread that runs maintenance once it is due and the executor has been idle for
+    MAINTENANCE_IDLE_SECONDS. The vacuum/checkpoint part of each database runs as
+    Api._maintain_database on the writer thread; the backup reads on this thread's own
+    read-only connections, so writes can go on meanwhile.
+    """
+
+    def __init__(self, executor, dbfiles, interval_hours=MAINTENANCE_INTERVAL_HOURS,
+                 backup_dir=BACKUP_DIR, keep=BACKUP_KEEP):
+        self._executor = executor
+        self._dbfiles = list(dbfiles)
+        self._interval = interval_hours * 3600
+        self._backup_dir = backup_dir
+        self._keep = keep
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._loop, name='prismtask-maintenance', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def run_once(self):
+        """Maintains and (if enabled) backs up every database. Returns the per-database results and the backup."""
+        results = [self._executor.submit('_maintain_database', (dbfile,)).result() for dbfile in self._dbfiles]
+        backup = None
+        if self._keep > 0:
+            backup = backup_databases(self._dbfiles, backup_dir=self._backup_dir, keep=self._keep)
+        return results, backup
+
+    def _loop(self):
+        bind_thread(readonly=True)
+        # The newest backup set tells when the previous process last ran maintenance
+        last_run = last_backup_time(self._backup_dir) if self._keep > 0 else None
+        delay = MAINTENANCE_FIRST_RUN_DELAY
+        while not self._stop.wait(delay):
+            delay = MAINTENANCE_POLL_INTERVAL
+            if last_run is not None and time.time() - last_run < self._interval:
+                continue
+            if self._executor.idle_seconds() < MAINTENANCE_IDLE_SECONDS:
+                continue
+            try:
+                results, backup = self.run_once()
+                for result in results:
+                    print(format_result(result))
+                if backup:
+                    print(f"Backup written to {backup['path']} ({backup['bytes'] / 1024:.1f} KiB, {backup['ms']:.1f} ms).")
+            except Exception as e:
+                print(f"Database maintenance failed: {e}")
+            last_run = time.time()
+
+
+def main():
+    """Runs maintenance (and a backup) once, outside the app."""
+    from api import DB_FILE
+    from user_manager import AUTH_DB_FILE
+    import startup
+    parser = argparse.ArgumentParser(description="Vacuum, optimize, checkpoint and back up the PrismTask databases.")
+    parser.add_argument('--no-backup', action='store_true')
+    parser.add_argument('--backup-dir', default=BACKUP_DIR)
+    parser.add_argument('--keep', type=int, default=max(BACKUP_KEEP, 1), help="backup sets to keep")
+    args = parser.parse_args()
+
+    startup.wait_ready()
+    dbfiles = [DB_FILE, AUTH_DB_FILE]
+    try:
+        for dbfile in dbfiles:
+            print(format_result(maintain_database(dbfile)))
+        if not args.no_backup:
+            backup = backup_databases(dbfiles, backup_dir=args.backup_dir, keep=args.keep)
+            print(f"Backup written to {backup['path']} ({backup['bytes'] / 1024:.1f} KiB, {backup['ms']:.1f} ms).")
+    except sqlite3.Error as e:
+        print(f"Database maintenance failed: {e}")
+
+
+if __name__ == "__main__":
+    main()
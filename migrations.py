@@ -0,0 +1,178 @@
+import json
+import sqlcipher3.dbapi2 as sqlite3
+from search_index import create_search_index
+from lookup_cache import create_change_counters
+from sync_log import create_sync_log
+from attachment_store import create_attachment_store
+from date_utils import normalize_date, normalize_timestamp
+
+# Versioned schema migrations for the tasks database.
+# The applied version is stored in PRAGMA user_version; each migration runs once,
+# inside its own transaction, in ascending order. Append new migrations to the end
+# of MIGRATIONS and never renumber or edit one that has already shipped.
+
+
+def create_base_schema(cursor):
+    """Creates the original (version 0) tables. Everything added later is a migration."""
+    # Create status table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS status (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            description TEXT NOT NULL UNIQUE
+        )
+    ''')
+
+    # Create origin table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS origin (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            description TEXT NOT NULL UNIQUE
+        )
+    ''')    
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY, creator TEXT NOT NULL, title TEXT, origin INTEGER, priority INTEGER, 
+            deadline TEXT, finishDate TEXT, status INTEGER, description TEXT, notes TEXT,
+            categories TEXT, attachments TEXT, createdAt TEXT, updatedAt TEXT, difficulty INTEGER,
+            FOREIGN KEY(status) REFERENCES status(id)
+            FOREIGN KEY(origin) REFERENCES origin(id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS milestones (
+            id TEXT PRIMARY KEY, taskId TEXT NOT NULL, title TEXT, deadline TEXT, finishDate TEXT,
+            status INTEGER, parentId TEXT, notes TEXT, updatedAt TEXT,
+            FOREIGN KEY (taskId) REFERENCES tasks(id) ON DELETE CASCADE,
+            FOREIGN KEY(status) REFERENCES status(id)
+        )
+    ''')
+
+
+def _add_difficulty_column(cursor):
+    # Databases created before 'difficulty' existed still lack the column.
+    cursor.execute("PRAGMA table_info(tasks)")
+    columns = [info[1] for info in cursor.fetchall()]
+    if 'difficulty' not in columns:
+        cursor.execute("ALTER TABLE tasks ADD COLUMN difficulty INTEGER DEFAULT 5")
+
+
+def _add_query_indexes(cursor):
+    # load_tasks_summary always filters on creator and sorts by one of these columns.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_creator_updatedAt ON tasks(creator, updatedAt)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_creator_deadline ON tasks(creator, deadline)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_creator_priority ON tasks(creator, priority)")
+    # "Is this status/origin still in use?" checks and the only_active lookups.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_origin ON tasks(origin)")
+    # load_milestones_for_task and delete_milestone's child check.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_milestones_taskId ON milestones(taskId)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_milestones_parentId ON milestones(parentId)")
+
+
+def _add_task_categories_table(cursor):
+    # One row per (task, category) so category filters and the distinct-category
+    # lookup are index searches instead of LIKE scans over the JSON column.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_categories (
+            task_id TEXT NOT NULL, category TEXT NOT NULL,
+            PRIMARY KEY (task_id, category),
+            FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_task_categories_category ON task_categories(category, task_id)")
+
+    # Backfill from tasks.categories, which stays the source returned to the client.
+    cursor.execute("SELECT id, categories FROM tasks WHERE categories IS NOT NULL AND categories != ''")
+    rows = []
+    for task_id, categories_json in cursor.fetchall():
+        try:
+            categories = json.loads(categories_json)
+        except (json.JSONDecodeError, TypeError):
+            continue
+        if isinstance(categories, list):
+            rows.extend((task_id, cat) for cat in set(categories) if isinstance(cat, str) and cat)
+    cursor.executemany("INSERT OR IGNORE INTO task_categories (task_id, category) VALUES (?, ?)", rows)
+
+
+def _normalize_date_columns(cursor):
+    # Mixed 'YYYY-MM-DD' / datetime / '' values forced filters to wrap columns in date(),
+    # which no index can serve. Rewrite them once into the canonical forms of date_utils.
+    for table, date_columns, timestamp_columns in (
+        ('tasks', ('deadline', 'finishDate'), ('createdAt', 'updatedAt')),
+        ('milestones', ('deadline', 'finishDate'), ('updatedAt',)),
+    ):
+        columns = date_columns + timestamp_columns
+        cursor.execute(f"SELECT rowid, {', '.join(columns)} FROM {table}")
+        updates = []
+        for row in cursor.fetchall():
+            rowid, values = row[0], row[1:]
+            normalized = tuple(
+                normalize_date(v) if column in date_columns else normalize_timestamp(v)
+                for column, v in zip(columns, values)
+            )
+            if normalized != values:
+                updates.append(normalized + (rowid,))
+        set_clause = ', '.join(f"{column} = ?" for column in columns)
+        cursor.executemany(f"UPDATE {table} SET {set_clause} WHERE rowid = ?", updates)
+
+    # Range filters on the remaining summary date columns
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_creator_createdAt ON tasks(creator, createdAt)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_creator_finishDate ON tasks(creator, finishDate)")
+
+
+def _add_milestone_query_indexes(cursor):
+    # query_milestones and the dashboard look at milestones across all tasks,
+    # filtered by deadline/finishDate ranges and status.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_milestones_deadline ON milestones(deadline)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_milestones_status ON milestones(status, deadline)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_milestones_finishDate ON milestones(finishDate)")
+
+
+# (version, description, function taking a cursor)
+MIGRATIONS = [
+    (1, "add tasks.difficulty", _add_difficulty_column),
+    (2, "indexes for task summary and milestone lookups", _add_query_indexes),
+    (3, "full-text search index over task title/description/notes", create_search_index),
+    (4, "normalized task_categories table", _add_task_categories_table),
+    (5, "canonical date/timestamp values and date range indexes", _normalize_date_columns),
+    (6, "change counters for cached status/origin lookups", create_change_counters),
+    (7, "change sequence numbers and tombstones for delta sync", create_sync_log),
+    (8, "indexes for cross-task milestone queries", _add_milestone_query_indexes),
+    (9, "content-addressed attachment store", create_attachment_store),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(cursor):
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+
+def migrate(conn, target_version=None):
+    """Applies pending migrations (up to target_version, default all) and refreshes planner statistics. Returns the new version."""
+    cursor = conn.cursor()
+    current_version = get_schema_version(cursor)
+    if target_version is None:
+        target_version = SCHEMA_VERSION
+    pending = [m for m in MIGRATIONS if current_version < m[0] <= target_version]
+    if not pending:
+        return current_version
+
+    for version, description, migration in pending:
+        print(f"Applying migration {version}: {description}")
+        try:
+            cursor.execute("BEGIN")
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    # New indexes are only picked up reliably once sqlite_stat1 knows about them.
+    cursor.execute("ANALYZE")
+    conn.commit()
+    return pending[-1][0]
@@ -0,0 +1,121 @@
+# Milestone hierarchy queries (milestones.parentId) built on recursive CTEs.
+# All functions take the cursor of an open connection and only look at the
+# milestones of one task; a parentId pointing outside the task counts as no parent.
+
+# Milestones with no (valid) parent inside the task are the roots of the forest.
+_ROOT_CONDITION = """
+    m.parentId IS NULL OR NOT EXISTS (
+        SELECT 1 FROM {table} p WHERE p.id = m.parentId AND p.taskId = m.taskId
+    )
+"""
+
+
+def _milestone_count(cursor, task_id, table='milestones'):
+    cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE taskId = ?", (task_id,))
+    return cursor.fetchone()[0]
+
+
+def load_tree(cursor, task_id, root_id=None, table='milestones'):
+    """
+    Returns (columns, rows) for the milestones of a task, or only the subtree under root_id,
+    with 'depth' (0 for roots) and 'childCount' columns added, in depth-first order.
+    Milestones that sit on a parent cycle are unreachable from any root and therefore left out.
+    table is 'archive.milestones' for the milestones of an archived task.
+    """
+    if root_id is None:
+        start_sql = f"SELECT m.id, 0, m.id FROM {table} m WHERE m.taskId = ? AND ({_ROOT_CONDITION.format(table=table)})"
+        start_args = [task_id]
+    else:
+        start_sql = f"SELECT m.id, 0, m.id FROM {table} m WHERE m.taskId = ? AND m.id = ?"
+        start_args = [task_id, root_id]
+
+    cursor.execute(f"""
+        WITH RECURSIVE tree(id, depth, path) AS (
+            {start_sql}
+            UNION ALL
+            SELECT c.id, tree.depth + 1, tree.path || char(31) || c.id
+            FROM {table} c
+            JOIN tree ON c.parentId = tree.id
+            -- A node already on the path means root_id lies on a cycle; stop there
+            WHERE c.taskId = ? AND instr(char(31) || tree.path || char(31), char(31) || c.id || char(31)) = 0
+        )
+        SELECT m.*, s.description as status, tree.depth,
+               (SELECT COUNT(*) FROM {table} k WHERE k.parentId = m.id AND k.taskId = m.taskId) as childCount
+        FROM tree
+        JOIN {table} m ON m.id = tree.id
+        LEFT JOIN status s ON m.status = s.id
+        ORDER BY tree.path
+    """, start_args + [task_id])
+    return [description[0] for description in cursor.description], cursor.fetchall()
+
+
+def load_ancestors(cursor, task_id, milestone_id, table='milestones'):
+    """Returns (columns, rows) for the ancestors of a milestone with a 'distance' column (1 = parent), nearest first."""
+    max_distance = _milestone_count(cursor, task_id, table)
+    cursor.execute(f"""
+        WITH RECURSIVE up(id, distance) AS (
+            SELECT parentId, 1 FROM {table} WHERE id = ? AND taskId = ? AND parentId IS NOT NULL
+            UNION ALL
+            SELECT m.parentId, up.distance + 1
+            FROM up JOIN {table} m ON m.id = up.id AND m.taskId = ?
+            WHERE m.parentId IS NOT NULL AND m.parentId != ? AND up.distance < ?
+        )
+        SELECT m.*, s.description as status, MIN(up.distance) as distance
+        FROM up
+        JOIN {table} m ON m.id = up.id AND m.taskId = ?
+        LEFT JOIN status s ON m.status = s.id
+        GROUP BY m.id
+        ORDER BY distance
+    """, (milestone_id, task_id, task_id, milestone_id, max_distance, task_id))
+    return [description[0] for description in cursor.description], cursor.fetchall()
+
+
+def load_subtree_ids(cursor, task_id, root_ids):
+    """Returns the ids of root_ids and all of their descendants within the task."""
+    if not root_ids:
+        return set()
+    placeholders = ','.join('?' * len(root_ids))
+    # UNION (not UNION ALL) discards ids already seen, so this terminates even on cycles
+    cursor.execute(f"""
+        WITH RECURSIVE sub(id) AS (
+            SELECT id FROM milestones WHERE taskId = ? AND id IN ({placeholders})
+            UNION
+            SELECT c.id FROM milestones c JOIN sub ON c.parentId = sub.id WHERE c.taskId = ?
+        )
+        SELECT id FROM sub
+    """, [task_id] + list(root_ids) + [task_id])
+    return {row[0] for row in cursor.fetchall()}
+
+
+def find_cycle(cursor, task_id, milestone_ids):
+    """Returns the id of one of milestone_ids whose parent chain leads back to itself, or None."""
+    if not milestone_ids:
+        return None
+    placeholders = ','.join('?' * len(milestone_ids))
+    # Walk up from each milestone; pairs are de-duplicated by UNION, so the walk is finite
+    # even when it runs into an older cycle elsewhere in the task.
+    cursor.execute(f"""
+        WITH RECURSIVE walk(start, id) AS (
+            SELECT id, parentId FROM milestones WHERE taskId = ? AND id IN ({placeholders}) AND parentId IS NOT NULL
+            UNION
+            SELECT walk.start, m.parentId
+            FROM walk JOIN milestones m ON m.id = walk.id AND m.taskId = ?
+            WHERE m.parentId IS NOT NULL AND walk.id != walk.start
+        )
+        SELECT start FROM walk WHERE id = start LIMIT 1
+    """, [task_id] + list(milestone_ids) + [task_id])
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def find_invalid_parents(cursor, task_id, milestone_ids):
+    """Returns the ids (among milestone_ids) whose parentId is not a milestone of the same task."""
+    if not milestone_ids:
+        return []
+    placeholders = ','.join('?' * len(milestone_ids))
+    cursor.execute(f"""
+        SELECT m.id FROM milestones m
+        WHERE m.taskId = ? AND m.id IN ({placeholders}) AND m.parentId IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM milestones p WHERE p.id = m.parentId AND p.taskId = m.taskId)
+    """, [task_id] + list(milestone_ids))
+    return [row[0] for row in cursor.fetchall()]
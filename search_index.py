@@ -0,0 +1,104 @@
+import re
+import sqlcipher3.dbapi2 as sqlite3
+from DBconnector import connectDB
+from env_variables import DATABASE_KEY
+
+# Full-text index over tasks.title/description/notes.
+# tasks_fts is an external-content FTS5 table: it stores only the index and reads
+# the text back from tasks (by rowid) for snippets, so the triggers below must keep
+# it in step with every insert, update and delete on tasks.
+
+# Markers wrapped around matched words in summary snippets. Control characters
+# cannot occur in editor HTML, so the frontend can escape the snippet safely and
+# then swap these for <mark> tags.
+SNIPPET_START = '\u0002'
+SNIPPET_END = '\u0003'
+SNIPPET_ELLIPSIS = '…'
+SNIPPET_TOKENS = 12
+
+# Column weights for bm25(): a hit in the title counts more than one in description/notes.
+BM25_WEIGHTS = (10.0, 1.0, 1.0)
+RANK_EXPRESSION = f"bm25(tasks_fts, {', '.join(str(w) for w in BM25_WEIGHTS)})"
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def create_search_index(cursor, schema='main'):
+    """Creates tasks_fts and its sync triggers in schema (e.g. an attached archive), then indexes the existing rows."""
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.tasks_fts USING fts5(
+            title, description, notes,
+            content='tasks', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    # Trigger bodies name tables without a schema; they refer to the trigger's own database
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {schema}.tasks_fts_ai AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts(rowid, title, description, notes)
+            VALUES (new.rowid, new.title, new.description, new.notes);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {schema}.tasks_fts_ad AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts(tasks_fts, rowid, title, description, notes)
+            VALUES ('delete', old.rowid, old.title, old.description, old.notes);
+        END
+    ''')
+    # Only re-index when searchable text actually changed (e.g. not on a status change).
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {schema}.tasks_fts_au AFTER UPDATE OF title, description, notes ON tasks
+        WHEN old.title IS NOT new.title OR old.description IS NOT new.description OR old.notes IS NOT new.notes
+        BEGIN
+            INSERT INTO tasks_fts(tasks_fts, rowid, title, description, notes)
+            VALUES ('delete', old.rowid, old.title, old.description, old.notes);
+            INSERT INTO tasks_fts(rowid, title, description, notes)
+            VALUES (new.rowid, new.title, new.description, new.notes);
+        END
+    ''')
+    rebuild_search_index(cursor, schema)
+
+
+def rebuild_search_index(cursor, schema='main'):
+    """Re-reads every task into tasks_fts. Needed after anything that renumbers rowids (e.g. VACUUM)."""
+    cursor.execute(f"INSERT INTO {schema}.tasks_fts(tasks_fts) VALUES ('rebuild')")
+
+
+def build_match_expression(search_query):
+    """
+    Turns the search box text into an FTS5 MATCH expression.
+    ';' separates terms that must all match; within a term the words form a
+    phrase whose last word is matched as a prefix. Returns None if nothing searchable remains.
+    """
+    phrases = []
+    for term in search_query.split(';'):
+        words = _WORD_RE.findall(term.lower())
+        if words:
+            # Words are plain \w+ tokens, so quoting cannot be broken out of.
+            phrases.append('"' + ' '.join(words) + '"*')
+    if not phrases:
+        return None
+    return ' AND '.join(phrases)
+
+
+def main():
+    """Rebuilds the search index of an existing database."""
+    from api import DB_FILE
+    from archive_store import ARCHIVE_SCHEMA
+    import startup
+    startup.wait_ready()
+    conn, cursor = connectDB(DB_FILE, DATABASE_KEY)
+    try:
+        for schema in ('main', ARCHIVE_SCHEMA):
+            rebuild_search_index(cursor, schema)
+            conn.commit()
+            cursor.execute(f"SELECT COUNT(*) FROM {schema}.tasks")
+            print(f"Search index rebuilt for {cursor.fetchone()[0]} {schema} tasks.")
+    except sqlite3.Error as e:
+        print(f"Error rebuilding search index: {e}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
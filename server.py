@@ -0,0 +1,248 @@
+"""
+Headless HTTP/JSON server for the Api class, so several people can share one database
+through one process (one connection pool, one key derivation per connection) instead of
+every desktop opening the SQLCipher file itself.
+
+    python server.py --host 127.0.0.1 --port 8765
+
+Endpoints:
+    POST /api/<method>   body: JSON list of arguments   -> the method's return value
+    POST /api/batch      body: {"calls": [{"method", "args"}, ...]} -> {"results": [...]}
+                         (reads and writes; a plain argument list calls Api.batch instead)
+    GET  /               the web UI, talking to this server instead of pywebview
+
+Calls run through the same ApiExecutor as the desktop app: reads on the read-only
+worker pool, writes on the single writer thread.
+"""
+import argparse
+import gzip
+import json
+import mimetypes
+import os
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, unquote
+
+import startup
+from api import Api, READ_CALLS, DB_FILE, MAX_BATCH_CALLS
+from executor import ApiExecutor
+from archive_store import ArchiveJob
+from maintenance import MaintenanceJob
+from user_manager import AUTH_DB_FILE
+from DBconnector import close_all_pools
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Requests carry attachments as data URLs, so allow generous bodies
+MAX_BODY_BYTES = 64 * 1024 * 1024
+# Responses smaller than this are sent uncompressed; gzip would not pay off
+GZIP_MIN_BYTES = 1024
+
+# Diagnostics that show everyone's activity on the server (pool sizes, database paths, timings).
+# Served only with --diagnostics, e.g. for a load test against a private instance.
+DIAGNOSTIC_METHODS = frozenset({'get_connection_stats', 'get_worker_stats', 'get_metrics'})
+
+STATIC_ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIRS = ('js', 'css', 'assets')
+STATIC_FILES = ('favicon.ico',)
+# Tells js/apiService.js to send calls to this server rather than to pywebview
+SERVER_MODE_SCRIPT = '<script>window.PRISMTASK_SERVER_URL = "/api";</script>'
+
+
+def _resolve_static(path):
+    """Maps a URL path to a file below STATIC_ROOT (matching names case-insensitively), or None."""
+    parts = [part for part in unquote(path).split('/') if part]
+    if not parts or parts[0].lower() not in STATIC_DIRS + STATIC_FILES or '..' in parts:
+        return None
+    current = STATIC_ROOT
+    for part in parts:
+        try:
+            entries = os.listdir(current)
+        except OSError:
+            return None
+        match = part if part in entries else next((e for e in entries if e.lower() == part.lower()), None)
+        if match is None:
+            return None
+        current = os.path.join(current, match)
+    return current if os.path.isfile(current) else None
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, executor, diagnostics=False):
+        self.executor = executor
+        self.bridge = executor.bridge()
+        self.diagnostics = diagnostics
+        # Everything pywebview would expose: the Api methods plus call_latest and get_worker_stats
+        self.methods = {name for name in dir(self.bridge) if not name.startswith('_')}
+        if not diagnostics:
+            self.methods -= DIAGNOSTIC_METHODS
+        super().__init__(address, ApiRequestHandler)
+
+    def dispatch(self, client_id, method, args):
+        if method not in self.methods:
+            return {"error": f"Unknown method: {method}"}
+        if not isinstance(args, list):
+            return {"error": "Arguments must be a JSON list."}
+        if method == 'batch' and not self.diagnostics and len(args) > 1 and isinstance(args[1], list):
+            # Api.batch would run them on the caller's behalf
+            if any(isinstance(call, dict) and call.get('method') in DIAGNOSTIC_METHODS for call in args[1]):
+                return {"error": "Diagnostics are not served by this server."}
+        if method == 'call_latest' and args:
+            # Supersede keys are per browser tab, not shared by everyone on the server
+            args = [f"{client_id}:{args[0]}"] + args[1:]
+        return getattr(self.bridge, method)(*args)
+
+    def dispatch_batch(self, client_id, calls):
+        """
+        Runs calls in order. Consecutive reads are handed to the reader pool together and run
+        concurrently; a write waits for everything before it, so results match sequential calls.
+        """
+        results = [None] * len(calls)
+        pending = []  # (index, future) of the reads in flight
+
+        def collect():
+            for index, future in pending:
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    results[index] = {"error": str(e)}
+            pending.clear()
+
+        for index, call in enumerate(calls):
+            if not isinstance(call, dict) or not isinstance(call.get('args', []), list):
+                results[index] = {"error": "Each call needs a method and a list of args."}
+                continue
+            method, args = call.get('method'), call.get('args', [])
+            if method in READ_CALLS and method in self.methods:
+                pending.append((index, self.executor.submit(method, args)))
+                continue
+            collect()
+            try:
+                results[index] = self.dispatch(client_id, method, args)
+            except Exception as e:
+                results[index] = {"error": str(e)}
+        collect()
+        return results
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'PrismTask'
+
+    def log_message(self, format, *args):
+        pass  # One line per call would drown the console under load
+
+    def _send(self, status, body, content_type='application/json'):
+        headers = {'Content-Type': content_type}
+        if len(body) >= GZIP_MIN_BYTES and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+            headers['Vary'] = 'Accept-Encoding'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("Request body too large.")
+        body = self.rfile.read(length) if length else b''
+        if self.headers.get('Content-Encoding') == 'gzip':
+            # The limit holds for the inflated body as well, so a small gzip bomb cannot fill memory
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            try:
+                body = decompressor.decompress(body, MAX_BODY_BYTES + 1)
+            except zlib.error as e:
+                raise ValueError(f"Corrupt gzip body: {e}")
+            if len(body) > MAX_BODY_BYTES or decompressor.unconsumed_tail:
+                raise ValueError("Request body too large.")
+        return json.loads(body or b'null')
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path in ('/', '/index.html'):
+            with open(os.path.join(STATIC_ROOT, 'index.html'), 'rb') as f:
+                html = f.read().decode('utf-8')
+            html = html.replace('</head>', SERVER_MODE_SCRIPT + '\n</head>', 1)
+            self._send(200, html.encode('utf-8'), 'text/html; charset=utf-8')
+            return
+        file_path = _resolve_static(path)
+        if file_path is None:
+            self._send_json(404, {"error": "Not found."})
+            return
+        with open(file_path, 'rb') as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        if file_path.endswith('.js'):
+            content_type = 'text/javascript'  # ES modules are refused under other types
+        self._send(200, body, content_type)
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if not path.startswith('/api/'):
+            self._send_json(404, {"error": "Not found."})
+            return
+        try:
+            payload = self._read_json()
+        except (ValueError, OSError, zlib.error) as e:
+            self._send_json(400, {"error": f"Invalid request body: {e}"})
+            return
+
+        client_id = self.headers.get('X-Client-Id') or self.client_address[0]
+        method = path[len('/api/'):]
+        try:
+            # {"calls": [...]} is the server's own batch; a list of arguments goes to Api.batch
+            if method == 'batch' and not isinstance(payload, list):
+                calls = payload.get('calls') if isinstance(payload, dict) else None
+                if not isinstance(calls, list) or len(calls) > MAX_BATCH_CALLS:
+                    self._send_json(400, {"error": f"batch needs a list of at most {MAX_BATCH_CALLS} calls."})
+                    return
+                self._send_json(200, {"results": self.server.dispatch_batch(client_id, calls)})
+            else:
+                self._send_json(200, self.server.dispatch(client_id, method, payload if payload is not None else []))
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the PrismTask Api over HTTP/JSON.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--diagnostics', action='store_true',
+                        help="also serve pool/worker statistics, which show every user's activity")
+    args = parser.parse_args()
+
+    startup.mark('imports')
+    # Requests are accepted right away; the first ones wait until the databases are checked
+    startup.begin()
+    executor = ApiExecutor(Api(), READ_CALLS)
+    archive_job = ArchiveJob(executor)
+    archive_job.start()
+    maintenance_job = MaintenanceJob(executor, [DB_FILE, AUTH_DB_FILE])
+    maintenance_job.start()
+    httpd = ApiServer((args.host, args.port), executor, args.diagnostics)
+    startup.mark('listening')
+    print(f"PrismTask server listening on http://{args.host}:{httpd.server_port}/")
+    startup.begin().add_done_callback(lambda _: print(startup.format_report()))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        archive_job.stop()
+        maintenance_job.stop()
+        executor.shutdown()
+        close_all_pools()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Startup pipeline: the window (or server) comes up first, the database checks run once in
+the background.
+
+begin() starts the schema checks of auth.db and tasks.db on a background thread; both skip
+straight through when PRAGMA user_version already matches. Api calls go through wait_ready(),
+so the first call blocks until the checks are done (or re-raises their error).
+mark()/phase() collect the timings shown by report().
+"""
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# Everything in the report is relative to the moment this module was first imported,
+# so entry points import it before their heavy imports.
+_origin = time.perf_counter()
+_lock = threading.Lock()
+_marks = {}  # name -> ms since _origin
+_phases = {}  # name -> duration in ms
+_ready = Future()
+_started = False
+ready = False
+
+
+def _since_origin_ms():
+    return round((time.perf_counter() - _origin) * 1000, 1)
+
+
+def mark(name):
+    """Records that name happened now; only the first mark of a name counts."""
+    with _lock:
+        _marks.setdefault(name, _since_origin_ms())
+
+
+@contextmanager
+def phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _phases[name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+def _run():
+    global ready
+    try:
+        # Imported here: api itself imports this module for wait_ready
+        from user_manager import _init_auth_db
+        from api import init_db
+        with phase('database checks'):
+            _init_auth_db()
+            init_db()
+    except BaseException as e:
+        print(f"Database initialization failed: {e}")
+        _ready.set_exception(e)
+        return
+    mark('databases ready')
+    ready = True
+    _ready.set_result(True)
+
+
+def begin(background=True):
+    """Starts the database checks once. Returns the readiness future."""
+    global _started
+    with _lock:
+        if _started:
+            return _ready
+        _started = True
+    if background:
+        threading.Thread(target=_run, name='prismtask-startup', daemon=True).start()
+    else:
+        _run()
+    return _ready
+
+
+def wait_ready(timeout=None):
+    """Blocks until the databases are initialized, starting the checks if nobody has yet."""
+    if ready:
+        return
+    # Always on the startup thread: the caller may be a reader bound to read-only connections
+    begin().result(timeout)
+
+
+def report():
+    """{"marks": ms since start per event, "phases": duration per step in ms, "ready": bool}"""
+    with _lock:
+        return {'marks': dict(sorted(_marks.items(), key=lambda item: item[1])),
+                'phases': dict(_phases), 'ready': ready}
+
+
+def format_report():
+    data = report()
+    lines = ["Startup (ms since launch):"]
+    lines += [f"  {name:<24}{ms:>9.1f}" for name, ms in data['marks'].items()]
+    lines.append("Steps (ms):")
+    lines += [f"  {name:<24}{ms:>9.1f}" for name, ms in data['phases'].items()]
+    return '\n'.join(lines)
@@ -0,0 +1,71 @@
+# Change tracking for delta sync (Api.get_changes).
+# Every write to tasks/milestones stamps the row's change_seq with the next value of
+# the 'sync' row in change_counters; deletes leave a tombstone carrying the same kind
+# of sequence number. Writers are serialized by SQLite, so sequence numbers become
+# visible in commit order and "everything with a seq above N" is a complete delta.
+
+SYNC_COUNTER = 'sync'
+
+_NEXT_SEQ = f"""
+    UPDATE change_counters SET version = version + 1 WHERE name = '{SYNC_COUNTER}';
+"""
+_CURRENT_SEQ = f"(SELECT version FROM change_counters WHERE name = '{SYNC_COUNTER}')"
+
+
+def create_sync_log(cursor):
+    """Adds change_seq columns, the tombstone table and the triggers maintaining both."""
+    for table in ('tasks', 'milestones'):
+        cursor.execute(f"PRAGMA table_info({table})")
+        if 'change_seq' not in [info[1] for info in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN change_seq INTEGER")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_tombstones (
+            kind TEXT NOT NULL, id TEXT NOT NULL, taskId TEXT, creator TEXT, seq INTEGER NOT NULL,
+            PRIMARY KEY (kind, id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sync_tombstones_creator_seq ON sync_tombstones(creator, seq)")
+
+    # Existing rows get distinct sequence numbers, so a first full sync can be paged too.
+    cursor.execute("UPDATE tasks SET change_seq = rowid WHERE change_seq IS NULL")
+    cursor.execute("SELECT IFNULL(MAX(change_seq), 0) FROM tasks")
+    task_max = cursor.fetchone()[0]
+    cursor.execute("UPDATE milestones SET change_seq = rowid + ? WHERE change_seq IS NULL", (task_max,))
+    cursor.execute("SELECT IFNULL(MAX(change_seq), 0) FROM milestones")
+    seq = max(task_max, cursor.fetchone()[0])
+    cursor.execute("INSERT OR IGNORE INTO change_counters (name, version) VALUES (?, 0)", (SYNC_COUNTER,))
+    cursor.execute("UPDATE change_counters SET version = MAX(version, ?) WHERE name = ?", (seq, SYNC_COUNTER))
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_creator_change_seq ON tasks(creator, change_seq)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_milestones_change_seq ON milestones(change_seq)")
+
+    for table, kind, task_id, creator in (
+        ('tasks', 'task', 'old.id', 'old.creator'),
+        ('milestones', 'milestone', 'old.taskId', '(SELECT creator FROM tasks WHERE id = old.taskId)'),
+    ):
+        stamp = f"""
+            {_NEXT_SEQ}
+            UPDATE {table} SET change_seq = {_CURRENT_SEQ} WHERE rowid = new.rowid;
+        """
+        # The stamping UPDATE changes change_seq, so the WHEN clause keeps it from re-triggering.
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_sync_ai AFTER INSERT ON {table} BEGIN
+                {stamp}
+                DELETE FROM sync_tombstones WHERE kind = '{kind}' AND id = new.id;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_sync_au AFTER UPDATE ON {table}
+            WHEN new.change_seq IS old.change_seq
+            BEGIN
+                {stamp}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_sync_ad AFTER DELETE ON {table} BEGIN
+                {_NEXT_SEQ}
+                INSERT OR REPLACE INTO sync_tombstones (kind, id, taskId, creator, seq)
+                VALUES ('{kind}', old.id, {task_id}, {creator}, {_CURRENT_SEQ});
+            END
+        ''')
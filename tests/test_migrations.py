@@ -0,0 +1,127 @@
+"""
+The indexes added by migrations.py have to stay in the query plans of the hot queries:
+each test migrates a fresh database, runs the real Api call and EXPLAINs the statements it sent.
+
+    python -m pytest tests
+"""
+import pytest
+
+pytest.importorskip("sqlcipher3")
+
+import api
+import startup
+from archive_store import ARCHIVE_SCHEMA
+from DBconnector import attach_database, close_all_pools, connectDB
+from env_variables import DATABASE_KEY
+from migrations import SCHEMA_VERSION, get_schema_version
+
+USERNAME = 'bob'
+
+
+class RecordingCursor:
+    """Passes everything to cursor, noting each (sql, args) it executes."""
+
+    def __init__(self, cursor, statements):
+        self._cursor = cursor
+        self._statements = statements
+
+    def execute(self, sql, args=()):
+        self._statements.append((sql, tuple(args)))
+        return self._cursor.execute(sql, args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    db_file = str(tmp_path / 'tasks.db')
+    attach_database(db_file, ARCHIVE_SCHEMA, str(tmp_path / 'archive.db'))
+    monkeypatch.setattr(api, 'DB_FILE', db_file)
+    api.init_db()
+    monkeypatch.setattr(startup, 'ready', True)
+    monkeypatch.setattr(api.Api, '_get_authenticated_username', lambda self, token: USERNAME if token else None)
+
+    statements = []
+    monkeypatch.setattr(api, 'connectDB', lambda dbfile, key: _recording(dbfile, key, statements))
+    yield db_file, statements
+    close_all_pools()
+
+
+def _recording(dbfile, key, statements):
+    conn, cursor = connectDB(dbfile, key)
+    return conn, RecordingCursor(cursor, statements)
+
+
+def _plan(db_file, sql, args):
+    conn, cursor = connectDB(db_file, DATABASE_KEY)
+    try:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, args)
+        return ' | '.join(row[-1] for row in cursor.fetchall())
+    finally:
+        conn.close()
+
+
+def _statement(statements, fragment):
+    matching = [statement for statement in statements if fragment in statement[0]]
+    assert matching, f"no statement containing {fragment!r}"
+    return matching[-1]
+
+
+def _add_tasks(a):
+    for i in range(20):
+        a.save_task('token', {'id': f't{i}', 'title': f'task {i}', 'deadline': f'2025-01-{i + 1:02d}',
+                              'updatedAt': f'2025-02-{i + 1:02d}', 'priority': i % 3})
+    a.save_milestone('token', {'id': 'm1', 'title': 'parent'}, 't0')
+    a.save_milestone('token', {'id': 'm2', 'title': 'child', 'parentId': 'm1'}, 't0')
+
+
+def test_database_is_migrated(db):
+    db_file, _ = db
+    conn, cursor = connectDB(db_file, DATABASE_KEY)
+    try:
+        assert get_schema_version(cursor) == SCHEMA_VERSION
+    finally:
+        conn.close()
+
+
+def test_summary_sorted_by_updated_at_uses_index_order(db):
+    db_file, statements = db
+    a = api.Api()
+    _add_tasks(a)
+    statements.clear()
+
+    tasks = a.load_tasks_summary('token', {'sortBy': 'updatedAt'}, {'limit': 5, 'cursor': None})['tasks']
+    assert [task['id'] for task in tasks] == ['t19', 't18', 't17', 't16', 't15']
+
+    plan = _plan(db_file, *_statement(statements, 'ORDER BY'))
+    assert 'idx_tasks_creator_updatedAt' in plan
+    # The index hands the rows over in order, so a page needs no sort step
+    assert 'USE TEMP B-TREE FOR ORDER BY' not in plan
+
+
+def test_summary_deadline_range_uses_index(db):
+    db_file, statements = db
+    a = api.Api()
+    _add_tasks(a)
+    statements.clear()
+
+    filters = {'sortBy': 'deadline', 'deadlineRF': '2025-01-03', 'deadlineRT': '2025-01-05'}
+    tasks = a.load_tasks_summary('token', filters, {'limit': 5, 'cursor': None})['tasks']
+    assert [task['id'] for task in tasks] == ['t2', 't3', 't4']
+
+    plan = _plan(db_file, *_statement(statements, 'ORDER BY'))
+    assert 'idx_tasks_creator_deadline' in plan
+
+
+def test_child_check_uses_parent_index(db):
+    db_file, statements = db
+    a = api.Api()
+    _add_tasks(a)
+    statements.clear()
+
+    result = a.delete_milestone('token', 'm1', 't0')
+    assert 'error' in result
+
+    plan = _plan(db_file, *_statement(statements, 'WHERE parentId = ?'))
+    assert 'idx_milestones_parentId' in plan
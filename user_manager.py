@@ -1,20 +1,29 @@
 import sqlcipher3.dbapi2 as sqlite3
 import hashlib
 import os
+import time
 from DBconnector import connectDB
 from env_variables import DATABASE_KEY, PEPPER
+import startup
 
 # Define the authentication database file path.
 AUTH_DB_FILE = "./data/auth.db"
+# Stored in PRAGMA user_version once the tables below exist; bump it when they change
+AUTH_SCHEMA_VERSION = 1
 
 def _init_auth_db():
     """Initializes the SQLite authentication database and creates the users table if it doesn't exist."""
-    print("Initializing authentication database...")
     conn = None
     try:
         # Ensure the data directory exists
         os.makedirs(os.path.dirname(AUTH_DB_FILE), exist_ok=True)
-        conn, cursor = connectDB(AUTH_DB_FILE, DATABASE_KEY)
+        with startup.phase('auth.db open'):
+            conn, cursor = connectDB(AUTH_DB_FILE, DATABASE_KEY)
+
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] == AUTH_SCHEMA_VERSION:
+            return
+        print("Initializing authentication database...")
 
         # Create users table
         # password_hash will store the hashed password
@@ -27,6 +36,15 @@ def _init_auth_db():
                 salt TEXT NOT NULL
             )
         ''')
+
+        # Tokens logged out before they expire; expires_at lets old rows be purged
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS revoked_tokens (
+                token_digest TEXT PRIMARY KEY,
+                expires_at INTEGER
+            )
+        ''')
+        cursor.execute(f"PRAGMA user_version = {AUTH_SCHEMA_VERSION}")
         conn.commit()
         print(f"Authentication database initialized at: {os.path.abspath(AUTH_DB_FILE)}")
     except sqlite3.Error as e:
@@ -145,6 +163,38 @@ def delete_user(username):
         if conn:
             conn.close()
 
+def revoke_token(token_digest, expires_at=None):
+    """Marks a token (by its SHA-256 hex digest) as revoked until it expires."""
+    conn = None
+    try:
+        conn, cursor = connectDB(AUTH_DB_FILE, DATABASE_KEY)
+        # Revoked tokens that have expired anyway are no longer needed
+        cursor.execute("DELETE FROM revoked_tokens WHERE expires_at IS NOT NULL AND expires_at < ?", (int(time.time()),))
+        cursor.execute("INSERT OR REPLACE INTO revoked_tokens (token_digest, expires_at) VALUES (?, ?)",
+                       (token_digest, expires_at))
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error during token revocation: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def is_token_revoked(token_digest):
+    """Checks whether a token (by its SHA-256 hex digest) has been revoked."""
+    conn = None
+    try:
+        conn, cursor = connectDB(AUTH_DB_FILE, DATABASE_KEY)
+        cursor.execute("SELECT 1 FROM revoked_tokens WHERE token_digest = ?", (token_digest,))
+        return cursor.fetchone() is not None
+    except sqlite3.Error as e:
+        print(f"Database error during token revocation check: {e}")
+        return True
+    finally:
+        if conn:
+            conn.close()
+
 
 def main():
     """Simple command-line interface for user management."""